@@ -2,6 +2,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from allauth.account.forms import SignupForm
+from core.fields import LookupModelChoiceField, LookupModelMultipleChoiceField
 from core.validators import validate_profile_photo
 from .models import UserProfile, County, AgeGroup, MobilityDevice
 
@@ -40,7 +41,7 @@ class CustomSignupForm(SignupForm):
         widget=forms.RadioSelect,
         label='Do you use a wheeled mobility device?'
     )
-    mobility_devices = forms.ModelMultipleChoiceField(
+    mobility_devices = LookupModelMultipleChoiceField(
         queryset=MobilityDevice.objects.all(),
         required=False,
         widget=forms.CheckboxSelectMultiple,
@@ -52,13 +53,13 @@ class CustomSignupForm(SignupForm):
         label='Please specify other mobility device',
         widget=forms.TextInput(attrs={'placeholder': 'Specify other device'})
     )
-    county = forms.ModelChoiceField(
+    county = LookupModelChoiceField(
         queryset=County.objects.all(),
         label='County',
         required=True,
         empty_label='Select county'
     )
-    age_group = forms.ModelChoiceField(
+    age_group = LookupModelChoiceField(
         queryset=AgeGroup.objects.all(),
         label='Age Group',
         required=True,
@@ -189,12 +190,12 @@ class UserProfileForm(forms.ModelForm):
     last_name = forms.CharField(
         max_length=30,
         required=True, label='Last Name')
-    age_group = forms.ModelChoiceField(
+    age_group = LookupModelChoiceField(
         queryset=AgeGroup.objects.all(),
         required=True,
         empty_label=None
     )
-    mobility_devices = forms.ModelMultipleChoiceField(
+    mobility_devices = LookupModelMultipleChoiceField(
         queryset=MobilityDevice.objects.all(),
         required=False,
         widget=forms.CheckboxSelectMultiple,
@@ -0,0 +1,155 @@
+"""
+Maintenance of BusinessSearchDocument, the denormalised row the search endpoints read.
+
+- refresh_search_documents: rebuilds the documents of the given businesses (called by
+  businesses.signals whenever a business, its categories or features, or its tier change).
+- rebuild_search_documents: (re)builds documents in batches, for backfills and repairs.
+- feature_bit / feature_mask: the accessibility feature bitmask stored on each document.
+"""
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Concat
+
+from .models import Business, BusinessSearchDocument
+from .serializers import business_tier, search_results_queryset, serialize_business, serialize_business_detail
+
+# Text search configuration used both when building and when querying documents
+SEARCH_CONFIG = 'english'
+
+# Result ordering by membership tier; businesses without a tier rank as free
+TIER_RANKS = {'premium': 1, 'standard': 2, 'free': 3}
+
+# Accessibility feature ids 1-63 map to bits 0-62 of the signed 64-bit mask
+MAX_FEATURE_BIT_ID = 63
+
+# Columns rewritten when an existing document is refreshed
+DOCUMENT_FIELDS = (
+    'business_name',
+    'tier',
+    'tier_rank',
+    'verified_by_wheelers',
+    'is_approved',
+    'category_ids',
+    'feature_ids',
+    'feature_mask',
+    'location',
+    'payload',
+    'detail',
+    'updated_at',
+)
+
+REBUILD_BATCH_SIZE = 500
+
+
+def feature_bit(feature_id):
+    """Return the bitmask value for an accessibility feature id (0 if it has no bit)."""
+    if not 1 <= feature_id <= MAX_FEATURE_BIT_ID:
+        return 0
+    return 1 << (feature_id - 1)
+
+
+def feature_mask(feature_ids):
+    """Combine accessibility feature ids into a single bitmask."""
+    mask = 0
+    for feature_id in feature_ids:
+        mask |= feature_bit(feature_id)
+    return mask
+
+
+def search_vector_expression():
+    """
+    Build the weighted tsvector expression for a BusinessSearchDocument row.
+
+    Weights: business name (A) > category names and tags (B) > description (C)
+    > services offered (D). Text that is not copied onto the document is read
+    with correlated subqueries so the expression can be used directly in an UPDATE.
+    """
+    through_model = Business.categories.through
+    category_text = Subquery(
+        through_model.objects
+        .filter(business=OuterRef('business_id'))
+        .values('business')
+        .annotate(text=StringAgg(
+            Concat('category__name', Value(' '), Cast('category__tags', TextField())),
+            delimiter=' ',
+        ))
+        .values('text')[:1],
+        output_field=TextField(),
+    )
+    business = Business.objects.filter(pk=OuterRef('business_id'))
+    description = Subquery(business.values('description')[:1], output_field=TextField())
+    services = Subquery(business.values('services_offered')[:1], output_field=TextField())
+    return (
+        SearchVector('business_name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(category_text, weight='B', config=SEARCH_CONFIG)
+        + SearchVector(description, weight='C', config=SEARCH_CONFIG)
+        + SearchVector(services, weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def build_document(biz):
+    """Return the (unsaved) search document for a business prepared by search_results_queryset."""
+    tier = business_tier(biz)
+    # .all() reads from the prefetch cache
+    feature_ids = [f.id for f in biz.accessibility_features.all()]
+    return BusinessSearchDocument(
+        business=biz,
+        business_name=biz.business_name,
+        tier=tier,
+        tier_rank=TIER_RANKS.get(tier, TIER_RANKS['free']),
+        verified_by_wheelers=biz.verified_by_wheelers,
+        is_approved=biz.is_approved,
+        category_ids=[c.id for c in biz.categories.all()],
+        feature_ids=feature_ids,
+        feature_mask=feature_mask(feature_ids),
+        location=biz.location,
+        payload=serialize_business(biz),
+        detail=serialize_business_detail(biz),
+    )
+
+
+def refresh_search_documents(business_ids):
+    """
+    Rebuild the search documents for the given business ids.
+
+    Costs a fixed number of queries however many ids are given: the serialiser's
+    reads, one upsert of the documents and one UPDATE of their search vectors.
+    Returns the number of documents written.
+    """
+    business_ids = list(business_ids)
+    if not business_ids:
+        return 0
+    documents = [
+        build_document(biz)
+        for biz in search_results_queryset(Business.objects.filter(pk__in=business_ids))
+    ]
+    if not documents:
+        return 0
+    BusinessSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['business'],
+        update_fields=DOCUMENT_FIELDS,
+    )
+    BusinessSearchDocument.objects.filter(pk__in=[d.business_id for d in documents]).update(
+        search_vector=search_vector_expression()
+    )
+    return len(documents)
+
+
+def rebuild_search_documents(missing_only=False, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Rebuild search documents for every business (or only those without one) in batches.
+
+    Returns the number of documents written.
+    """
+    qs = Business.objects.order_by('pk')
+    if missing_only:
+        qs = qs.filter(search_document__isnull=True)
+    business_ids = list(qs.values_list('pk', flat=True))
+    written = 0
+    for start in range(0, len(business_ids), batch_size):
+        written += refresh_search_documents(business_ids[start:start + batch_size])
+    return written
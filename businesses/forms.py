@@ -3,12 +3,17 @@ Forms for the businesses app.
 
 - BusinessRegistrationForm: Handles business registration with custom validation and widget logic.
 - BusinessUpdateForm: Handles business updates, omitting membership tier and supporting logo removal.
+
+Categories, accessibility features and membership tiers are served from the lookup
+table cache (core.lookups), so rendering and validating the forms costs no queries for them.
 """
 
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.text import slugify
 from .models import Business, MembershipTier, AccessibilityFeature, Category
+from core import lookups
+from core.fields import LookupModelChoiceField, LookupModelMultipleChoiceField
 from core.widgets import MapLibrePointWidget
 from core.validators import validate_logo
 
@@ -83,14 +88,14 @@ class BusinessRegistrationForm(forms.ModelForm):
         required=False,
         label="Instagram Profile URL"
     )
-    categories = forms.ModelMultipleChoiceField(
+    categories = LookupModelMultipleChoiceField(
         queryset=None,  # Set in __init__
         widget=forms.SelectMultiple,
         label="Business Categories*",
         help_text="Select the categories that describe your business.",
         required=False
     )
-    accessibility_features = forms.ModelMultipleChoiceField(
+    accessibility_features = LookupModelMultipleChoiceField(
         queryset=None,  # Set in __init__
         widget=forms.SelectMultiple,
         required=True,
@@ -132,6 +137,9 @@ class BusinessRegistrationForm(forms.ModelForm):
             'logo',
             'membership_tier',
         ]
+        field_classes = {
+            'membership_tier': LookupModelChoiceField,
+        }
         labels = {
             'street_address1': 'Street address (building and number)',
             'street_address2': 'Address line 2 (suite, unit, etc.)',
@@ -153,18 +161,18 @@ class BusinessRegistrationForm(forms.ModelForm):
         # only configure membership_tier if it still exists
         if 'membership_tier' in self.fields:
             self.fields['membership_tier'].queryset = MembershipTier.objects.filter(is_active=True)
-            self.fields['membership_tier'].queryset = MembershipTier.objects.filter(is_active=True)
+            self.fields['membership_tier'].select = lambda tiers: [t for t in tiers if t.is_active]
             self.fields['membership_tier'].empty_label = "Select a membership tier"
-            try:
-                free_tier = MembershipTier.objects.filter(tier__iexact='Free', is_active=True).first()
-                if free_tier:
-                    self.initial['membership_tier'] = free_tier.pk
-            except MembershipTier.DoesNotExist:
-                pass
+            free_tier = lookups.find('membership_tiers', tier='free', is_active=True)
+            if free_tier:
+                self.initial['membership_tier'] = free_tier.pk
         # Make location input required in HTML
         self.fields['location'].widget.attrs['required'] = True
         # purchase categories by group and name so grouping works correctly
         self.fields['categories'].queryset = Category.objects.all().order_by('group_description', 'name')
+        self.fields['categories'].select = lambda categories: sorted(
+            categories, key=lambda c: (c.group_description is None, c.group_description or '', c.name)
+        )
         self.fields['accessibility_features'].queryset = AccessibilityFeature.objects.all()
 
     def clean_location(self):
@@ -200,7 +208,7 @@ class BusinessRegistrationForm(forms.ModelForm):
         Ensures at least one category is provided.
         """
         categories = self.cleaned_data.get('categories')
-        if not categories or not categories.exists():
+        if not categories:
             raise forms.ValidationError('Select at least one category.')
         return categories
 
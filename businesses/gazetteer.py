@@ -0,0 +1,116 @@
+"""
+Offline gazetteer for location searches.
+
+- normalise_place: the indexed form of a postcode, outcode or town name.
+- find_place: recognises a search term naming a postcode ("SW1A 1AA"), postcode
+  district ("SW1A"), postcode sector ("SW1A 1") or town ("Leeds") and returns its Place.
+- split_location: recognises a bare postcode or district, or "[<term>] in|near <place>".
+  A bare town name stays a text search, as towns ("Reading", "Bath") are also words.
+- location_params: rewrites search parameters so a recognised place becomes a
+  radius search around its centroid, nearest first, unless `in_view` asks for the
+  map viewport instead.
+
+Lookups are single index probes on Place.normalised; no geocoding service is called.
+"""
+
+import re
+
+from .models import Place
+from .tags import normalise_tag
+
+POSTCODE_RE = re.compile(r'^([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{2})$')
+OUTCODE_RE = re.compile(r'^[A-Z]{1,2}\d[A-Z\d]?$')
+SECTOR_RE = re.compile(r'^([A-Z]{1,2}\d[A-Z\d]?)\s*(\d)$')
+LOCATION_SPLIT_RE = re.compile(r'^(?:(.*\S)\s+)?(?:in|near)\s+(\S.*)$', re.IGNORECASE)
+
+# Longer terms are never place names
+MAX_PLACE_LENGTH = 100
+# Search radius around each kind of place, in metres
+PLACE_RADII_M = {'postcode': 1000, 'outcode': 3000, 'town': 8000}
+BOUNDS_PARAMS = ('min_lat', 'min_lng', 'max_lat', 'max_lng')
+
+
+def normalise_place(name, kind):
+    """Postcodes and outcodes upper case without spaces; towns lower case without accents."""
+    if kind in ('postcode', 'outcode'):
+        return ''.join(name.upper().split())
+    return normalise_tag(name)
+
+
+def find_place(text, towns=True):
+    """Return the Place named by `text` (a town only if `towns`), or None if it does not name one."""
+    text = ' '.join(text.split())
+    if not text or len(text) > MAX_PLACE_LENGTH:
+        return None
+    upper = text.upper()
+    match = POSTCODE_RE.match(upper)
+    if match:
+        place = Place.objects.filter(kind='postcode', normalised=''.join(match.groups())).first()
+        # an unknown (e.g. new) postcode still locates its district
+        return place or Place.objects.filter(kind='outcode', normalised=match.group(1)).first()
+    if OUTCODE_RE.match(upper):
+        return Place.objects.filter(kind='outcode', normalised=upper).first()
+    match = SECTOR_RE.match(upper)
+    if match:
+        # a sector has no centroid of its own: use its first postcode
+        return (
+            Place.objects.filter(kind='postcode', normalised__startswith=''.join(match.groups()))
+            .order_by('normalised').first()
+        )
+    if not towns:
+        return None
+    return Place.objects.filter(kind='town', normalised=normalise_place(text, 'town')).first()
+
+
+def split_location(term):
+    """
+    Split a search term into (text, place).
+
+    The whole term may be a postcode or district ("LS1 4AP" -> ('', LS1 4AP)) or end
+    with "in/near <place>" ("cafe in Leeds" -> ('cafe', Leeds), "near Leeds" -> ('', Leeds));
+    otherwise (term, None), so a bare "Leeds" is searched as text.
+    """
+    place = find_place(term, towns=False)
+    if place:
+        return '', place
+    match = LOCATION_SPLIT_RE.match(term)
+    if match:
+        place = find_place(match.group(2))
+        if place:
+            return match.group(1) or '', place
+    return term, None
+
+
+def location_params(params, term):
+    """
+    Return (params, term, place) for a search.
+
+    When the term names a place and no lat/lng were sent, `params` is a copy with
+    the place's centroid as lat/lng, a radius_m for its kind and sort=nearest (unless
+    given), and without the viewport bounds; `term` is what remains of the search
+    term. With `in_view` (the map was moved after the search) the place is only
+    dropped from `q` and the viewport bounds are kept, with place None. Otherwise the
+    arguments are returned unchanged with place None.
+    """
+    if not term or params.get('lat') or params.get('lng'):
+        return params, term, None
+    term, place = split_location(term)
+    if place is None:
+        return params, term, None
+    params = params.copy()
+    if params.get('in_view'):
+        params['q'] = term
+        return params, term, None
+    for key in BOUNDS_PARAMS:
+        params.pop(key, None)
+    params['q'] = term
+    params['lat'] = str(place.location.y)
+    params['lng'] = str(place.location.x)
+    params.setdefault('radius_m', str(PLACE_RADII_M[place.kind]))
+    params.setdefault('sort', 'nearest')
+    return params, term, place
+
+
+def place_payload(place):
+    """JSON-serialisable summary of a Place for search responses."""
+    return {'name': place.name, 'kind': place.kind, 'lat': place.location.y, 'lng': place.location.x}
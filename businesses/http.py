@@ -0,0 +1,83 @@
+"""
+HTTP helpers for the businesses JSON API.
+
+- compress_response: negotiates Brotli (when the optional `brotli` package is
+  installed) or gzip for large responses.
+- json_stream / ndjson_stream: encode an iterable of results incrementally for
+  StreamingHttpResponse.
+"""
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # optional: fall back to gzip only
+    brotli = None
+
+# Smaller bodies are sent as they are: compressing them saves little and costs CPU
+MIN_COMPRESS_BYTES = 1024
+
+
+def accepted_encodings(request):
+    """Return the content codings the client accepts (ignoring q=0 entries)."""
+    encodings = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if coding:
+            encodings.add(coding.lower())
+    return encodings
+
+
+def compress_response(request, response):
+    """
+    Compress a non-streaming 200 response with Brotli or gzip when the client
+    accepts it and the body is large enough; always varies on Accept-Encoding.
+    """
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if (
+        response.status_code != 200
+        or response.streaming
+        or response.has_header('Content-Encoding')
+        or len(response.content) < MIN_COMPRESS_BYTES
+    ):
+        return response
+    encodings = accepted_encodings(request)
+    if brotli is not None and 'br' in encodings:
+        compressed, coding = brotli.compress(response.content), 'br'
+    elif 'gzip' in encodings:
+        compressed, coding = compress_string(response.content), 'gzip'
+    else:
+        return response
+    if len(compressed) >= len(response.content):
+        return response
+    response.content = compressed
+    response['Content-Length'] = str(len(compressed))
+    response['Content-Encoding'] = coding
+    return response
+
+
+def json_stream(key, items, extra=None):
+    """
+    Yield a JSON object whose `key` holds the items as an array, one item per chunk.
+
+    `extra` members are written before the array so clients can read them first.
+    """
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield '{'
+    for name, value in (extra or {}).items():
+        yield f"{encoder.encode(name)}:{encoder.encode(value)},"
+    yield f"{encoder.encode(key)}:["
+    for index, item in enumerate(items):
+        yield (',' if index else '') + encoder.encode(item)
+    yield ']}'
+
+
+def ndjson_stream(items):
+    """Yield each item as one line of newline-delimited JSON."""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for item in items:
+        yield encoder.encode(item) + '\n'
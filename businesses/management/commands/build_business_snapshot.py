@@ -0,0 +1,24 @@
+# python manage.py build_business_snapshot [--full]
+from django.core.management.base import BaseCommand
+
+from businesses.snapshot import build_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Updates the public GeoJSON and FlatGeobuf snapshots of all businesses from the '
+        'businesses changed since the last build.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild from every business, ignoring the last build')
+
+    def handle(self, *args, **options):
+        summary = build_snapshot(full=options['full'])
+        if not summary['written']:
+            self.stdout.write('Snapshot is up to date')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot written: {summary['total']} businesses "
+            f"({summary['changed']} changed, {summary['removed']} removed)"
+        ))
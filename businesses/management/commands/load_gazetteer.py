@@ -0,0 +1,65 @@
+# python manage.py load_gazetteer places.csv [--replace]
+import csv
+
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from businesses.gazetteer import normalise_place
+from businesses.models import Place
+
+KINDS = {kind for kind, _ in Place.KIND_CHOICES}
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads gazetteer places (postcodes, postcode districts and towns) from a CSV file '
+        'with the columns name, kind, latitude, longitude. Existing places are updated.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='Path of the CSV file')
+        parser.add_argument('--replace', action='store_true', help='Delete every existing place first')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Places written per batch')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_path'], newline='', encoding='utf-8-sig') as f, transaction.atomic():
+                if options['replace']:
+                    Place.objects.all().delete()
+                loaded = self.load(csv.DictReader(f), options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['csv_path']}: {e}")
+        self.stdout.write(self.style.SUCCESS(f'Loaded {loaded} places'))
+
+    def load(self, rows, batch_size):
+        """Upsert the places in `rows` in batches; returns the number loaded."""
+        batch = []
+        loaded = 0
+        for line, row in enumerate(rows, start=2):
+            try:
+                name = row['name'].strip()
+                kind = row['kind'].strip().lower()
+                location = Point(float(row['longitude']), float(row['latitude']), srid=4326)
+            except (AttributeError, KeyError, TypeError, ValueError):
+                raise CommandError(f"Line {line}: expected name, kind, latitude and longitude.")
+            if kind not in KINDS or not name:
+                raise CommandError(f"Line {line}: kind must be one of {', '.join(sorted(KINDS))}.")
+            batch.append(Place(name=name, kind=kind, normalised=normalise_place(name, kind), location=location))
+            if len(batch) >= batch_size:
+                loaded += self.write(batch)
+                batch = []
+        if batch:
+            loaded += self.write(batch)
+        return loaded
+
+    def write(self, batch):
+        # a name repeated within a batch would make the upsert touch one row twice
+        unique = {(place.kind, place.normalised): place for place in batch}
+        Place.objects.bulk_create(
+            unique.values(),
+            update_conflicts=True,
+            unique_fields=['kind', 'normalised'],
+            update_fields=['name', 'location'],
+        )
+        return len(unique)
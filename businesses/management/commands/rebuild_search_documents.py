@@ -0,0 +1,16 @@
+# python manage.py rebuild_search_documents [--missing-only]
+from django.core.management.base import BaseCommand
+
+from businesses.documents import rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalised search documents read by the business search endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing-only', action='store_true', help='Only build documents for businesses without one')
+        parser.add_argument('--batch-size', type=int, default=500, help='Businesses refreshed per batch')
+
+    def handle(self, *args, **options):
+        written = rebuild_search_documents(missing_only=options['missing_only'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} search documents'))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-17 09:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """Populate the search document for existing businesses."""
+    Business = apps.get_model('businesses', 'Business')
+    through = Business.categories.through
+    category_text = Subquery(
+        through.objects
+        .filter(business=OuterRef('pk'))
+        .values('business')
+        .annotate(text=StringAgg(
+            Concat('category__name', Value(' '), Cast('category__tags', TextField())),
+            delimiter=' ',
+        ))
+        .values('text')[:1],
+        output_field=TextField(),
+    )
+    Business.objects.update(search_vector=(
+        SearchVector('business_name', weight='A', config='english')
+        + SearchVector(category_text, weight='B', config='english')
+        + SearchVector('description', weight='C', config='english')
+        + SearchVector('services_offered', weight='D', config='english')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='business_search_vector_gin'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
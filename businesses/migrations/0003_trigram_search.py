@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 10:41
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def backfill_search_tags(apps, schema_editor):
+    """Flatten existing category tags into the trigram-indexed search_tags column."""
+    Category = apps.get_model('businesses', 'Category')
+    categories = list(Category.objects.all())
+    for category in categories:
+        category.search_tags = ' '.join(str(tag) for tag in (category.tags or []))
+    Category.objects.bulk_update(categories, ['search_tags'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0002_business_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='category',
+            name='search_tags',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_tags, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['business_name'], name='business_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='category_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_tags'], name='category_search_tags_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
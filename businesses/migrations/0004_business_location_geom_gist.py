@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:05
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0003_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('location', django.contrib.gis.db.models.fields.PointField(srid=4326)), name='business_location_geom_gist'),
+        ),
+    ]
@@ -0,0 +1,149 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:20
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Concat
+
+TIER_RANKS = {'premium': 1, 'standard': 2, 'free': 3}
+BACKFILL_BATCH_SIZE = 500
+
+
+def search_payload(biz, tier):
+    """Copy of the search payload built by businesses.serializers at this migration, frozen."""
+    paid = tier != 'free'
+    return {
+        'id': biz.id,
+        'business_name': biz.business_name,
+        'categories': [c.name for c in biz.categories.all()],
+        'street_address1': biz.street_address1,
+        'street_address2': biz.street_address2,
+        'town_or_city': biz.town_or_city,
+        'county': biz.county,
+        'postcode': biz.postcode,
+        'location': {'lat': biz.location.y, 'lng': biz.location.x} if biz.location else None,
+        'is_wheeler_verified': biz.verified_by_wheelers,
+        'accessibility_features': [f.name for f in biz.accessibility_features.all()],
+        'public_phone': biz.public_phone,
+        'website': biz.website,
+        'opening_hours': biz.opening_hours,
+        'public_email': biz.public_email if paid else '',
+        'facebook': biz.facebook_url if paid else '',
+        'twitter': biz.x_twitter_url if paid else '',
+        'instagram': biz.instagram_url if paid else '',
+        'description': biz.description if paid else '',
+        'special_offers': biz.special_offers if paid else '',
+        'services_offered': biz.services_offered if paid else '',
+        'logo': biz.logo.url if biz.logo and paid else '',
+        'wheeler_verification_requested': biz.wheeler_verification_requested,
+    }
+
+
+def backfill_search_documents(apps, schema_editor):
+    """Build a search document for every existing business, then their search vectors."""
+    Business = apps.get_model('businesses', 'Business')
+    BusinessSearchDocument = apps.get_model('businesses', 'BusinessSearchDocument')
+    businesses = (
+        Business.objects.select_related('membership_tier')
+        .prefetch_related('categories', 'accessibility_features')
+        .order_by('pk')
+    )
+    documents = []
+    for biz in businesses.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        tier = (biz.membership_tier.tier if biz.membership_tier and biz.membership_tier.tier else 'free').lower()
+        mask = 0
+        for feature in biz.accessibility_features.all():
+            if 1 <= feature.id <= 63:
+                mask |= 1 << (feature.id - 1)
+        documents.append(BusinessSearchDocument(
+            business_id=biz.pk,
+            business_name=biz.business_name,
+            tier=tier,
+            tier_rank=TIER_RANKS.get(tier, TIER_RANKS['free']),
+            verified_by_wheelers=biz.verified_by_wheelers,
+            category_ids=[c.id for c in biz.categories.all()],
+            feature_mask=mask,
+            location=biz.location,
+            payload=search_payload(biz, tier),
+        ))
+        if len(documents) >= BACKFILL_BATCH_SIZE:
+            BusinessSearchDocument.objects.bulk_create(documents)
+            documents = []
+    BusinessSearchDocument.objects.bulk_create(documents)
+
+    category_text = Subquery(
+        Business.categories.through.objects
+        .filter(business=OuterRef('business_id'))
+        .values('business')
+        .annotate(text=StringAgg(
+            Concat('category__name', Value(' '), Cast('category__tags', TextField())),
+            delimiter=' ',
+        ))
+        .values('text')[:1],
+        output_field=TextField(),
+    )
+    business = Business.objects.filter(pk=OuterRef('business_id'))
+    BusinessSearchDocument.objects.update(search_vector=(
+        SearchVector('business_name', weight='A', config='english')
+        + SearchVector(category_text, weight='B', config='english')
+        + SearchVector(Subquery(business.values('description')[:1], output_field=TextField()), weight='C', config='english')
+        + SearchVector(Subquery(business.values('services_offered')[:1], output_field=TextField()), weight='D', config='english')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0004_business_location_geom_gist'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='business',
+            name='business_search_vector_gin',
+        ),
+        migrations.RemoveIndex(
+            model_name='business',
+            name='business_name_trgm',
+        ),
+        migrations.RemoveIndex(
+            model_name='business',
+            name='business_location_geom_gist',
+        ),
+        migrations.RemoveField(
+            model_name='business',
+            name='search_vector',
+        ),
+        migrations.CreateModel(
+            name='BusinessSearchDocument',
+            fields=[
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='businesses.business')),
+                ('business_name', models.CharField(max_length=200)),
+                ('tier', models.CharField(choices=[('free', 'Free'), ('standard', 'Standard'), ('premium', 'Premium')], default='free', max_length=20)),
+                ('tier_rank', models.PositiveSmallIntegerField(default=3)),
+                ('verified_by_wheelers', models.BooleanField(default=False)),
+                ('category_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None)),
+                ('feature_mask', models.BigIntegerField(default=0)),
+                ('location', django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [
+                    django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='search_doc_vector_gin'),
+                    django.contrib.postgres.indexes.GinIndex(fields=['business_name'], name='search_doc_name_trgm', opclasses=['gin_trgm_ops']),
+                    django.contrib.postgres.indexes.GinIndex(fields=['category_ids'], name='search_doc_category_ids_gin'),
+                    django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('location', django.contrib.gis.db.models.fields.PointField(srid=4326)), name='search_doc_location_geom_gist'),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:02
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def backfill_feature_ids(apps, schema_editor):
+    """Copy each business's accessibility feature ids onto its existing search document."""
+    BusinessSearchDocument = apps.get_model('businesses', 'BusinessSearchDocument')
+    Business = apps.get_model('businesses', 'Business')
+    feature_ids = {}
+    for business_id, feature_id in Business.accessibility_features.through.objects.values_list(
+        'business_id', 'accessibilityfeature_id'
+    ):
+        feature_ids.setdefault(business_id, []).append(feature_id)
+    documents = list(BusinessSearchDocument.objects.only('business_id'))
+    for document in documents:
+        document.feature_ids = sorted(feature_ids.get(document.business_id, []))
+    BusinessSearchDocument.objects.bulk_update(documents, ['feature_ids'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0005_businesssearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesssearchdocument',
+            name='feature_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.RunPython(backfill_feature_ids, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='businesssearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['feature_ids'], name='search_doc_feature_ids_gin'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-17 15:10
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalise_tag(text):
+    """Copy of businesses.tags.normalise_tag, frozen for this migration."""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
+
+def backfill_category_tags(apps, schema_editor):
+    """Create CategoryTag rows from every category's tags JSON."""
+    Category = apps.get_model('businesses', 'Category')
+    CategoryTag = apps.get_model('businesses', 'CategoryTag')
+    rows = []
+    for category in Category.objects.all():
+        seen = set()
+        for tag in category.tags or []:
+            normalised = normalise_tag(tag)
+            if normalised and normalised not in seen:
+                seen.add(normalised)
+                rows.append(CategoryTag(category=category, tag=str(tag), normalised=normalised))
+    CategoryTag.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0006_businesssearchdocument_feature_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.TextField()),
+                ('normalised', models.TextField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_rows', to='businesses.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['normalised'], name='category_tag_prefix', opclasses=['text_pattern_ops'])],
+                'constraints': [models.UniqueConstraint(fields=('category', 'normalised'), name='unique_category_tag')],
+            },
+        ),
+        migrations.RunPython(backfill_category_tags, migrations.RunPython.noop),
+    ]
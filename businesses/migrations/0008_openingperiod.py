@@ -0,0 +1,88 @@
+# Generated by Django 5.2.4 on 2026-10-17 15:40
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MINUTES_PER_DAY = 24 * 60
+
+
+def minute_of_day(value):
+    """Copy of businesses.opening_hours.minute_of_day, frozen for this migration."""
+    hours, minutes = value.split(':')[:2]
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time: {value!r}")
+    return hours * 60 + minutes
+
+
+def opening_periods(text):
+    """
+    Copy of businesses.opening_hours.opening_periods, frozen for this migration.
+
+    (weekday, start_minute, end_minute) periods in opening hours JSON, split at midnight.
+    Malformed JSON or day entries give no periods at all, invalid times skip their
+    period, and a period ending at its start is closed.
+    """
+    try:
+        raw = json.loads(text)
+        periods = []
+        for day, info in raw.items():
+            for p in info:
+                start = p.get('start') or p.get('open')
+                end = p.get('end') or p.get('close')
+                if start and end and day in DAYS_OF_WEEK:
+                    periods.append((DAYS_OF_WEEK.index(day), start, end))
+    except (AttributeError, TypeError, ValueError):
+        return set()
+    ranges = set()
+    for weekday, start, end in periods:
+        try:
+            start, end = minute_of_day(start), minute_of_day(end)
+        except (AttributeError, ValueError):
+            continue
+        if start < end:
+            ranges.add((weekday, start, end))
+        elif start > end and start != MINUTES_PER_DAY:
+            ranges.add((weekday, start, MINUTES_PER_DAY))
+            if end:
+                ranges.add(((weekday + 1) % 7, 0, end))
+    return ranges
+
+
+def backfill_opening_periods(apps, schema_editor):
+    """Create OpeningPeriod rows from every business's opening_hours JSON."""
+    Business = apps.get_model('businesses', 'Business')
+    OpeningPeriod = apps.get_model('businesses', 'OpeningPeriod')
+    rows = []
+    for business_id, text in Business.objects.exclude(opening_hours__isnull=True).exclude(opening_hours='').values_list('pk', 'opening_hours'):
+        for weekday, start, end in opening_periods(text):
+            rows.append(OpeningPeriod(business_id=business_id, weekday=weekday, start_minute=start, end_minute=end))
+    OpeningPeriod.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0007_categorytag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('start_minute', models.PositiveSmallIntegerField()),
+                ('end_minute', models.PositiveSmallIntegerField()),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_periods', to='businesses.business')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_minute'],
+                'indexes': [models.Index(fields=['weekday', 'start_minute', 'end_minute', 'business'], name='opening_period_range')],
+            },
+        ),
+        migrations.RunPython(backfill_opening_periods, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-17 16:30
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0008_openingperiod'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Place',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('postcode', 'Postcode'), ('outcode', 'Postcode district'), ('town', 'Town')], max_length=10)),
+                ('normalised', models.CharField(max_length=100)),
+                ('location', django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['normalised'], name='place_normalised_prefix', opclasses=['text_pattern_ops'])],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'normalised'), name='unique_place')],
+            },
+        ),
+    ]
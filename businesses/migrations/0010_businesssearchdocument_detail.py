@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:05
+
+from django.db import migrations, models
+
+# Keys of the old search payload kept in the slim payload; the rest move to `detail`
+SLIM_KEYS = ('id', 'business_name', 'categories', 'town_or_city', 'location', 'is_wheeler_verified', 'logo', 'wheeler_verification_requested')
+DETAIL_KEYS = (
+    'id', 'street_address1', 'street_address2', 'town_or_city', 'county', 'postcode', 'accessibility_features',
+    'public_phone', 'website', 'opening_hours', 'public_email', 'facebook', 'twitter', 'instagram',
+    'description', 'special_offers', 'services_offered',
+)
+
+
+def split_payloads(apps, schema_editor):
+    """Split each existing document's payload into the slim payload and its details."""
+    BusinessSearchDocument = apps.get_model('businesses', 'BusinessSearchDocument')
+    documents = list(BusinessSearchDocument.objects.only('business_id', 'tier', 'feature_ids', 'payload'))
+    for document in documents:
+        old = document.payload
+        document.detail = {key: old.get(key, '') for key in DETAIL_KEYS}
+        document.payload = dict(
+            {key: old.get(key) for key in SLIM_KEYS},
+            tier=document.tier,
+            accessibility_feature_ids=list(document.feature_ids),
+        )
+    BusinessSearchDocument.objects.bulk_update(documents, ['payload', 'detail'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0009_place'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesssearchdocument',
+            name='detail',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(split_payloads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:35
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def backfill_is_approved(apps, schema_editor):
+    """Copy each business's approval onto its existing search document."""
+    BusinessSearchDocument = apps.get_model('businesses', 'BusinessSearchDocument')
+    Business = apps.get_model('businesses', 'Business')
+    BusinessSearchDocument.objects.filter(
+        business__in=Business.objects.filter(is_approved=True)
+    ).update(is_approved=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0010_businesssearchdocument_detail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesssearchdocument',
+            name='is_approved',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_is_approved, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='businesssearchdocument',
+            name='search_doc_location_geom_gist',
+        ),
+        migrations.AddIndex(
+            model_name='businesssearchdocument',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('location', django.contrib.gis.db.models.fields.PointField(srid=4326)), condition=models.Q(('is_approved', True)), name='search_doc_approved_geom_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='businesssearchdocument',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['tier_rank', 'business'], name='search_doc_approved_tier'),
+        ),
+    ]
@@ -1,10 +1,16 @@
 """
 Models for the businesses app, including MembershipTier, Business, and WheelerVerification.
-Defines business tiers, business details, and accessibility/verification features.
+Defines business tiers, business details, and accessibility/verification features, plus
+the denormalised BusinessSearchDocument read by the search endpoints.
 """
 
 from django.contrib.gis.db import models as geomodels
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Cast
 from core.validators import validate_logo
 
 TIER_CHOICES = [
@@ -49,12 +55,40 @@ class Category(models.Model):
     group_code = models.CharField(max_length=30, blank=True, null=True, help_text="Group code for category grouping (e.g. 'retail', 'food_drink')")
     group_description = models.CharField(max_length=200, blank=True, null=True, help_text="Description of the group (e.g. 'Retail', 'Food & Drink')")
     tags = models.JSONField(default=list, blank=True)
+    # Space-separated copy of `tags` for trigram matching, maintained by businesses.signals
+    search_tags = models.TextField(blank=True, default='', editable=False)
 
     def __str__(self):
         return f"{self.name} ({self.group_description})" if self.group_description else self.name
 
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='category_name_trgm'),
+            GinIndex(fields=['search_tags'], opclasses=['gin_trgm_ops'], name='category_search_tags_trgm'),
+        ]
+
+
+class CategoryTag(models.Model):
+    """
+    One tag of a Category, normalised (lowercase, accents stripped) for indexed prefix
+    lookups. Category.tags stays the source of truth; rows are synced by businesses.signals.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='tag_rows')
+    tag = models.TextField()
+    normalised = models.TextField()
+
+    class Meta:
+        indexes = [
+            # text_pattern_ops lets `LIKE 'prefix%'` use the index under any collation
+            models.Index(fields=['normalised'], opclasses=['text_pattern_ops'], name='category_tag_prefix'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'normalised'], name='unique_category_tag'),
+        ]
+
+    def __str__(self):
+        return self.tag
 
 
 class Business(models.Model):
@@ -101,3 +135,112 @@ class Business(models.Model):
         """String representation returns the business name."""
         return self.business_name
 
+
+class OpeningPeriod(models.Model):
+    """
+    One period a business is open, in minutes from midnight on a weekday (0 = Monday).
+
+    Derived from Business.opening_hours by businesses.signals; periods running past
+    midnight are stored as two rows so every row satisfies start_minute < end_minute.
+    """
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='opening_periods')
+    weekday = models.PositiveSmallIntegerField()
+    start_minute = models.PositiveSmallIntegerField()
+    end_minute = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['weekday', 'start_minute']
+        indexes = [
+            # "open at" is an equality on weekday plus a range on the minutes
+            models.Index(fields=['weekday', 'start_minute', 'end_minute', 'business'], name='opening_period_range'),
+        ]
+
+    def __str__(self):
+        return f"{self.business_id}: day {self.weekday} {self.start_minute}-{self.end_minute}"
+
+
+class Place(models.Model):
+    """
+    A gazetteer entry: a postcode, postcode district (outcode) or town and its centroid.
+
+    Loaded from CSV by the load_gazetteer command; search terms naming a place become
+    searches around its centroid (see businesses.gazetteer).
+    """
+    KIND_CHOICES = [
+        ('postcode', 'Postcode'),
+        ('outcode', 'Postcode district'),
+        ('town', 'Town'),
+    ]
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Postcodes upper case without spaces, towns lower case without accents
+    normalised = models.CharField(max_length=100)
+    location = geomodels.PointField(geography=True)
+
+    class Meta:
+        indexes = [
+            # text_pattern_ops serves both exact and `LIKE 'prefix%'` lookups
+            models.Index(fields=['normalised'], opclasses=['text_pattern_ops'], name='place_normalised_prefix'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'normalised'], name='unique_place'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class BusinessSearchDocument(models.Model):
+    """
+    Denormalised search row for a Business, maintained by businesses.signals.
+
+    Only approved businesses are searchable (see businesses.search.searchable_documents);
+    the location and tier indexes are partial indexes over those rows.
+
+    Holds the slim search payload and the public, tier-gated details alongside
+    everything the search endpoints filter and order on, so a search (or the
+    details of one result) is a single indexed table read.
+    """
+    business = models.OneToOneField(Business, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    business_name = models.CharField(max_length=200)
+    tier = models.CharField(max_length=20, choices=TIER_CHOICES, default='free')
+    # Display order of the tier: 1 premium, 2 standard, 3 free
+    tier_rank = models.PositiveSmallIntegerField(default=3)
+    verified_by_wheelers = models.BooleanField(default=False)
+    # Copy of Business.is_approved: only approved businesses are searchable
+    is_approved = models.BooleanField(default=False)
+    category_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    # Accessibility feature ids, for index-backed "all of" / "any of" filtering
+    feature_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    # Bit n-1 is set when the business has the accessibility feature with id n (drawn on map tiles)
+    feature_mask = models.BigIntegerField(default=0)
+    location = geomodels.PointField(geography=True)
+    # Weighted full-text document: name (A) > categories/tags (B) > description (C) > services (D)
+    search_vector = SearchVectorField(null=True, blank=True)
+    # Serialised slim search result (see businesses.serializers.serialize_business)
+    payload = models.JSONField(default=dict)
+    # Serialised details of an expanded result (see businesses.serializers.serialize_business_detail)
+    detail = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='search_doc_vector_gin'),
+            GinIndex(fields=['business_name'], opclasses=['gin_trgm_ops'], name='search_doc_name_trgm'),
+            GinIndex(fields=['category_ids'], name='search_doc_category_ids_gin'),
+            GinIndex(fields=['feature_ids'], name='search_doc_feature_ids_gin'),
+            # Planar index of approved businesses for map viewport envelope queries
+            # (see businesses.search.location_geometry)
+            GistIndex(
+                Cast('location', geomodels.PointField(srid=4326)),
+                name='search_doc_approved_geom_gist',
+                condition=Q(is_approved=True),
+            ),
+            # Approved businesses in display order of their tier
+            models.Index(fields=['tier_rank', 'business'], name='search_doc_approved_tier', condition=Q(is_approved=True)),
+        ]
+
+    def __str__(self):
+        """String representation returns the business name."""
+        return self.business_name
+
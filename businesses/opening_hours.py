@@ -0,0 +1,188 @@
+"""
+Opening hours helpers.
+
+Business.opening_hours is JSON text keyed by day name, each day holding a list of
+{"start": "HH:MM", "end": "HH:MM"} periods (older entries use "open"/"close").
+
+- compile_opening_hours: parses the JSON text once into an immutable OpeningHours, with
+  the 12-hour display strings already rendered, memoised by content hash in a bounded LRU.
+- display_time: 24-hour "HH:MM" to 12-hour display, memoised (used by time_extras.format_time).
+- opening_periods: (weekday, start_minute, end_minute) rows for the OpeningPeriod table.
+- sync_opening_periods: rewrites a business's OpeningPeriod rows (called by businesses.signals).
+- parse_open_at: reads the open_now / open_at search parameters.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import OpeningPeriod
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MINUTES_PER_DAY = 24 * 60
+
+# Distinct opening hours texts kept compiled per worker
+COMPILED_CACHE_SIZE = 1024
+
+
+class Period(NamedTuple):
+    """One opening period as stored ("HH:MM") and as displayed ("9:00 am - 5:30 pm")."""
+    start: str
+    end: str
+    display: str
+
+
+class OpeningHours(NamedTuple):
+    """
+    Compiled opening hours.
+
+    `days` holds (day name, periods) pairs in stored order, for rendering tables;
+    `ranges` holds the (weekday, start_minute, end_minute) rows split at midnight.
+    """
+    days: tuple
+    ranges: tuple
+
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def minute_of_day(value):
+    """Minutes from midnight for an "HH:MM" (or "HH:MM:SS") time. Raises ValueError if invalid."""
+    hours, minutes = value.split(':')[:2]
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time: {value!r}")
+    return hours * 60 + minutes
+
+
+@lru_cache(maxsize=MINUTES_PER_DAY * 2)
+def display_time(value):
+    """
+    Convert a 24-hour "HH:MM" time to 12-hour format with am/pm, e.g. "15:30" -> "3:30 pm".
+    Values that are not valid times are returned unchanged.
+    """
+    try:
+        minute = minute_of_day(value)
+    except (AttributeError, ValueError):
+        return value
+    hour, minute = divmod(minute % MINUTES_PER_DAY, 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'am' if hour < 12 else 'pm'}"
+
+
+def day_ranges(weekday, periods):
+    """
+    The (weekday, start_minute, end_minute) rows of a day's periods, split at midnight.
+
+    A period starting and ending at the same time (e.g. "00:00" - "00:00", as left by
+    blank time pickers) is treated as closed; a whole day is "00:00" - "24:00".
+    """
+    ranges = []
+    for period in periods:
+        try:
+            start, end = minute_of_day(period.start), minute_of_day(period.end)
+        except (AttributeError, ValueError):
+            continue
+        if start < end:
+            ranges.append((weekday, start, end))
+        elif start > end and start != MINUTES_PER_DAY:
+            ranges.append((weekday, start, MINUTES_PER_DAY))
+            if end:
+                ranges.append(((weekday + 1) % 7, 0, end))
+    return ranges
+
+
+def build_opening_hours(text):
+    """Parse and compile opening hours JSON text; None when there are none or it is malformed."""
+    try:
+        raw = json.loads(text)
+        days = []
+        ranges = []
+        for day, info in raw.items():
+            periods = []
+            for p in info:
+                start = p.get('start') or p.get('open')
+                end = p.get('end') or p.get('close')
+                if start and end:
+                    periods.append(Period(start, end, f"{display_time(start)} - {display_time(end)}"))
+            days.append((day, tuple(periods)))
+            if day in DAYS_OF_WEEK:
+                ranges.extend(day_ranges(DAYS_OF_WEEK.index(day), periods))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if not days:
+        return None
+    return OpeningHours(tuple(days), tuple(sorted(set(ranges))))
+
+
+def compile_opening_hours(text):
+    """
+    Return the compiled OpeningHours for JSON text, or None when there are none or the
+    JSON is malformed.
+
+    Results are memoised by a hash of the text in an LRU of COMPILED_CACHE_SIZE entries,
+    so every page showing the same hours shares one parse.
+    """
+    if not text:
+        return None
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    with _compiled_lock:
+        if key in _compiled:
+            _compiled.move_to_end(key)
+            return _compiled[key]
+    compiled = build_opening_hours(text)
+    with _compiled_lock:
+        _compiled[key] = compiled
+        if len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+def opening_periods(text):
+    """
+    Return the (weekday, start_minute, end_minute) periods in opening hours JSON text.
+
+    Periods ending before their start run past midnight and are split at it. Periods
+    ending at their start, unknown day names and invalid times are skipped.
+    """
+    compiled = compile_opening_hours(text)
+    return list(compiled.ranges) if compiled else []
+
+
+def sync_opening_periods(business):
+    """Replace the business's OpeningPeriod rows with those in its opening_hours."""
+    OpeningPeriod.objects.filter(business=business).delete()
+    OpeningPeriod.objects.bulk_create(
+        OpeningPeriod(business=business, weekday=weekday, start_minute=start, end_minute=end)
+        for weekday, start, end in opening_periods(business.opening_hours)
+    )
+
+
+def parse_open_at(params):
+    """
+    Return the (weekday, minute) businesses must be open at, or None.
+
+    `open_now` uses the current time; `open_at` takes an ISO date and time, read in
+    OPENING_HOURS_TIME_ZONE unless it carries an offset. Raises ValueError if invalid.
+    """
+    local_zone = ZoneInfo(settings.OPENING_HOURS_TIME_ZONE)
+    if params.get('open_at'):
+        try:
+            moment = datetime.fromisoformat(params['open_at'])
+        except ValueError:
+            raise ValueError("open_at must be an ISO date and time, e.g. 2026-10-17T14:30.")
+        if timezone.is_aware(moment):
+            moment = moment.astimezone(local_zone)
+    elif params.get('open_now') in ('1', 'true', 'on'):
+        moment = timezone.localtime(timezone=local_zone)
+    else:
+        return None
+    return moment.weekday(), moment.hour * 60 + moment.minute
@@ -0,0 +1,330 @@
+"""
+Result cache for map viewport searches.
+
+Viewports are snapped outwards to a small block of map tiles, so users looking
+at the same area with the same term and filters share one cache entry, whatever
+their exact bounds, page or session. Each entry holds every matching result in
+the block with its sort keys; requests are then cut to their exact bounds,
+ordered for their session and paged in Python.
+
+Entries are invalidated by area: every tile (at every cache zoom) carries a
+version stamp that is replaced when a search document at that position changes
+(see invalidate_locations), and an entry is only served while the versions of
+all its tiles are those it was built under. Renaming a category or feature
+changes the vocabulary for every area, so it starts a new cache generation instead.
+
+Entries live in the shared 'default' cache and the generation and tile stamps in the
+'stamps' cache (settings.CACHES), which is never culled, so every worker sees them. Stamps
+are random tokens rather than counters: a stamp that is lost anyway is replaced by a new
+token, which can only invalidate entries, never revive old ones. Stamps are replaced once
+the change's transaction commits, all of a transaction's at once, so a search running
+before the commit cannot cache the old rows under the new stamps. Changes that bypass the
+model signals (queryset.update(), raw SQL) are not seen until entries expire.
+
+Hits and misses are counted per worker, in memory, to keep the hot path free of cache
+writes (see cache_stats).
+"""
+
+import hashlib
+import math
+import secrets
+import threading
+
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache, caches
+from django.db import transaction
+
+from .opening_hours import parse_open_at
+from .search import (
+    apply_search, encode_cursor, filter_attributes, location_geometry, parse_bounds, result_payload,
+    results_validator, search_page,
+)
+
+# Viewports are snapped to tile blocks at zoom levels 0 to MAX_CACHE_ZOOM
+MAX_CACHE_ZOOM = 16
+# Viewports needing more tiles than this are not cached
+MAX_CACHE_TILES = 16
+# Areas with more matching businesses than this are not cached
+MAX_CACHED_ROWS = 2000
+SEARCH_CACHE_TIMEOUT = 60 * 10
+# Web Mercator latitude limit
+MAX_LATITUDE = 85.0511
+
+GENERATION_KEY = 'search_cache:generation'
+
+# This worker's hit and miss counts
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+# Per thread: tile stamp keys to replace when the current transaction commits
+_pending = threading.local()
+
+
+def normalise_term(term):
+    """Case- and whitespace-insensitive form of a search term."""
+    return ' '.join(term.lower().split())
+
+
+def tile_range(lng, lat, zoom):
+    """Return the (x, y) tile containing a WGS84 point at `zoom`."""
+    n = 2 ** zoom
+    lat_rad = math.radians(max(min(lat, MAX_LATITUDE), -MAX_LATITUDE))
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def cache_area(bounds):
+    """
+    Snap parsed viewport bounds to a block of tiles.
+
+    Returns (zoom, x0, y0, x1, y1) at the deepest zoom whose block needs at most
+    MAX_CACHE_TILES tiles, or None when the viewport cannot be cached (no bounds,
+    crossing the antimeridian or reaching beyond the Web Mercator latitude limit).
+    """
+    if bounds is None:
+        return None
+    min_lng, min_lat, max_lng, max_lat = bounds
+    if min_lng > max_lng or min_lat < -MAX_LATITUDE or max_lat > MAX_LATITUDE:
+        return None
+    for zoom in range(MAX_CACHE_ZOOM, -1, -1):
+        x0, y0 = tile_range(min_lng, max_lat, zoom)
+        x1, y1 = tile_range(max_lng, min_lat, zoom)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_CACHE_TILES:
+            return zoom, x0, y0, x1, y1
+    return None
+
+
+def area_polygon(area):
+    """WGS84 bounding box covering a tile block from cache_area."""
+    zoom, x0, y0, x1, y1 = area
+    n = 2 ** zoom
+
+    def tile_lat(y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+    polygon = Polygon.from_bbox((x0 / n * 360 - 180, tile_lat(y1 + 1), (x1 + 1) / n * 360 - 180, tile_lat(y0)))
+    polygon.srid = 4326
+    return polygon
+
+
+def tile_version_key(zoom, x, y):
+    """Cache key of a cache tile's version stamp."""
+    return f"search_cache:tile:{zoom}:{x}:{y}"
+
+
+def area_version_keys(area):
+    """Version stamp keys of every tile in a block."""
+    zoom, x0, y0, x1, y1 = area
+    return [tile_version_key(zoom, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def entry_key(params, term, mode, area):
+    """Cache key for a search of `area` with the given filters, term and matching mode."""
+    access = sorted(set(params.getlist('accessibility')))
+    parts = [
+        normalise_term(term),
+        mode,
+        params.get('category') or '',
+        '|'.join(access),
+        (params.get('accessibility_match') or 'all') if access else '',
+        ':'.join(str(value) for value in area),
+    ]
+    digest = hashlib.md5('\x1f'.join(parts).encode()).hexdigest()
+    return f"search_cache:{current_generation()}:{digest}"
+
+
+def current_generation():
+    """The stamp of the current cache generation, starting a new one if it is missing."""
+    stamps = caches['stamps']
+    generation = stamps.get(GENERATION_KEY)
+    if generation is None:
+        stamps.add(GENERATION_KEY, secrets.token_hex(4), None)
+        generation = stamps.get(GENERATION_KEY)
+    return generation
+
+
+def current_versions(area, create=False):
+    """
+    Return the version stamps of a block's tiles, or None if any is missing.
+
+    With `create`, missing stamps are added first. A stamp evicted from the cache
+    therefore invalidates every entry built under it.
+    """
+    stamps = caches['stamps']
+    keys = area_version_keys(area)
+    versions = stamps.get_many(keys)
+    if create and len(versions) < len(keys):
+        for key in keys:
+            if key not in versions:
+                stamps.add(key, secrets.token_hex(4), None)
+        versions = stamps.get_many(keys)
+    if len(versions) < len(keys):
+        return None
+    return [versions[key] for key in keys]
+
+
+def count(kind):
+    """Increment this worker's 'hits' or 'misses' counter."""
+    with _stats_lock:
+        _stats[kind] += 1
+
+
+def cache_stats():
+    """Return this worker's hit and miss counts of the search result cache."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    """Zero this worker's hit and miss counts."""
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def load_area(params, term, mode, area):
+    """
+    Read every result in a tile block, with its sort keys, for caching.
+
+    Returns a list of (tier_rank, score, business_id, updated_at, payload) tuples,
+    or None when the area holds more than MAX_CACHED_ROWS results.
+    """
+    qs = filter_attributes(params).alias(location_geom=location_geometry()).filter(
+        location_geom__intersects=area_polygon(area)
+    )
+    qs = apply_search(qs, term, mode)
+    scored = mode != 'all'
+    fields = ['tier_rank', 'score'] if scored else ['tier_rank']
+    fields += ['business_id', 'updated_at', 'payload']
+    rows = list(qs.order_by().values_list(*fields)[:MAX_CACHED_ROWS + 1])
+    if len(rows) > MAX_CACHED_ROWS:
+        return None
+    if not scored:
+        rows = [(tier_rank, 0, *rest) for tier_rank, *rest in rows]
+    return rows
+
+
+def in_bounds(payload, bounds):
+    """True if a serialised result lies inside parsed (non-antimeridian) bounds."""
+    location = payload.get('location')
+    if not location:
+        return False
+    min_lng, min_lat, max_lng, max_lat = bounds
+    return min_lng <= location['lng'] <= max_lng and min_lat <= location['lat'] <= max_lat
+
+
+def sort_key(values, scored):
+    """
+    Comparable form of a row's sort values (or a cursor's), following order_results:
+    tier rank, then descending score when `scored`, then shuffle key and id.
+    Raises ValueError for values that do not fit.
+    """
+    try:
+        if scored:
+            tier_rank, score, shuffle_key, business_id = values
+            return (int(tier_rank), -int(score), str(shuffle_key), int(business_id))
+        tier_rank, shuffle_key, business_id = values
+        return (int(tier_rank), str(shuffle_key), int(business_id))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor.")
+
+
+def page_from_rows(rows, bounds, mode, seed, page_size, cursor_values=None):
+    """
+    Order cached rows for a session and cut one page, exactly as search_page would.
+
+    Returns (payloads, next_cursor, validator). Raises ValueError if `cursor_values`
+    do not fit the ordering for `mode`.
+    """
+    scored = mode != 'all'
+    keyed = []
+    for tier_rank, score, business_id, updated_at, payload in rows:
+        if not in_bounds(payload, bounds):
+            continue
+        # same key as order_results: MD5 of the id followed by the seed
+        shuffle_key = hashlib.md5(f"{business_id}{seed}".encode()).hexdigest()
+        values = [tier_rank, score, shuffle_key, business_id] if scored else [tier_rank, shuffle_key, business_id]
+        keyed.append((sort_key(values, scored), values, (business_id, updated_at), payload))
+    keyed.sort(key=lambda row: row[0])
+    if cursor_values is not None:
+        cursor_key = sort_key(cursor_values, scored)
+        keyed = [row for row in keyed if row[0] > cursor_key]
+    page = keyed[:page_size]
+    next_cursor = encode_cursor(mode, page[-1][1]) if len(keyed) > page_size else None
+    validator = results_validator(version for _, _, version, _ in page)
+    return [payload for _, _, _, payload in page], next_cursor, validator
+
+
+def uncached_page(qs, term, mode, seed, page_size, cursor_values=None, point=None, sort='relevance'):
+    """Run search_page and return its results as cached_search_page does."""
+    docs, next_cursor = search_page(qs, term, mode, seed, page_size, cursor_values, point, sort)
+    validator = results_validator((doc.business_id, doc.updated_at) for doc in docs)
+    return [result_payload(doc) for doc in docs], next_cursor, validator
+
+
+def cached_search_page(params, qs, term, mode, seed, page_size, cursor_values=None, point=None, sort='relevance'):
+    """
+    Return one page of serialised results, from the cache when the viewport allows it.
+
+    `qs` is the fully filtered queryset, used when the request cannot be cached.
+    Searches around a `point` (distances, radius, nearest first) are never cached,
+    nor are searches filtered by opening time, whose results change minute by minute.
+    Returns (payloads, next_cursor, validator) where validator is results_validator
+    for the page; raises ValueError like search_page.
+    """
+    if point is not None or parse_open_at(params) is not None:
+        return uncached_page(qs, term, mode, seed, page_size, cursor_values, point, sort)
+    bounds = parse_bounds(params)
+    area = cache_area(bounds)
+    if area is None:
+        return uncached_page(qs, term, mode, seed, page_size, cursor_values)
+    key = entry_key(params, term, mode, area)
+    entry = cache.get(key)
+    if entry is not None and entry['versions'] == current_versions(area):
+        count('hits')
+        return page_from_rows(entry['rows'], bounds, mode, seed, page_size, cursor_values)
+    count('misses')
+    # stamp the tiles before reading, so a change made during the read invalidates the entry
+    versions = current_versions(area, create=True)
+    rows = load_area(params, term, mode, area)
+    if rows is None:
+        return uncached_page(qs, term, mode, seed, page_size, cursor_values)
+    if versions is not None:
+        cache.set(key, {'versions': versions, 'rows': rows}, SEARCH_CACHE_TIMEOUT)
+    return page_from_rows(rows, bounds, mode, seed, page_size, cursor_values)
+
+
+def invalidate_locations(locations):
+    """
+    Replace the version stamps of every cache tile, at every zoom, holding one of
+    `locations`, once the current transaction commits (at once outside a transaction).
+    """
+    keys = set()
+    for location in locations:
+        if location is None:
+            continue
+        for zoom in range(MAX_CACHE_ZOOM + 1):
+            keys.add(tile_version_key(zoom, *tile_range(location.x, location.y, zoom)))
+    if keys:
+        if not hasattr(_pending, 'keys'):
+            _pending.keys = set()
+        _pending.keys.update(keys)
+        transaction.on_commit(replace_pending_stamps)
+
+
+def replace_pending_stamps():
+    """
+    Write the stamps collected by invalidate_locations in one call.
+
+    Registered once per invalidation, so the first callback of a transaction writes
+    them all and the rest find nothing to do. Keys left by a rolled back transaction
+    are written with the next commit, which only costs a few extra cache misses.
+    """
+    keys = getattr(_pending, 'keys', None)
+    if keys:
+        _pending.keys = set()
+        caches['stamps'].set_many({key: secrets.token_hex(4) for key in keys}, None)
+
+
+def invalidate_all_results():
+    """Invalidate every cached search result by starting a new cache generation, on commit."""
+    transaction.on_commit(lambda: caches['stamps'].set(GENERATION_KEY, secrets.token_hex(4), None))
@@ -0,0 +1,626 @@
+"""
+Search helpers for the businesses app.
+
+- Searches the denormalised BusinessSearchDocument table (see businesses.documents), so a
+  search is a single-table indexed read. Only approved businesses are searched.
+- Applies Postgres full-text search with relevance ranking to document querysets.
+- Provides a trigram fuzzy fallback and "did you mean" suggestions for misspelt terms.
+- Parses map viewport bounds and filters businesses by envelope against a GiST index.
+- Filters by radius around a point and orders results in SQL (tier, then relevance or
+  distance, then a per-session shuffle), or nearest first from the point, paging them
+  with opaque keyset cursors.
+- Filters by opening time (open now or at a given time) against the indexed
+  OpeningPeriod table.
+- Groups businesses into zoom-sized grid cells for map clustering.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import secrets
+from difflib import get_close_matches
+
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity, TrigramWordSimilarity
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Func, IntegerField, Q, TextField, Value
+from django.db.models.functions import MD5, Cast, Collate, Concat
+
+from core import lookups
+
+from .documents import SEARCH_CONFIG
+from .models import BusinessSearchDocument, Category, OpeningPeriod
+from .opening_hours import parse_open_at
+from .tags import tag_category_ids
+
+# Relevance scores are floats; they are scaled to integers so cursors compare exactly
+SCORE_SCALE = 1000000
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Rows fetched per round trip when streaming a whole result set
+STREAM_CHUNK_SIZE = 500
+
+# Result orders: tier then relevance, tier then distance from lat/lng, or nearest first
+SORT_ORDERS = ('relevance', 'distance', 'nearest')
+
+# Largest radius_m accepted for radius searches
+MAX_RADIUS_M = 100000
+
+# How multiple accessibility filters combine: every feature, or at least one
+FEATURE_MATCH_MODES = ('all', 'any')
+
+# Zoom level from which the map shows individual businesses instead of clusters
+CLUSTER_MAX_ZOOM = 13
+# Approximate on-screen width of a cluster cell (map tiles are 256px wide)
+CLUSTER_CELL_PIXELS = 64
+
+
+def searchable_documents():
+    """
+    Search documents of approved businesses: the scope of every search endpoint.
+
+    The predicate matches the partial location and tier indexes on the documents.
+    """
+    return BusinessSearchDocument.objects.filter(is_approved=True)
+
+
+def apply_text_search(qs, term):
+    """
+    Filter a BusinessSearchDocument queryset by a free-text term and annotate a relevance `rank`
+    (plus its integer `score` for ordering).
+
+    The term is parsed with websearch_to_tsquery, so quoted phrases, `or` and
+    `-exclusions` behave as users expect from a search box. Businesses in a category
+    with a tag starting with the term also match, so partial terms find tagged
+    categories ("wheel" finds "wheelchair hire").
+    """
+    query = SearchQuery(term, search_type='websearch', config=SEARCH_CONFIG)
+    condition = Q(search_vector=query)
+    tagged_categories = tag_category_ids(term)
+    if tagged_categories:
+        condition |= Q(category_ids__overlap=tagged_categories)
+    return qs.filter(condition).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).annotate(score=scaled_score('rank'))
+
+
+def apply_fuzzy_search(qs, term):
+    """
+    Filter a BusinessSearchDocument queryset by trigram word similarity and annotate
+    `similarity` (plus its integer `score` for ordering).
+
+    Matches business names directly, or any business in a category whose name or
+    tags resemble the term. Names and categories are matched with the `<%`
+    operator against their gin_trgm_ops indexes; the (few) similar category ids
+    are then matched against the GIN-indexed category_ids array.
+    """
+    similar_categories = list(Category.objects.filter(
+        Q(name__trigram_word_similar=term) | Q(search_tags__trigram_word_similar=term)
+    ).values_list('pk', flat=True))
+    condition = Q(business_name__trigram_word_similar=term)
+    if similar_categories:
+        condition |= Q(category_ids__overlap=similar_categories)
+    return qs.filter(condition).annotate(
+        similarity=TrigramWordSimilarity(term, 'business_name')
+    ).annotate(score=scaled_score('similarity'))
+
+
+def suggest_term(term):
+    """
+    Return the closest known vocabulary entry to `term`, or None.
+
+    The vocabulary is category names, category tags and business names. Each
+    lookup is a trigram index scan limited to the single best candidate.
+    """
+    candidates = []
+    category = (
+        Category.objects.filter(name__trigram_similar=term)
+        .annotate(similarity=TrigramSimilarity('name', term))
+        .order_by('-similarity')
+        .values_list('name', 'similarity')
+        .first()
+    )
+    if category:
+        candidates.append(category)
+    business = (
+        searchable_documents().filter(business_name__trigram_similar=term)
+        .annotate(similarity=TrigramSimilarity('business_name', term))
+        .order_by('-similarity')
+        .values_list('business_name', 'similarity')
+        .first()
+    )
+    if business:
+        candidates.append(business)
+    # tags are stored flattened, so pick the best individual tag from the closest categories
+    tag_lists = (
+        Category.objects.filter(search_tags__trigram_word_similar=term)
+        .annotate(similarity=TrigramWordSimilarity(term, 'search_tags'))
+        .order_by('-similarity')
+        .values_list('tags', 'similarity')[:5]
+    )
+    for tags, similarity in tag_lists:
+        match = get_close_matches(term.lower(), [str(t).lower() for t in tags or []], n=1, cutoff=0.6)
+        if match:
+            candidates.append((match[0], similarity))
+            break
+    candidates = [c for c in candidates if c[0].lower() != term.lower()]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: c[1])[0]
+
+
+def location_geometry():
+    """
+    Planar (geometry) view of BusinessSearchDocument.location.
+
+    Matches the expression of the `search_doc_approved_geom_gist` partial index
+    exactly so envelope filters on it (over searchable_documents) are index scans.
+    """
+    return Cast('location', PointField(srid=4326))
+
+
+def parse_point(params):
+    """
+    Read the lat/lng reference point from a QueryDict.
+
+    Returns None when no point was sent, otherwise a WGS84 Point. Raises ValueError
+    for a partial, non-numeric or out-of-range point.
+    """
+    raw_lat, raw_lng = params.get('lat'), params.get('lng')
+    if not raw_lat and not raw_lng:
+        return None
+    if not (raw_lat and raw_lng):
+        raise ValueError("A point requires both lat and lng.")
+    try:
+        lat, lng = float(raw_lat), float(raw_lng)
+    except ValueError:
+        raise ValueError("lat and lng must be numeric.")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("lat must be between -90 and 90 and lng between -180 and 180.")
+    return Point(lng, lat, srid=4326)
+
+
+def parse_sort(params, point):
+    """
+    Return the requested result order (see SORT_ORDERS), defaulting to 'relevance'.
+
+    Raises ValueError for an unknown sort, or a distance sort without a point.
+    """
+    sort = params.get('sort') or 'relevance'
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_ORDERS)}.")
+    if sort != 'relevance' and point is None:
+        raise ValueError(f"sort={sort} requires lat and lng.")
+    return sort
+
+
+def parse_radius(params, point):
+    """
+    Return the `radius_m` search radius in metres, or None when not given.
+
+    Raises ValueError for a non-numeric or out-of-range radius, or a radius without a point.
+    """
+    value = params.get('radius_m')
+    if not value:
+        return None
+    try:
+        radius = float(value)
+    except ValueError:
+        raise ValueError("radius_m must be numeric.")
+    if not 0 < radius <= MAX_RADIUS_M:
+        raise ValueError(f"radius_m must be greater than 0 and at most {MAX_RADIUS_M}.")
+    if point is None:
+        raise ValueError("radius_m requires lat and lng.")
+    return radius
+
+
+def apply_radius(qs, point, radius):
+    """
+    Keep businesses within `radius` metres of `point`.
+
+    ST_DWithin on the geography location measures true metres on the spheroid and
+    is served by the column's GiST index.
+    """
+    return qs.filter(location__dwithin=(point, D(m=radius)))
+
+
+def knn_distance(point):
+    """
+    Distance in metres from `point` using the PostGIS `<->` operator on the geography
+    location, which a GiST index scan can return in nearest-first order.
+    """
+    return Func(
+        F('location'),
+        Value(point, output_field=PointField(srid=4326, geography=True)),
+        template='%(expressions)s',
+        arg_joiner=' <-> ',
+        output_field=FloatField(),
+    )
+
+
+def order_by_distance(qs, point):
+    """
+    Annotate `distance` (metres) and order nearest first for a k-nearest-neighbour search.
+
+    Returns the queryset and its ordering, which doubles as the cursor key.
+    """
+    ordering = ['distance', 'business_id']
+    return qs.annotate(distance=knn_distance(point)).order_by(*ordering), ordering
+
+
+def parse_bounds(params):
+    """
+    Read min_lat/min_lng/max_lat/max_lng from a QueryDict.
+
+    Returns None when no bounds were sent, otherwise a (min_lng, min_lat, max_lng, max_lat)
+    tuple with longitudes wrapped into [-180, 180). Raises ValueError for partial,
+    non-numeric or out-of-range bounds.
+    """
+    keys = ('min_lng', 'min_lat', 'max_lng', 'max_lat')
+    raw = [params.get(key) for key in keys]
+    if not any(raw):
+        return None
+    if not all(raw):
+        raise ValueError("Bounds require min_lat, min_lng, max_lat and max_lng.")
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(value) for value in raw)
+    except ValueError:
+        raise ValueError("Bounds must be numeric.")
+    if not all(math.isfinite(value) for value in (min_lng, min_lat, max_lng, max_lat)):
+        raise ValueError("Bounds must be finite numbers.")
+    if not (-90 <= min_lat <= 90 and -90 <= max_lat <= 90):
+        raise ValueError("Latitudes must be between -90 and 90.")
+    if min_lat > max_lat:
+        raise ValueError("min_lat must not be greater than max_lat.")
+    if max_lng - min_lng >= 360:
+        # the viewport wraps the whole world
+        return (-180.0, min_lat, 180.0, max_lat)
+    # MapLibre reports longitudes beyond +/-180 once the map is panned across the antimeridian
+    min_lng = (min_lng + 180) % 360 - 180
+    max_lng = (max_lng + 180) % 360 - 180
+    return (min_lng, min_lat, max_lng, max_lat)
+
+
+def bounds_envelope(bounds):
+    """
+    Return the envelope geometry for parsed bounds.
+
+    A viewport crossing the antimeridian (min_lng > max_lng once wrapped) becomes
+    two boxes, one either side of it.
+    """
+    min_lng, min_lat, max_lng, max_lat = bounds
+    if min_lng <= max_lng:
+        return Polygon.from_bbox((min_lng, min_lat, max_lng, max_lat))
+    return MultiPolygon(
+        Polygon.from_bbox((min_lng, min_lat, 180.0, max_lat)),
+        Polygon.from_bbox((-180.0, min_lat, max_lng, max_lat)),
+    )
+
+
+def apply_bounds(qs, bounds):
+    """Filter a document queryset to businesses inside the parsed viewport bounds."""
+    envelope = bounds_envelope(bounds)
+    envelope.srid = 4326
+    return qs.alias(location_geom=location_geometry()).filter(location_geom__intersects=envelope)
+
+
+def scaled_score(name):
+    """Integer version of a float relevance annotation, safe to round-trip through a cursor."""
+    return Cast(F(name) * Value(SCORE_SCALE), IntegerField())
+
+
+def order_results(qs, seed, scored=False, by_distance=False):
+    """
+    Annotate and order a BusinessSearchDocument queryset for display.
+
+    Businesses are grouped premium, standard, then free (the stored `tier_rank`).
+    Within a tier they are ordered by relevance `score` when `scored` (or by an
+    annotated `distance` when `by_distance`), then by a pseudo-random key derived
+    from the business id and the caller's seed, so each session sees a stable
+    order while premium placements rotate fairly between sessions.
+
+    Returns the queryset and its ordering, which doubles as the cursor key.
+    """
+    # "C" collation keeps the hex keys in byte order whatever the database locale
+    qs = qs.annotate(shuffle_key=Collate(MD5(Concat(Cast('business_id', TextField()), Value(seed))), 'C'))
+    if by_distance:
+        ordering = ['tier_rank', 'distance', 'shuffle_key', 'business_id']
+    elif scored:
+        ordering = ['tier_rank', '-score', 'shuffle_key', 'business_id']
+    else:
+        ordering = ['tier_rank', 'shuffle_key', 'business_id']
+    return qs.order_by(*ordering), ordering
+
+
+def apply_search(qs, term, mode):
+    """Filter by `term` using the matching `mode` ('all', 'text' or 'fuzzy')."""
+    if mode == 'text':
+        return apply_text_search(qs, term)
+    if mode == 'fuzzy':
+        return apply_fuzzy_search(qs, term)
+    return qs
+
+
+def ordered_search(qs, term, mode, seed, point=None, sort='relevance'):
+    """
+    Apply the search for `mode` and the ordering for `sort`. Given a `point`, every
+    result is annotated with its `distance` from it in metres.
+
+    Returns the ordered queryset and its ordering (see order_results and order_by_distance).
+    """
+    qs = apply_search(qs, term, mode)
+    if sort == 'nearest':
+        return order_by_distance(qs, point)
+    if point is not None:
+        # plain metres (not a Measure) so the distance can round-trip through a cursor
+        qs = qs.annotate(distance=ExpressionWrapper(Distance('location', point), output_field=FloatField()))
+    return order_results(qs, seed, scored=mode != 'all', by_distance=sort == 'distance')
+
+
+def encode_cursor(mode, values):
+    """Pack the search mode and the last row's sort values into an opaque cursor string."""
+    payload = json.dumps({'m': mode, 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Unpack a cursor from encode_cursor into (mode, values). Raises ValueError if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        mode, values = payload['m'], payload['v']
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(mode, str) or not isinstance(values, list):
+        raise ValueError("Invalid cursor.")
+    return mode, values
+
+
+def parse_page_size(value):
+    """Return the requested page size clamped to MAX_PAGE_SIZE. Raises ValueError if not a positive integer."""
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except ValueError:
+        raise ValueError("page_size must be an integer.")
+    if page_size < 1:
+        raise ValueError("page_size must be positive.")
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def after_cursor(qs, ordering, values):
+    """
+    Keyset filter: keep rows that sort strictly after `values` under `ordering`.
+
+    Builds (a > x) OR (a = x AND b > y) OR ... with the comparison flipped for
+    descending keys.
+    """
+    if len(values) != len(ordering):
+        raise ValueError("Invalid cursor.")
+    condition = Q()
+    equal_so_far = Q()
+    for key, value in zip(ordering, values):
+        name = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        condition |= equal_so_far & Q(**{f'{name}__{lookup}': value})
+        equal_so_far &= Q(**{name: value})
+    return qs.filter(condition)
+
+
+def paginate(qs, ordering, mode, page_size):
+    """
+    Fetch one page from an ordered queryset.
+
+    Returns the rows and a cursor for the following page (None on the last page).
+    """
+    rows = list(qs[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(mode, [getattr(last, key.lstrip('-')) for key in ordering])
+
+
+def search_page(qs, term, mode, seed, page_size, cursor_values=None, point=None, sort='relevance'):
+    """
+    Run a search and return one page of search documents; result_payload gives
+    each row's serialised search result. `point` and `sort` are as for ordered_search.
+
+    Returns (rows, next_cursor). Raises ValueError if `cursor_values` do not fit
+    the ordering for `mode`.
+    """
+    ordered_qs, ordering = ordered_search(qs, term, mode, seed, point, sort)
+    if cursor_values is not None:
+        ordered_qs = after_cursor(ordered_qs, ordering, cursor_values)
+    # load only the payload, its timestamp and the sort keys (the primary key and annotations are always selected)
+    return paginate(ordered_qs.only('tier_rank', 'updated_at', 'payload'), ordering, mode, page_size)
+
+
+def result_payload(doc):
+    """The serialised search result for a document, with its distance in metres when known."""
+    distance = getattr(doc, 'distance', None)
+    if distance is None:
+        return doc.payload
+    return dict(doc.payload, distance_m=round(distance, 1))
+
+
+def stream_results(qs, term, mode, seed, point=None, sort='relevance'):
+    """
+    Yield the serialised result of every match, in display order, without paging.
+
+    Rows are read through a server-side cursor STREAM_CHUNK_SIZE at a time, so
+    memory stays flat however many businesses match.
+    """
+    ordered_qs, _ = ordered_search(qs, term, mode, seed, point, sort)
+    for doc in ordered_qs.only('payload').iterator(chunk_size=STREAM_CHUNK_SIZE):
+        yield result_payload(doc)
+
+
+def results_validator(versions):
+    """
+    Cheap validator for a page of results, from its (business_id, updated_at) pairs
+    in page order: changes when the matched ids, their order or any of their
+    documents change.
+    """
+    versions = list(versions)
+    ids = ','.join(str(business_id) for business_id, _ in versions)
+    newest = max((updated_at for _, updated_at in versions), default=None)
+    return hashlib.md5(f"{ids}|{newest.isoformat() if newest else ''}".encode()).hexdigest()
+
+
+def session_seed(session):
+    """Return the session's search ordering seed, creating one on first use."""
+    seed = session.get('search_seed')
+    if not seed:
+        seed = secrets.token_hex(8)
+        session['search_seed'] = seed
+    return seed
+
+
+def filter_businesses(params):
+    """
+    Apply the category, accessibility feature, viewport and radius filters shared by
+    the search endpoints.
+
+    Returns a BusinessSearchDocument queryset. Raises ValueError for malformed parameters.
+    """
+    qs = filter_attributes(params)
+    bounds = parse_bounds(params)
+    if bounds:
+        qs = apply_bounds(qs, bounds)
+    point = parse_point(params)
+    radius = parse_radius(params, point)
+    if radius:
+        qs = apply_radius(qs, point, radius)
+    return qs
+
+
+def filter_attributes(params):
+    """
+    Apply the category, accessibility feature and opening time filters (everything
+    but the viewport).
+
+    Returns a BusinessSearchDocument queryset. Raises ValueError for malformed parameters.
+    """
+    qs = searchable_documents()
+    cat_id = params.get('category')
+    # allow multiple accessibility filters
+    access = params.getlist('accessibility')
+    match = params.get('accessibility_match') or 'all'
+    if match not in FEATURE_MATCH_MODES:
+        raise ValueError("accessibility_match must be 'all' or 'any'.")
+    if cat_id:
+        try:
+            qs = qs.filter(category_ids__contains=[int(cat_id)])
+        except ValueError:
+            raise ValueError("category must be an integer id.")
+    if access:
+        qs = filter_features(qs, access, match)
+    open_at = parse_open_at(params)
+    if open_at:
+        qs = filter_open_at(qs, *open_at)
+    return qs
+
+
+def filter_features(qs, names, match='all'):
+    """
+    Keep businesses that have all (or, with match='any', at least one) of the
+    accessibility features named in `names`.
+
+    However many features are selected this is a single predicate on the
+    document's GIN-indexed feature_ids array: `@>` for all, `&&` for any.
+    Names are resolved from the lookup table cache. Unknown feature names never match.
+    """
+    names = set(names)
+    feature_ids = [f.id for f in lookups.rows('accessibility_features') if f.name in names]
+    if match == 'any':
+        return qs.filter(feature_ids__overlap=feature_ids) if feature_ids else qs.none()
+    if len(feature_ids) < len(names):
+        return qs.none()
+    return qs.filter(feature_ids__contains=feature_ids)
+
+
+def filter_open_at(qs, weekday, minute):
+    """
+    Keep businesses open at `minute` (from midnight) on `weekday` (0 = Monday).
+
+    A single range predicate on the (weekday, start_minute, end_minute) index of
+    OpeningPeriod; businesses without opening hours never match.
+    """
+    open_businesses = OpeningPeriod.objects.filter(
+        weekday=weekday, start_minute__lte=minute, end_minute__gt=minute
+    ).values('business_id')
+    return qs.filter(business_id__in=open_businesses)
+
+
+def search_mode(qs, term):
+    """
+    Choose how `term` is matched: 'all' without a term, 'text' when the full-text
+    search has matches, otherwise 'fuzzy'.
+    """
+    if not term:
+        return 'all'
+    return 'text' if apply_text_search(qs, term).exists() else 'fuzzy'
+
+
+def parse_zoom(value):
+    """Return the map zoom level as an int in 0-22. Raises ValueError if missing or invalid."""
+    try:
+        zoom = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("zoom must be an integer.")
+    if not 0 <= zoom <= 22:
+        raise ValueError("zoom must be between 0 and 22.")
+    return zoom
+
+
+def cluster_cell_size(zoom):
+    """Width in degrees of a cluster grid cell at `zoom`."""
+    return 360 / (2 ** zoom) * CLUSTER_CELL_PIXELS / 256
+
+
+def cluster_businesses(qs, zoom):
+    """
+    Group a BusinessSearchDocument queryset into grid cells sized for `zoom`.
+
+    Returns one dict per non-empty cell with the mean position of its businesses,
+    the count, a breakdown by membership tier and the number verified by wheelers.
+    """
+    size = cluster_cell_size(zoom)
+    geom = location_geometry()
+    cell = Func(geom, Value(size), Value(size), function='ST_SnapToGrid', output_field=PointField(srid=4326))
+    rows = (
+        qs.annotate(
+            cell_x=Func(cell, function='ST_X', output_field=FloatField()),
+            cell_y=Func(cell, function='ST_Y', output_field=FloatField()),
+        )
+        .values('cell_x', 'cell_y')
+        .annotate(
+            count=Count('business_id'),
+            lng=Avg(Func(geom, function='ST_X', output_field=FloatField())),
+            lat=Avg(Func(geom, function='ST_Y', output_field=FloatField())),
+            premium=Count('business_id', filter=Q(tier='premium')),
+            standard=Count('business_id', filter=Q(tier='standard')),
+            verified=Count('business_id', filter=Q(verified_by_wheelers=True)),
+        )
+        .order_by()
+    )
+    return [
+        {
+            'lat': row['lat'],
+            'lng': row['lng'],
+            'count': row['count'],
+            'tiers': {
+                'premium': row['premium'],
+                'standard': row['standard'],
+                'free': row['count'] - row['premium'] - row['standard'],
+            },
+            'verified': row['verified'],
+        }
+        for row in rows
+    ]
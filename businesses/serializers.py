@@ -0,0 +1,116 @@
+"""
+Serialisation of businesses for the AJAX search API.
+
+- search_results_queryset: loads exactly the columns and relations the search documents need,
+  so serialising any number of results costs a fixed number of queries.
+- serialize_business: converts a Business into the slim search result dict (what the
+  results list and map markers show before a result is expanded).
+- serialize_business_detail: the public, tier-gated details shown when a result is
+  expanded, served one business at a time by ajax_business_detail.
+"""
+
+from django.db.models import Prefetch
+
+from .models import AccessibilityFeature, Category
+
+# Business columns read by the serialisers (everything else is deferred)
+SEARCH_RESULT_FIELDS = (
+    'id',
+    'business_name',
+    'street_address1',
+    'street_address2',
+    'town_or_city',
+    'county',
+    'postcode',
+    'location',
+    'verified_by_wheelers',
+    'is_approved',
+    'public_phone',
+    'website',
+    'opening_hours',
+    'public_email',
+    'facebook_url',
+    'x_twitter_url',
+    'instagram_url',
+    'description',
+    'special_offers',
+    'services_offered',
+    'logo',
+    'wheeler_verification_requested',
+    'membership_tier__tier',
+)
+
+
+def search_results_queryset(qs):
+    """
+    Prepare a Business queryset for serialisation.
+
+    Joins the membership tier, prefetches category and accessibility feature names
+    only, and restricts the Business columns to SEARCH_RESULT_FIELDS: one query for
+    the businesses plus one per prefetched relation, however many rows match.
+    """
+    return qs.select_related('membership_tier').prefetch_related(
+        Prefetch('categories', queryset=Category.objects.only('id', 'name')),
+        Prefetch('accessibility_features', queryset=AccessibilityFeature.objects.only('id', 'name')),
+    ).only(*SEARCH_RESULT_FIELDS)
+
+
+def business_tier(biz):
+    """Return the business's membership tier name, defaulting to 'free'."""
+    tier = biz.membership_tier.tier if biz.membership_tier and biz.membership_tier.tier else 'free'
+    return tier.lower()
+
+
+def serialize_business(biz):
+    """
+    Return the slim search result dict for a business prepared by search_results_queryset.
+
+    Only what a collapsed result and its map marker need; everything else is in
+    serialize_business_detail. The logo is only shown for businesses on a paid tier.
+    """
+    membership_tier = business_tier(biz)
+    # only show logo if not on free tier
+    logo_url = biz.logo.url if biz.logo and membership_tier != 'free' else ''
+    return {
+        'id': biz.id,
+        'business_name': biz.business_name,
+        # .all() reads from the prefetch cache
+        'categories': [c.name for c in biz.categories.all()],
+        'town_or_city': biz.town_or_city,
+        'location': {'lat': biz.location.y, 'lng': biz.location.x} if biz.location else None,
+        'tier': membership_tier,
+        'is_wheeler_verified': biz.verified_by_wheelers,
+        'accessibility_feature_ids': [f.id for f in biz.accessibility_features.all()],
+        'logo': logo_url,
+        'wheeler_verification_requested': biz.wheeler_verification_requested,
+    }
+
+
+def serialize_business_detail(biz):
+    """
+    Return the detail dict for a business prepared by search_results_queryset.
+
+    Contact details, social links and descriptive text are only shown for
+    businesses on a paid tier.
+    """
+    paid = business_tier(biz) != 'free'
+    return {
+        'id': biz.id,
+        'street_address1': biz.street_address1,
+        'street_address2': biz.street_address2,
+        'town_or_city': biz.town_or_city,
+        'county': biz.county,
+        'postcode': biz.postcode,
+        'accessibility_features': [f.name for f in biz.accessibility_features.all()],
+        'public_phone': biz.public_phone,
+        'website': biz.website,
+        'opening_hours': biz.opening_hours,
+        # only if not on free tier
+        'public_email': biz.public_email if paid else '',
+        'facebook': biz.facebook_url if paid else '',
+        'twitter': biz.x_twitter_url if paid else '',
+        'instagram': biz.instagram_url if paid else '',
+        'description': biz.description if paid else '',
+        'special_offers': biz.special_offers if paid else '',
+        'services_offered': biz.services_offered if paid else '',
+    }
@@ -0,0 +1,194 @@
+"""
+Signal handlers for the businesses app.
+
+Keeps each business's BusinessSearchDocument in step with the business itself
+and with its categories, accessibility features and membership tier, and drops
+cached map tiles and search results when the businesses in them change. Also
+keeps this worker's typeahead index and each business's OpeningPeriod rows up to date.
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .documents import refresh_search_documents
+from .models import AccessibilityFeature, Business, BusinessSearchDocument, Category, MembershipTier
+from .opening_hours import sync_opening_periods
+from .result_cache import invalidate_all_results, invalidate_locations
+from .tags import sync_category_tags
+from .tiles import invalidate_all_tiles, invalidate_location
+from . import typeahead
+
+
+def refresh_documents(business_ids):
+    """
+    Rebuild the search documents of `business_ids` and invalidate the cached
+    search results at their previous and current positions.
+    """
+    business_ids = list(business_ids)
+    if not business_ids:
+        return
+    locations = list(BusinessSearchDocument.objects.filter(pk__in=business_ids).values_list('location', flat=True))
+    refresh_search_documents(business_ids)
+    locations += Business.objects.filter(pk__in=business_ids).values_list('location', flat=True)
+    invalidate_locations(locations)
+
+
+def changed_business_ids(instance, action, reverse, pk_set):
+    """
+    Return the ids of the businesses affected by an m2m_changed signal, or None
+    for actions that need no work.
+
+    Handles both directions: business.categories.add(...) and category.businesses.add(...).
+    Reverse clears are resolved from the ids remembered at pre_clear.
+    """
+    if action == 'pre_clear' and reverse:
+        instance._changed_business_ids = list(instance.businesses.values_list('pk', flat=True))
+        return None
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return None
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, '_changed_business_ids', [])
+    return list(pk_set or [])
+
+
+@receiver(pre_save, sender=Business)
+def remember_business_location(sender, instance, **kwargs):
+    """
+    Keep the stored location and opening hours, so tiles at the old position can be
+    invalidated after a move and opening periods are only rewritten when hours change.
+    """
+    stored = None
+    if instance.pk:
+        stored = sender.objects.filter(pk=instance.pk).values_list('location', 'opening_hours').first()
+    instance._old_location, instance._old_opening_hours = stored or (None, None)
+
+
+@receiver(post_save, sender=Business)
+def update_opening_periods(sender, instance, created, **kwargs):
+    """Rewrite the business's OpeningPeriod rows when its opening hours change."""
+    if created or instance.opening_hours != getattr(instance, '_old_opening_hours', None):
+        sync_opening_periods(instance)
+
+
+@receiver(post_save, sender=Business)
+def update_business_search_document(sender, instance, **kwargs):
+    """Rebuild the search document whenever a business is saved."""
+    refresh_documents([instance.pk])
+
+
+@receiver(post_save, sender=Business)
+def invalidate_business_tiles(sender, instance, **kwargs):
+    """Drop cached tiles at the business's old and new positions."""
+    invalidate_location(getattr(instance, '_old_location', None))
+    invalidate_location(instance.location)
+
+
+@receiver(post_delete, sender=Business)
+def invalidate_deleted_business_tiles(sender, instance, **kwargs):
+    """Drop cached tiles and search results that still show a deleted business."""
+    invalidate_location(instance.location)
+    invalidate_locations([instance.location])
+
+
+@receiver(m2m_changed, sender=Business.categories.through)
+def update_search_documents_on_categories_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refresh the search documents when categories are added to or removed from businesses."""
+    business_ids = changed_business_ids(instance, action, reverse, pk_set)
+    if business_ids is not None:
+        refresh_documents(business_ids)
+
+
+@receiver(m2m_changed, sender=Business.accessibility_features.through)
+def update_on_features_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Documents and tiles carry the feature ids, so refresh both when features change."""
+    business_ids = changed_business_ids(instance, action, reverse, pk_set)
+    if business_ids is None:
+        return
+    refresh_documents(business_ids)
+    for location in Business.objects.filter(pk__in=business_ids).values_list('location', flat=True):
+        invalidate_location(location)
+
+
+@receiver(pre_save, sender=Category)
+def flatten_category_tags(sender, instance, **kwargs):
+    """Keep the trigram-indexed search_tags column in step with the tags JSON (fixtures included)."""
+    instance.search_tags = ' '.join(str(tag) for tag in (instance.tags or []))
+
+
+@receiver(post_save, sender=Category)
+def sync_normalised_category_tags(sender, instance, **kwargs):
+    """Keep the CategoryTag rows in step with the tags JSON (fixtures included)."""
+    sync_category_tags(instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=AccessibilityFeature)
+def update_search_documents_on_related_save(sender, instance, created, **kwargs):
+    """Category and feature names appear in search documents, so refresh every business using them."""
+    if created:
+        return
+    refresh_documents(instance.businesses.values_list('pk', flat=True))
+    # names are matched by searches and filters in every area
+    invalidate_all_results()
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=AccessibilityFeature)
+@receiver(pre_delete, sender=MembershipTier)
+def remember_related_businesses(sender, instance, **kwargs):
+    """Capture affected businesses before a related row (and its links to them) is deleted."""
+    instance._changed_business_ids = list(instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=AccessibilityFeature)
+@receiver(post_delete, sender=MembershipTier)
+def update_search_documents_on_related_delete(sender, instance, **kwargs):
+    """Drop the deleted row's data from the search documents of the businesses that used it."""
+    refresh_documents(getattr(instance, '_changed_business_ids', []))
+    if sender is not MembershipTier:
+        invalidate_all_results()
+    if sender is AccessibilityFeature:
+        # tiles list feature ids, and the deleted links fire no m2m_changed
+        invalidate_all_tiles()
+
+
+@receiver(post_save, sender=MembershipTier)
+def update_search_documents_on_tier_save(sender, instance, created, **kwargs):
+    """A tier's name gates the search payload, so refresh the businesses on it."""
+    if created:
+        return
+    refresh_documents(instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=MembershipTier)
+@receiver(post_delete, sender=MembershipTier)
+def invalidate_tiles_on_tier_change(sender, instance, **kwargs):
+    """A tier change can affect any number of businesses, so start a new tile cache generation."""
+    invalidate_all_tiles()
+
+
+@receiver(post_save, sender=Business)
+def update_business_typeahead(sender, instance, **kwargs):
+    """Re-index the business name for typeahead completions."""
+    typeahead.update_business(instance)
+
+
+@receiver(post_delete, sender=Business)
+def remove_business_typeahead(sender, instance, **kwargs):
+    """Drop a deleted business from typeahead completions."""
+    typeahead.remove_business(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def update_category_typeahead(sender, instance, **kwargs):
+    """Re-index the category name and tags for typeahead completions."""
+    typeahead.update_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_typeahead(sender, instance, **kwargs):
+    """Drop a deleted category from typeahead completions."""
+    typeahead.remove_category(instance.pk)
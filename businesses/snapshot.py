@@ -0,0 +1,280 @@
+"""
+Public snapshot of every business, for partners and the offline mobile build.
+
+- build_snapshot: writes businesses.geojson (plus a gzipped copy, businesses.geojson.gz)
+  and businesses.fgb (FlatGeobuf with a spatial index) to settings.BUSINESS_SNAPSHOT_DIR from the search
+  documents' public, tier-gated fields, for approved businesses. After the first build only documents updated
+  since the last one are read; when nothing has changed the files are left alone.
+- manifest: the last build's files by format and content encoding, each with its own
+  ETag, as served by business_snapshot. Files are named after their md5 and the
+  manifest is replaced last, so a manifest always matches the files it names; the
+  previous build's files are kept for requests still reading its manifest.
+  It is re-read only when the manifest file changes, so serving a snapshot costs a
+  stat() and a file send, with no database access.
+
+Run `python manage.py build_business_snapshot` periodically (e.g. every few minutes).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .flatgeobuf import write_flatgeobuf
+from .search import searchable_documents
+
+# Attribute columns of the snapshot, in order, with their FlatGeobuf types
+SNAPSHOT_COLUMNS = [
+    ('id', 'long'),
+    ('business_name', 'string'),
+    ('tier', 'string'),
+    ('categories', 'json'),
+    ('accessibility_features', 'json'),
+    ('is_wheeler_verified', 'bool'),
+    ('street_address1', 'string'),
+    ('street_address2', 'string'),
+    ('town_or_city', 'string'),
+    ('county', 'string'),
+    ('postcode', 'string'),
+    ('public_phone', 'string'),
+    ('website', 'string'),
+    ('opening_hours', 'string'),
+    ('public_email', 'string'),
+    ('facebook', 'string'),
+    ('twitter', 'string'),
+    ('instagram', 'string'),
+    ('description', 'string'),
+    ('special_offers', 'string'),
+    ('services_offered', 'string'),
+    ('logo', 'string'),
+    ('updated_at', 'string'),
+]
+
+# Snapshot files by format and content encoding, as served by business_snapshot; each
+# build writes them as e.g. businesses.<md5>.geojson
+SNAPSHOT_FILES = {
+    'geojson': {'identity': 'businesses.geojson', 'gzip': 'businesses.geojson.gz'},
+    'fgb': {'identity': 'businesses.fgb'},
+}
+# One GeoJSON feature per line, by id: the previous build, merged with the changes
+FEATURES_FILE = 'businesses.features.jsonl.gz'
+MANIFEST_FILE = 'manifest.json'
+# Documents updated this long before the last build are read again, in case their
+# transaction committed after the build read the table
+BUILD_OVERLAP = timedelta(minutes=5)
+READ_CHUNK_SIZE = 2000
+VERSIONED_NAME = re.compile(r'^businesses\.[0-9a-f]{32}\.')
+
+_manifest = (None, None)
+_manifest_lock = threading.Lock()
+
+
+def snapshot_path(name):
+    """Absolute path of a file in the snapshot directory."""
+    return os.path.join(settings.BUSINESS_SNAPSHOT_DIR, name)
+
+
+def snapshot_feature(document):
+    """The GeoJSON feature (a dict) for a search document."""
+    public = dict(document.detail, **document.payload)
+    properties = {name: public.get(name) for name, _ in SNAPSHOT_COLUMNS}
+    properties['updated_at'] = document.updated_at.isoformat()
+    return {
+        'type': 'Feature',
+        'id': document.business_id,
+        'geometry': {'type': 'Point', 'coordinates': [document.location.x, document.location.y]},
+        'properties': properties,
+    }
+
+
+def dumps(value):
+    """Compact, deterministic JSON."""
+    return json.dumps(value, separators=(',', ':'), sort_keys=True)
+
+
+def read_manifest():
+    """The manifest of the last build, or None if there has not been one."""
+    try:
+        with open(snapshot_path(MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def manifest():
+    """The manifest of the last build (or None), cached until the manifest file changes."""
+    global _manifest
+    try:
+        mtime = os.stat(snapshot_path(MANIFEST_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached_mtime, data = _manifest
+    if cached_mtime != mtime:
+        data = read_manifest()
+        with _manifest_lock:
+            _manifest = (mtime, data)
+    return data
+
+
+def load_features():
+    """The previous build's features by id."""
+    features = {}
+    try:
+        with gzip.open(snapshot_path(FEATURES_FILE), 'rt') as f:
+            for line in f:
+                feature = json.loads(line)
+                features[feature['id']] = feature
+    except FileNotFoundError:
+        pass
+    return features
+
+
+def write_temporary(name, write, compress=False):
+    """Write `name`.tmp, gzipped if `compress` (`write` receives the open file); return its path and md5."""
+    temporary = snapshot_path(f"{name}.tmp")
+    with open(temporary, 'wb') as f:
+        if compress:
+            # mtime=0 keeps the bytes, and so the ETag, the same for the same features
+            with gzip.GzipFile(fileobj=f, mode='wb', mtime=0) as compressed:
+                write(compressed)
+        else:
+            write(f)
+    digest = hashlib.md5()
+    with open(temporary, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return temporary, digest.hexdigest()
+
+
+def write_file(name, write, compress=False):
+    """Write a snapshot file atomically, gzipped if `compress`; return its md5."""
+    temporary, digest = write_temporary(name, write, compress)
+    os.replace(temporary, snapshot_path(name))
+    return digest
+
+
+def write_versioned(name, write, compress=False):
+    """
+    Write a snapshot file under a name carrying its md5 (businesses.<md5>.geojson for
+    businesses.geojson), leaving any file of an earlier build in place.
+    Returns the name written and the md5.
+    """
+    temporary, digest = write_temporary(name, write, compress)
+    stem, _, extension = name.partition('.')
+    versioned = f"{stem}.{digest}.{extension}"
+    os.replace(temporary, snapshot_path(versioned))
+    return versioned, digest
+
+
+def manifest_names(manifest_data):
+    """The file names listed in a manifest."""
+    if not manifest_data:
+        return set()
+    return {
+        entry['name']
+        for files in manifest_data['files'].values()
+        for entry in files.values()
+        if isinstance(entry, dict)
+    }
+
+
+def remove_old_files(keep):
+    """Delete the versioned snapshot files whose names are not in `keep`."""
+    for name in os.listdir(settings.BUSINESS_SNAPSHOT_DIR):
+        if VERSIONED_NAME.match(name) and name not in keep:
+            try:
+                os.remove(snapshot_path(name))
+            except FileNotFoundError:
+                pass
+
+
+def write_lines(f, lines):
+    """Write encoded lines to a binary file."""
+    for line in lines:
+        f.write(line.encode())
+
+
+def geojson_lines(features):
+    """The GeoJSON FeatureCollection, a feature per line."""
+    yield '{"type":"FeatureCollection","features":[\n'
+    for i, feature in enumerate(features):
+        yield ('' if i == 0 else ',\n') + dumps(feature)
+    yield '\n]}\n'
+
+
+def build_snapshot(full=False):
+    """
+    Bring the snapshot up to date with the search documents.
+
+    Reads only documents updated since the previous build (or every document when
+    `full` is true or there is no previous build), drops businesses that no longer
+    have one or are no longer approved, and rewrites the files when anything changed.
+    Returns a dict with the counts of changed, removed and total features and
+    whether the files were written.
+    """
+    os.makedirs(settings.BUSINESS_SNAPSHOT_DIR, exist_ok=True)
+    previous = None if full else read_manifest()
+    started = timezone.now()
+    features = load_features() if previous else {}
+    current_ids = set(searchable_documents().values_list('business_id', flat=True))
+    removed = features.keys() - current_ids
+    for business_id in removed:
+        del features[business_id]
+
+    documents = searchable_documents().only('business_id', 'location', 'payload', 'detail', 'updated_at')
+    if previous:
+        since = parse_datetime(previous['built_at']) - BUILD_OVERLAP
+        missing = current_ids - features.keys()
+        documents = documents.filter(updated_at__gte=since) | documents.filter(business_id__in=missing)
+    changed = 0
+    for document in documents.order_by().iterator(chunk_size=READ_CHUNK_SIZE):
+        feature = snapshot_feature(document)
+        if features.get(document.business_id) != feature:
+            features[document.business_id] = feature
+            changed += 1
+
+    summary = {'changed': changed, 'removed': len(removed), 'total': len(features), 'written': False}
+    # a build with an older set of files is rewritten even when no business changed
+    same_files = previous and all(
+        previous['files'].get(fmt, {}).keys() == names.keys() for fmt, names in SNAPSHOT_FILES.items()
+    )
+    if same_files and not changed and not removed:
+        return summary
+    ordered = [features[business_id] for business_id in sorted(features)]
+    write_file(FEATURES_FILE, lambda f: write_lines(f, (dumps(feature) + '\n' for feature in ordered)), compress=True)
+    geojson = SNAPSHOT_FILES['geojson']
+    written = {
+        ('geojson', 'identity'): write_versioned(geojson['identity'], lambda f: write_lines(f, geojson_lines(ordered))),
+        ('fgb', 'identity'): write_versioned(SNAPSHOT_FILES['fgb']['identity'], lambda f: write_flatgeobuf(f, 'businesses', SNAPSHOT_COLUMNS, [
+            (*feature['geometry']['coordinates'], feature['properties']) for feature in ordered
+        ])),
+    }
+    with open(snapshot_path(written['geojson', 'identity'][0]), 'rb') as plain:
+        written['geojson', 'gzip'] = write_versioned(geojson['gzip'], lambda f: shutil.copyfileobj(plain, f), compress=True)
+    # each representation has its own (strong) ETag: the md5 of the bytes sent
+    files = {
+        fmt: {
+            encoding: {
+                'name': written[fmt, encoding][0],
+                'etag': written[fmt, encoding][1],
+                'size': os.path.getsize(snapshot_path(written[fmt, encoding][0])),
+            }
+            for encoding in names
+        }
+        for fmt, names in SNAPSHOT_FILES.items()
+    }
+    manifest_data = {'built_at': started.isoformat(), 'count': len(ordered), 'files': files}
+    replaced = previous if previous is not None else read_manifest()
+    # the files are all in place before the manifest naming them
+    write_file(MANIFEST_FILE, lambda f: f.write(json.dumps(manifest_data, indent=2).encode()))
+    remove_old_files(manifest_names(manifest_data) | manifest_names(replaced))
+    summary['written'] = True
+    return summary
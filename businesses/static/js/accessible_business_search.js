@@ -4,6 +4,7 @@
  * Handles all interactivity for the Accessible Business Search page:
  * - Loads and initializes the map.
  * - Filters businesses in real time or on button click (depending on device width).
+ * - Offers typeahead completions for the search box.
  * - Integrates Choices.js for accessibility feature filtering.
  * - Handles map and list view toggling on mobile.
  * - Manages clear buttons for search and accessibility filters.
@@ -15,6 +16,12 @@
 import renderMarkers from './render_markers.js';
 import load_map from './load_map.js';
 import filterBusinesses from './filter_businesses.js';
+import attachTypeahead from './typeahead.js';
+import loadBusinessDetail from './business_detail.js';
+import renderBusinessAccordion from './render_business_accordion.js';
+
+// Pause in typing (ms) before a full search runs on desktop
+const SEARCH_DEBOUNCE_MS = 300;
 
 document.addEventListener('DOMContentLoaded', function() {
     /**
@@ -25,12 +32,18 @@ document.addEventListener('DOMContentLoaded', function() {
 
     /**
      * Sets up search input filtering:
-     * - On desktop, filters in real time as the user types.
+     * - Completions come from the lightweight typeahead endpoint on every keystroke.
+     * - On desktop, runs the full search once the user pauses typing.
      * - On mobile, filters when the Search button is clicked.
      */
     const searchInput = document.getElementById('business-search');
+    attachTypeahead(searchInput);
     if (window.matchMedia('(min-width: 768px)').matches) {
-        searchInput.addEventListener('input', filterBusinesses);
+        let searchTimer;
+        searchInput.addEventListener('input', () => {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(filterBusinesses, SEARCH_DEBOUNCE_MS);
+        });
     } else {
         const searchBtn = document.getElementById('search-btn');
         if (searchBtn) {
@@ -42,13 +55,14 @@ document.addEventListener('DOMContentLoaded', function() {
      * Triggers filtering when the map is panned or zoomed (desktop only).
      */
     if (window.MAP && window.MAP.map && window.matchMedia('(min-width: 768px)').matches) {
-        // Only re-filter once the user finishes dragging (panning) or zooming on larger screens
+        // Only re-filter once the user finishes dragging (panning) or zooming on larger screens,
+        // searching the new viewport rather than moving back to a place named in the search
         window.MAP.map.on('dragend', () => {
-                filterBusinesses();
+                filterBusinesses({ fromMap: true });
             }
         );
         window.MAP.map.on('zoomend', () => {
-            filterBusinesses();
+            filterBusinesses({ fromMap: true });
         });
     }
 
@@ -81,6 +95,22 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    /**
+     * Reruns the filter when switching between matching all or any selected features.
+     */
+    const accessibilityMatch = document.getElementById('accessibility-match');
+    if (accessibilityMatch) {
+        accessibilityMatch.addEventListener('change', filterBusinesses);
+    }
+
+    /**
+     * Reruns the filter when the "Open now" toggle changes.
+     */
+    const openNow = document.getElementById('open-now');
+    if (openNow) {
+        openNow.addEventListener('change', filterBusinesses);
+    }
+
     /**
      * Shows random results on desktop when no input is present.
      */
@@ -152,18 +182,21 @@ document.addEventListener('DOMContentLoaded', function() {
             const body = document.getElementById('info-overlay-body');
             if (listItem && overlay && body) {
                 // Build overlay content: popup portion + accordion details
-                // Clone list item and remove toggle arrow
+                // Clone list item and remove toggle arrow and (possibly unloaded) panel
                 const clone = listItem.cloneNode(true);
                 const arrowIcon = clone.querySelector('.toggle-arrow');
                 if (arrowIcon) arrowIcon.remove();
-                let content = clone.innerHTML;
-                // Append accordion panel content
-                const panel = listItem.querySelector('.accordion-collapse');
-                if (panel) {
-                    content += panel.innerHTML;
-                }
-                body.innerHTML = content;
+                const clonePanel = clone.querySelector('.accordion-collapse');
+                if (clonePanel) clonePanel.remove();
+                const summary = clone.innerHTML;
+                body.innerHTML = summary;
                 overlay.classList.remove('hide');
+                // Append the business details once fetched
+                loadBusinessDetail(id)
+                .then(detail => {
+                    body.innerHTML = summary + renderBusinessAccordion(detail);
+                })
+                .catch(() => {});
             }
         }
         // Close overlay
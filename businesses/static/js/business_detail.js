@@ -0,0 +1,29 @@
+/**
+ * business_detail.js
+ *
+ * Exports a function to fetch the details of one search result.
+ * - Search results only carry what the collapsed list item and map marker show;
+ *   address, contact details, descriptions and opening hours are fetched on demand.
+ * - Each business is requested at most once per page load (failed requests are retried).
+ */
+
+// Pending or completed detail requests by business id
+const details = new Map();
+
+export default function loadBusinessDetail(id) {
+    if (!details.has(id)) {
+        const request = fetch(`/business/ajax/${id}/`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Server returned ${response.status}`);
+            }
+            return response.json();
+        })
+        .catch(err => {
+            details.delete(id);
+            throw err;
+        });
+        details.set(id, request);
+    }
+    return details.get(id);
+}
@@ -3,31 +3,115 @@
  *
  * Handles filtering and displaying businesses on the Accessible Business Search page:
  * - Fetches businesses from the server based on search input, accessibility filters, and map bounds.
- * - Randomizes results on desktop when no filters are applied.
+ * - Follows the server's cursor pagination, rendering each page as it arrives
+ *   (ordering by tier and per-session rotation is done server-side). After MAX_PAGES
+ *   pages it stops and offers to zoom in or load the next MAX_PAGES pages.
+ * - Fetches map markers separately on desktop: clusters when zoomed out, individual businesses when zoomed in.
  * - Updates the results list and map markers in real time.
  * - Shows a loading spinner while fetching results.
  * - Handles stale/outdated AJAX responses to avoid race conditions.
  * - Stores the latest filtered businesses globally for use in other UI components.
+ * - Offers a "Did you mean" link when the server suggests a corrected search term.
+ * - Moves the map to the place when the search names a postcode or "in/near" a town, once per place.
  *
  * All logic is executed when filterBusinesses() is called (typically on input or filter change).
+ * Searches started by moving the map pass { fromMap: true }: they search the viewport the user
+ * moved to rather than around the place named in the search.
  */
 
 import renderResultsList from './render_results_list.js';
 import renderMarkers from './render_markers.js';
+import renderClusters from './render_clusters.js';
 
-// Utility to shuffle an array
-function shuffleArray(array) {
-    for (let i = array.length - 1; i > 0; i--) {
-        const j = Math.floor(Math.random() * (i + 1));
-        [array[i], array[j]] = [array[j], array[i]];
-    }
-    return array;
+// Number of result pages fetched for one search before asking to load more
+const MAX_PAGES = 5;
+// Map zoom used when the search names a place, by kind of place
+const PLACE_ZOOMS = { postcode: 15, outcode: 13, town: 12 };
+
+// Fetch one page of search results, continuing from the given cursor if any
+function fetchPage(params, cursor) {
+    const pageParams = new URLSearchParams(params);
+    if (cursor) pageParams.set('cursor', cursor);
+    return fetch(`/business/ajax/search-businesses/?${pageParams.toString()}`)
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`Server returned ${response.status}`);
+        }
+        return response.json();
+    });
+}
+
+// Prepend a "Did you mean" link that re-runs the search with the suggested term
+function renderSuggestion(suggestion) {
+    const list = document.getElementById('results-list');
+    if (!list) return;
+    const li = document.createElement('li');
+    li.className = 'list-group-item text-muted';
+    const link = document.createElement('a');
+    link.href = '#';
+    link.className = 'text-orange';
+    link.textContent = suggestion;
+    link.addEventListener('click', e => {
+        e.preventDefault();
+        document.getElementById('business-search').value = suggestion;
+        filterBusinesses();
+    });
+    li.append('Did you mean ', link, '?');
+    list.prepend(li);
+}
+
+// Append a notice that more results exist, with a button that loads them
+function renderMoreResults(loadMore) {
+    const list = document.getElementById('results-list');
+    if (!list) return;
+    const li = document.createElement('li');
+    li.id = 'more-results';
+    li.className = 'list-group-item text-muted';
+    const button = document.createElement('button');
+    button.type = 'button';
+    button.className = 'btn btn-link text-orange p-0 align-baseline';
+    button.textContent = 'load more';
+    button.addEventListener('click', () => {
+        li.remove();
+        loadMore();
+    });
+    li.append('There are more results: zoom in to narrow the search, or ', button, '.');
+    list.append(li);
+}
+
+// Fetch and render map markers for the current search and viewport
+function fetchMarkers(params, requestToken) {
+    const markerParams = new URLSearchParams(params);
+    markerParams.set('zoom', Math.floor(window.MAP.map.getZoom()));
+    fetch(`/business/ajax/cluster-businesses/?${markerParams.toString()}`)
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`Server returned ${response.status}`);
+        }
+        return response.json();
+    })
+    .then(data => {
+        // Ignore outdated responses
+        if (requestToken !== lastRequestToken) return;
+        if (data.clusters) {
+            renderClusters(data.clusters);
+        } else {
+            renderMarkers(data.businesses || []);
+        }
+    })
+    .catch(() => {
+        if (requestToken === lastRequestToken) renderMarkers([]);
+    });
 }
 
 // Token to track most recent request and ignore outdated responses
 let lastRequestToken = 0;
+// The place the map last moved to, so that it only moves again for a different place
+let lastPlaceKey = null;
 
-export default function filterBusinesses() {
+export default function filterBusinesses(options = {}) {
+    // Searches started by panning or zooming keep to the viewport
+    const fromMap = options.fromMap === true;
     // Increment token for this request
     const requestToken = ++lastRequestToken;
 
@@ -50,6 +134,12 @@ export default function filterBusinesses() {
     if (search) params.append('q', search); 
     // Append each selected accessibility feature
     access.forEach(feature => params.append('accessibility', feature)); 
+    // Match all or any of the selected features
+    const accessMatch = document.getElementById('accessibility-match');
+    if (access.length && accessMatch && accessMatch.value === 'any') params.append('accessibility_match', 'any');
+    // Only businesses open at the moment
+    const openNow = document.getElementById('open-now');
+    if (openNow && openNow.checked) params.append('open_now', '1');
 
     let businesses = [];
     // Include map viewport bounds if map is initialized
@@ -61,6 +151,7 @@ export default function filterBusinesses() {
         params.append('min_lng', sw.lng);
         params.append('max_lat', ne.lat);
         params.append('max_lng', ne.lng);
+        if (fromMap) params.append('in_view', '1');
     }
     
     // Show loading indicator in results list
@@ -79,54 +170,66 @@ export default function filterBusinesses() {
     }
     
     // Fetch businesses based on search, accessibility filters, and map bounds
-    fetch(`/business/ajax/search-businesses/?${params.toString()}`)
-    .then(response => {
-        // If this is not the latest request, bail out
+    let pagesFetched = 0;
+    const handlePage = data => {
+        // Ignore outdated responses
         if (requestToken !== lastRequestToken) throw new Error('stale');
         const spinnerEl = document.getElementById('search-spinner');
         if (spinnerEl) spinnerEl.remove();
-        if (!response.ok) {
-            throw new Error(`Server returned ${response.status}`);
+        businesses = businesses.concat(data.businesses || []);
+        // The search named a new place: centre the map on it before filtering to the viewport
+        if (pagesFetched === 0 && !fromMap) {
+            const placeKey = data.place ? `${data.place.kind}:${data.place.name}` : null;
+            if (placeKey && placeKey !== lastPlaceKey && window.MAP && window.MAP.map) {
+                window.MAP.map.jumpTo({
+                    center: [data.place.lng, data.place.lat],
+                    zoom: PLACE_ZOOMS[data.place.kind] || 12,
+                });
+            }
+            lastPlaceKey = placeKey;
         }
-        return response.json();
-    })
-    .then(data => {
-        // Ignore outdated responses
-        if (requestToken !== lastRequestToken) return;
-        const spinnerEl2 = document.getElementById('search-spinner');
-        if (spinnerEl2) spinnerEl2.remove();
-        businesses = data.businesses || [];
+        let visible = businesses;
         // Client-side bounds filter: only keep businesses within current map viewport
-        if (window.MAP && window.MAP.map && businesses.length > 0) {
+        if (window.MAP && window.MAP.map && visible.length > 0) {
             const bounds = window.MAP.map.getBounds();
             const sw = bounds.getSouthWest();
             const ne = bounds.getNorthEast();
-            businesses = businesses.filter(b => {
+            visible = visible.filter(b => {
                 const loc = b.location;
                 if (!loc) return false;
                 return loc.lat >= sw.lat && loc.lat <= ne.lat && loc.lng >= sw.lng && loc.lng <= ne.lng;
             });
-        }       
-        // On md+ screens with no search or accessibility filters, randomise initial list
-        const isDesktop = window.matchMedia('(min-width: 768px)').matches;
-        if (!search && access.length === 0 && isDesktop) {
-            businesses = shuffleArray(businesses);
         }
+        const isDesktop = window.matchMedia('(min-width: 768px)').matches;
 
         // Store the latest results globally for toggling markers on mobile screens
-        window.filteredBusinesses = businesses;
+        window.filteredBusinesses = visible;
         // Render results list
-        renderResultsList(businesses);
+        renderResultsList(visible);
+        // Offer the server's spelling suggestion above the results
+        if (data.suggestion) {
+            renderSuggestion(data.suggestion);
+        }
         // Resize the map after the list sidebar toggles to keep the centre consistent
         if (window.MAP && window.MAP.map) {
             window.MAP.map.resize();
         }
-        // Render markers on the map for md+ screens
-        if (isDesktop) {
-            renderMarkers(businesses);
-        }        
-    })
-    .catch(err => {
+        // Render markers on the map for md+ screens once the first page is listed
+        if (isDesktop && pagesFetched === 0 && window.MAP && window.MAP.map) {
+            fetchMarkers(params, requestToken);
+        }
+        // Continue with the next page, if any, pausing every MAX_PAGES pages until asked for more
+        pagesFetched++;
+        if (data.next_cursor) {
+            if (pagesFetched % MAX_PAGES) {
+                return fetchPage(params, data.next_cursor).then(handlePage);
+            }
+            renderMoreResults(() => {
+                fetchPage(params, data.next_cursor).then(handlePage).catch(handleError);
+            });
+        }
+    };
+    const handleError = err => {
         if (err.message === 'stale') return;
         // Remove loading indicator on error
         const spinnerEl3 = document.getElementById('search-spinner');
@@ -137,5 +240,8 @@ export default function filterBusinesses() {
             window.MAP.map.resize();
             renderMarkers([]);
         }
-    });
+    };
+    fetchPage(params)
+    .then(handlePage)
+    .catch(handleError);
 }
\ No newline at end of file
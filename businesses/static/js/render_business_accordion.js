@@ -1,7 +1,9 @@
 /**
  * render_business_accordion.js
  *
- * Exports a function to render the HTML for a business accordion body.
+ * Exports a function to render the HTML for a business accordion body from the
+ * business's details (see business_detail.js).
+ * - Displays the full address.
  * - Displays accessibility features as badges.
  * - Shows website, social links, email, phone, description, services, offers, and opening hours.
  * - Uses renderOpeningHoursTable to format opening hours if present.
@@ -11,14 +13,18 @@
 import renderOpeningHoursTable from './render_opening_hours_table.js';
 
 export default function renderBusinessAccordion(biz) {
+    // Combine separate address fields into a single formatted block
+    const address = [biz.street_address1, biz.street_address2, biz.town_or_city, biz.county, biz.postcode]
+        .filter(part => part)
+        .join(', ');
     let accessibility = '';
     if (biz.accessibility_features && biz.accessibility_features.length) {
         accessibility = biz.accessibility_features.map(f => `<span class='badge accessibility-badge'>${f}</span>`).join(' ');
     }
     let website = biz.website ? `<a href=\"${biz.website}\" target=\"_blank\" class=\"text-orange\"><i class=\"bi bi-globe fs-5 me-2 text-orange\"></i>${biz.website}</a>` : '';
-    let facebook = biz.facebook_url ? `<a href=\"${biz.facebook_url}\" target=\"_blank\" class=\"me-2\"><i class=\"bi bi-facebook text-orange\"></i></a>` : '';
-    let instagram = biz.instagram_url ? `<a href=\"${biz.instagram_url}\" target=\"_blank\" class=\"me-2\"><i class=\"bi bi-instagram fs-5 me-2 text-orange\"></i></a>` : '';
-    let x_twitter = biz.x_twitter_url ? `<a href=\"${biz.x_twitter_url}\" target=\"_blank\" class=\"me-2\"><i class=\"bi bi-twitter-x text-orange\"></i></a>` : '';
+    let facebook = biz.facebook ? `<a href=\"${biz.facebook}\" target=\"_blank\" class=\"me-2\"><i class=\"bi bi-facebook text-orange\"></i></a>` : '';
+    let instagram = biz.instagram ? `<a href=\"${biz.instagram}\" target=\"_blank\" class=\"me-2\"><i class=\"bi bi-instagram fs-5 me-2 text-orange\"></i></a>` : '';
+    let x_twitter = biz.twitter ? `<a href=\"${biz.twitter}\" target=\"_blank\" class=\"me-2\"><i class=\"bi bi-twitter-x text-orange\"></i></a>` : '';
     let public_email = biz.public_email ? `<a href=\"mailto:${biz.public_email}\" class=\"text-orange\"><i class=\"bi bi-envelope fs-5 me-2 text-coffee\"></i>${biz.public_email}</a>` : '';
     let phone = biz.public_phone ? `<i class='bi bi-telephone fs-5 me-2 text-green'></i>${biz.public_phone}` : '';
     let description = biz.description ? `<i class='bi bi-card-text fs-5 me-2 text-orange'></i>${biz.description}` : '';
@@ -27,6 +33,7 @@ export default function renderBusinessAccordion(biz) {
     let opening_hours = biz.opening_hours ? renderOpeningHoursTable(biz.opening_hours) : '';
     return `
         <div class=\"accordion-body mt-3 mb-1\">
+            ${address ? `<div class=\"mb-2\">${address}</div>` : ''}
             ${accessibility ? `<div class=\"mb-2\">${accessibility}</div>` : ''}
             ${website ? `<div class=\"mb-1 text-orange\">${website}</div>` : ''}
             ${(facebook || instagram || x_twitter) ? `<div class=\"mb-1 d-flex flex-row align-items-center\"><i class='bi bi-share fs-5 me-2 text-mango'></i>${facebook}${instagram}${x_twitter}</div>` : ''}
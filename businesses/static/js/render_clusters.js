@@ -0,0 +1,36 @@
+/**
+ * render_clusters.js
+ *
+ * Exports a function to render server-side business clusters on the MapLibre map.
+ * - Removes old markers before rendering new ones.
+ * - Draws a bubble showing the business count at each cluster centroid, sized by count.
+ * - Zooms in on a cluster when it is clicked.
+ * - Keeps track of all markers for easy removal.
+ */
+export default function renderClusters(clusters) {
+    // Remove old markers (MapLibre)
+    if (MAP.markers.length) {
+        MAP.markers.forEach(m => m.remove());
+    }
+    MAP.markers = [];
+    if (!MAP.map || !clusters) return;
+    clusters.forEach(cluster => {
+        const el = document.createElement('div');
+        el.className = 'map-cluster';
+        // Grow the bubble logarithmically with the number of businesses
+        const size = 30 + Math.min(30, Math.round(Math.log2(cluster.count) * 5));
+        el.style.width = `${size}px`;
+        el.style.height = `${size}px`;
+        el.textContent = cluster.count;
+        el.title = `${cluster.count} businesses, ${cluster.verified} verified by Wheelers`;
+        // Zoom towards the cluster to reveal the businesses inside it
+        el.addEventListener('click', () => {
+            MAP.map.easeTo({ center: [cluster.lng, cluster.lat], zoom: MAP.map.getZoom() + 2 });
+        });
+        const marker = new maplibregl.Marker({ element: el })
+            .setLngLat([cluster.lng, cluster.lat])
+            .addTo(MAP.map);
+        // Keep track for removal
+        MAP.markers.push(marker);
+    });
+}
@@ -2,13 +2,14 @@
  * render_results_list.js
  *
  * Exports a function to render the list of businesses in the search results panel.
- * - Creates list items for each business, including logo, name, categories, address, and badges.
+ * - Creates list items for each business, including logo, name, categories, town, and badges.
  * - Handles verified and verification-requested badges.
- * - Renders an accordion panel with detailed business info.
+ * - Renders an accordion panel with detailed business info, fetched when it is first opened.
  * - Handles toggling of the accordion and prevents toggling when clicking the verification badge.
  * - Displays a "No results found" message if the list is empty.
  */
 
+import loadBusinessDetail from './business_detail.js';
 import renderBusinessAccordion from './render_business_accordion.js';
 import toggleBusinessAccordion from './toggle_business_accordion.js';
 
@@ -33,14 +34,8 @@ export default function renderResultsList(businesses) {
             }
             li.className = 'list-group-item';
             let categories = biz.categories && biz.categories.length ? biz.categories.join(', ') : '';
-            // Combine separate address fields into a single formatted block
-            let addressParts = [];
-            if (biz.street_address1) addressParts.push(biz.street_address1);
-            if (biz.street_address2) addressParts.push(biz.street_address2);
-            if (biz.town_or_city) addressParts.push(biz.town_or_city);
-            if (biz.county) addressParts.push(biz.county);
-            if (biz.postcode) addressParts.push(biz.postcode);
-            let address = addressParts.length ? `<div class="mb-1">${addressParts.join(', ')}</div>` : '';
+            // The full address is part of the details; show the town until then
+            let address = biz.town_or_city ? `<div class="mb-1">${biz.town_or_city}</div>` : '';
             let logo = biz.logo ? `<img src="${biz.logo}" alt="${biz.business_name} Logo" class="business-logo-img me-2">` : '';
             let verified = (biz.is_wheeler_verified === true || biz.is_wheeler_verified === 'true' || biz.is_wheeler_verified === 1 || biz.is_wheeler_verified === '1') ? `<div class="mt-2 px-2 py-1 btn-green-outline-no-hover rounded d-inline-block"><span class="fw-bold"><i class="bi bi-check-circle-fill pe-2"></i>Verified by Wheelers</span></div>` : '';
             // Badge for businesses that have requested verification (only for verified wheelers)
@@ -65,17 +60,27 @@ export default function renderResultsList(businesses) {
                 ${requestedBadge}
             `;
             li.style.cursor = 'pointer';
-            // Create additional information in initially hidden accordion panel
+            // Create the initially hidden accordion panel; its details are fetched on first open
             const infoPanel = document.createElement('div');
             infoPanel.className = 'accordion-collapse collapse';
             infoPanel.classList.add('hide');
-            infoPanel.innerHTML = renderBusinessAccordion(biz);
             li.appendChild(infoPanel);
             // Get the arrow icon element
             const arrowIcon = li.querySelector('.toggle-arrow');
             // Listen for click to toggle accordion
             li.addEventListener('click', function(e) {
                 e.stopPropagation();
+                if (!infoPanel.dataset.loaded && !infoPanel.classList.contains('show')) {
+                    infoPanel.innerHTML = `<div class="accordion-body mt-3 mb-1 text-muted">Loading...</div>`;
+                    loadBusinessDetail(biz.id)
+                    .then(detail => {
+                        infoPanel.innerHTML = renderBusinessAccordion(detail);
+                        infoPanel.dataset.loaded = 'true';
+                    })
+                    .catch(() => {
+                        infoPanel.innerHTML = `<div class="accordion-body mt-3 mb-1 text-muted">Details could not be loaded.</div>`;
+                    });
+                }
                 toggleBusinessAccordion(li, infoPanel, arrowIcon, biz);
             });
             // Prevent toggling when clicking the verification request badge
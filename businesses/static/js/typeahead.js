@@ -0,0 +1,46 @@
+/**
+ * typeahead.js
+ *
+ * Exports a function that attaches search box completions to a text input.
+ * - Fetches completions for the typed prefix from the typeahead endpoint.
+ * - Shows them in a <datalist> linked to the input.
+ * - Ignores responses that arrive after a newer keystroke.
+ */
+let lastSuggestToken = 0;
+
+export default function attachTypeahead(input) {
+    if (!input) return;
+    const datalist = document.createElement('datalist');
+    datalist.id = `${input.id}-suggestions`;
+    input.after(datalist);
+    input.setAttribute('list', datalist.id);
+    input.setAttribute('autocomplete', 'off');
+
+    input.addEventListener('input', () => {
+        const requestToken = ++lastSuggestToken;
+        const prefix = input.value.trim();
+        if (!prefix) {
+            datalist.innerHTML = '';
+            return;
+        }
+        fetch(`/business/ajax/suggest/?${new URLSearchParams({ q: prefix }).toString()}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Server returned ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            // Ignore outdated responses
+            if (requestToken !== lastSuggestToken) return;
+            datalist.innerHTML = '';
+            data.suggestions.forEach(suggestion => {
+                const option = document.createElement('option');
+                option.value = suggestion.text;
+                option.label = suggestion.type;
+                datalist.appendChild(option);
+            });
+        })
+        .catch(err => console.error('Error fetching suggestions:', err));
+    });
+}
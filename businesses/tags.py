@@ -0,0 +1,50 @@
+"""
+Normalised category tags.
+
+- normalise_tag: lowercases, strips accents and collapses whitespace, so "Café" and
+  "cafe" match.
+- sync_category_tags: rewrites a category's CategoryTag rows from its `tags` JSON.
+- tag_category_ids: ids of categories with a tag starting with a term (an index scan).
+"""
+
+import unicodedata
+
+from .models import CategoryTag
+
+# Shorter terms would match too many tags to be useful
+MIN_TAG_PREFIX = 2
+
+
+def normalise_tag(text):
+    """Lowercase, accent-free, single-spaced form of a tag or search term."""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
+
+def sync_category_tags(category):
+    """Replace the category's CategoryTag rows with its current `tags`, one row per distinct normalised tag."""
+    rows = {}
+    for tag in category.tags or []:
+        normalised = normalise_tag(tag)
+        if normalised and normalised not in rows:
+            rows[normalised] = CategoryTag(category=category, tag=str(tag), normalised=normalised)
+    CategoryTag.objects.filter(category=category).exclude(normalised__in=list(rows)).delete()
+    CategoryTag.objects.bulk_create(rows.values(), ignore_conflicts=True)
+
+
+def tag_category_ids(term):
+    """
+    Return the ids of categories with a tag that starts with `term` (after normalisation).
+
+    The `LIKE 'term%'` predicate is served by the text_pattern_ops index on
+    CategoryTag.normalised.
+    """
+    prefix = normalise_tag(term)
+    if len(prefix) < MIN_TAG_PREFIX:
+        return []
+    return list(
+        CategoryTag.objects.filter(normalised__startswith=prefix)
+        .values_list('category_id', flat=True)
+        .distinct()
+    )
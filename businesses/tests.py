@@ -0,0 +1,1341 @@
+"""
+Test suite for the businesses app covering the AJAX business search API,
+its serialisation and the search documents it reads.
+Run using python manage.py test businesses
+"""
+
+import gzip
+import io
+import json
+import os
+import struct
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from checkout.models import Purchase
+from core import lookups
+from verification.models import WheelerVerification, WheelerVerificationApplication
+
+from .documents import feature_bit, refresh_search_documents
+from .flatgeobuf import write_flatgeobuf
+from .forms import BusinessRegistrationForm
+from .gazetteer import find_place, normalise_place, split_location
+from .models import (
+    AccessibilityFeature, Business, BusinessSearchDocument, Category, CategoryTag, MembershipTier, Place,
+)
+from . import opening_hours, typeahead
+from .opening_hours import COMPILED_CACHE_SIZE, compile_opening_hours, opening_periods
+from .result_cache import (
+    GENERATION_KEY, cache_area, cache_stats, current_generation, invalidate_all_results, reset_cache_stats,
+)
+from .search import (
+    bounds_envelope, decode_cursor, encode_cursor, filter_businesses, parse_bounds, search_page, searchable_documents,
+)
+from .serializers import search_results_queryset, serialize_business, serialize_business_detail
+from .snapshot import build_snapshot, read_manifest
+from .tags import normalise_tag, tag_category_ids
+from .templatetags.time_extras import format_time
+from .tiles import tiles_for_point
+from .typeahead import PrefixIndex, reset_index
+
+
+User = get_user_model()
+
+
+def create_business(name, lng=-0.1278, lat=51.5074, **kwargs):
+    """Create a business (approved unless given) with its own owner profile at the given coordinates."""
+    kwargs.setdefault('is_approved', True)
+    owner = User.objects.create_user(
+        username=f"owner_{User.objects.count()}",
+        email=f"owner_{User.objects.count()}@example.com",
+        password='testpass123',
+    )
+    return Business.objects.create(
+        business_owner=owner.profile,
+        business_name=name,
+        location=Point(lng, lat),
+        **kwargs
+    )
+
+
+def read_flatgeobuf(data):
+    """
+    Minimal FlatGeobuf reader for the tests: the header, the bbox of the index root and
+    every feature as (x, y, properties), read through the index leaves.
+    """
+    assert data[:8] == b'fgb\x03fgb\x00'
+
+    def u32(pos):
+        return struct.unpack_from('<I', data, pos)[0]
+
+    def table(pos):
+        """A reader for the fields of the FlatBuffers table at `pos`: scalars by format, else the offset."""
+        vtable = pos - struct.unpack_from('<i', data, pos)[0]
+        vtable_size = struct.unpack_from('<H', data, vtable)[0]
+
+        def field(slot, fmt=None, default=None):
+            entry = 4 + 2 * slot
+            offset = struct.unpack_from('<H', data, vtable + entry)[0] if entry < vtable_size else 0
+            if not offset:
+                return default
+            if fmt:
+                return struct.unpack_from(fmt, data, pos + offset)[0]
+            return pos + offset + u32(pos + offset)
+        return field
+
+    def string(pos):
+        return data[pos + 4:pos + 4 + u32(pos)].decode()
+
+    def vector(pos, fmt):
+        size = struct.calcsize(fmt)
+        return [struct.unpack_from(fmt, data, pos + 4 + size * i)[0] for i in range(u32(pos))]
+
+    header = table(12 + u32(12))
+    columns_pos = header(7)
+    columns = []
+    for i in range(u32(columns_pos)):
+        element = columns_pos + 4 + 4 * i
+        column = table(element + u32(element))
+        columns.append((string(column(0)), column(1, '<B')))
+    crs = table(header(10))
+    count = header(8, '<Q', 0)
+    node_size = header(9, '<H', 16)
+    layer = {
+        'name': string(header(0)),
+        'envelope': vector(header(1), '<d'),
+        'geometry_type': header(2, '<B'),
+        'columns': columns,
+        'count': count,
+        'crs': (string(crs(0)), crs(1, '<i')),
+    }
+    # the packed R-tree: root first, leaves last, with at least one level above the leaves
+    nodes = level = count
+    while True:
+        level = -(-level // node_size)
+        nodes += level
+        if level == 1:
+            break
+    index = 8 + 4 + u32(8)
+    layer['root_bbox'] = list(struct.unpack_from('<dddd', data, index))
+    features_start = index + nodes * 40
+    layer['features'] = []
+    for leaf in range(nodes - count, nodes):
+        offset = features_start + struct.unpack_from('<Q', data, index + leaf * 40 + 32)[0]
+        feature = table(offset + 4 + u32(offset + 4))
+        x, y = vector(table(feature(0))(1), '<d')
+        raw = data[feature(1) + 4:feature(1) + 4 + u32(feature(1))]
+        properties, pos = {}, 0
+        while pos < len(raw):
+            name, kind = columns[struct.unpack_from('<H', raw, pos)[0]]
+            pos += 2
+            if kind == 7:
+                properties[name] = struct.unpack_from('<q', raw, pos)[0]
+                pos += 8
+            elif kind == 2:
+                properties[name] = bool(raw[pos])
+                pos += 1
+            else:
+                length = struct.unpack_from('<I', raw, pos)[0]
+                text = raw[pos + 4:pos + 4 + length].decode()
+                properties[name] = json.loads(text) if kind == 12 else text
+                pos += 4 + length
+        layer['features'].append((x, y, properties))
+    return layer
+
+
+class SearchSerializerTests(TestCase):
+    """Tests for the search result serializer and its query budget."""
+
+    def setUp(self):
+        """Create tiers, a category, features and a handful of businesses."""
+        self.free = MembershipTier.objects.create(tier='free', description=[])
+        self.premium = MembershipTier.objects.create(tier='premium', description=[])
+        self.category = Category.objects.create(code='cafe', name='Café', tags=['coffee'])
+        self.features = [
+            AccessibilityFeature.objects.create(code='step_free', name='Step-free access'),
+            AccessibilityFeature.objects.create(code='toilet', name='Accessible toilet'),
+        ]
+        for i in range(5):
+            biz = create_business(
+                f"Cafe {i}",
+                membership_tier=self.premium if i % 2 else self.free,
+                public_email=f"cafe{i}@example.com",
+            )
+            biz.categories.add(self.category)
+            biz.accessibility_features.add(*self.features)
+
+    def test_query_budget_is_constant(self):
+        """Serialising all results should cost one query plus one per prefetched relation."""
+        with self.assertNumQueries(3):
+            results = [serialize_business(b) for b in search_results_queryset(Business.objects.all())]
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0]['categories'], ['Café'])
+        self.assertCountEqual(results[0]['accessibility_feature_ids'], [f.id for f in self.features])
+
+    def test_search_row_is_slim(self):
+        """Search results should leave contact details and descriptions to the detail endpoint."""
+        biz = search_results_queryset(Business.objects.all()).first()
+        row = serialize_business(biz)
+        self.assertNotIn('public_email', row)
+        self.assertNotIn('opening_hours', row)
+        detail = serialize_business_detail(biz)
+        self.assertCountEqual(detail['accessibility_features'], ['Step-free access', 'Accessible toilet'])
+
+    def test_free_tier_fields_hidden(self):
+        """Free-tier businesses should not expose paid-tier fields."""
+        qs = search_results_queryset(Business.objects.all())
+        for biz in qs:
+            data = serialize_business_detail(biz)
+            if biz.membership_tier == self.free:
+                self.assertEqual(data['public_email'], '')
+            else:
+                self.assertTrue(data['public_email'])
+
+    def test_search_view_query_count_independent_of_results(self):
+        """The search endpoint should issue the same number of queries for 5 or 25 results."""
+        User.objects.create_user(username='searcher', email='searcher@example.com', password='testpass123')
+        self.client.login(username='searcher', password='testpass123')
+        url = reverse('ajax_search_businesses')
+        # first request stores the session's ordering seed
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['businesses']), 5)
+        for i in range(20):
+            biz = create_business(f"Extra {i}", membership_tier=self.free)
+            biz.categories.add(self.category)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['businesses']), 25)
+        self.assertEqual(len(small), len(large))
+
+
+class BusinessDetailEndpointTests(TestCase):
+    """Tests for the lazily fetched details of one search result."""
+
+    def setUp(self):
+        """Create a free and a premium business and log in."""
+        self.free = MembershipTier.objects.create(tier='free', description=[])
+        self.premium = MembershipTier.objects.create(tier='premium', description=[])
+        self.free_biz = create_business(
+            "Free Cafe", membership_tier=self.free, public_email='free@example.com', postcode='LS1 4AP'
+        )
+        self.paid_biz = create_business(
+            "Paid Cafe", membership_tier=self.premium, public_email='paid@example.com', facebook_url='https://facebook.com/paid'
+        )
+        User.objects.create_user(username='walker', email='walker@example.com', password='testpass123')
+        self.client.login(username='walker', password='testpass123')
+
+    def url(self, biz):
+        """The detail endpoint URL for a business."""
+        return reverse('ajax_business_detail', args=[biz.pk])
+
+    def test_detail_is_tier_gated(self):
+        """Paid-tier fields should only be returned for businesses on a paid tier."""
+        free = self.client.get(self.url(self.free_biz)).json()
+        self.assertEqual(free['postcode'], 'LS1 4AP')
+        self.assertEqual(free['public_email'], '')
+        paid = self.client.get(self.url(self.paid_biz)).json()
+        self.assertEqual(paid['public_email'], 'paid@example.com')
+        self.assertEqual(paid['facebook'], 'https://facebook.com/paid')
+
+    def test_detail_revalidates_until_changed(self):
+        """The detail should carry an ETag that changes only when the business does."""
+        response = self.client.get(self.url(self.paid_biz))
+        self.assertIn('max-age=60', response['Cache-Control'])
+        etag = response['ETag']
+        cached = self.client.get(self.url(self.paid_biz), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.paid_biz.description = 'Now serving brunch'
+        self.paid_biz.save()
+        response = self.client.get(self.url(self.paid_biz), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['description'], 'Now serving brunch')
+
+    def test_unknown_business(self):
+        """An id without a search document should return 404."""
+        self.assertEqual(self.client.get(reverse('ajax_business_detail', args=[999999])).status_code, 404)
+
+
+class BusinessSnapshotTests(TestCase):
+    """Tests for the incrementally built public GeoJSON/FlatGeobuf snapshot."""
+
+    def setUp(self):
+        """Point the snapshot at a temporary directory and create two businesses."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(BUSINESS_SNAPSHOT_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.free = MembershipTier.objects.create(tier='free', description=[])
+        self.cafe = create_business("Snapshot Cafe", membership_tier=self.free, public_email='cafe@example.com')
+        self.shop = create_business("Snapshot Shop", lng=-1.5491, lat=53.7965)
+        self.url = reverse('business_snapshot', args=['geojson'])
+
+    def features(self, response):
+        """The GeoJSON features of a gzipped snapshot response, by id."""
+        data = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        return {feature['id']: feature for feature in data['features']}
+
+    def features_plain(self, response):
+        """The GeoJSON features of an uncompressed snapshot response."""
+        return json.loads(b''.join(response.streaming_content))['features']
+
+    def test_snapshot_has_public_fields_only(self):
+        """Every business should be included with its tier-gated public fields."""
+        self.assertEqual(build_snapshot()['total'], 2)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        features = self.features(response)
+        cafe = features[self.cafe.pk]
+        self.assertEqual(cafe['geometry']['coordinates'], [-0.1278, 51.5074])
+        self.assertEqual(cafe['properties']['business_name'], "Snapshot Cafe")
+        self.assertEqual(cafe['properties']['public_email'], '')
+        fgb = read_flatgeobuf(b''.join(self.client.get(reverse('business_snapshot', args=['fgb'])).streaming_content))
+        self.assertEqual(fgb['count'], 2)
+        served = {properties['id']: (x, y, properties) for x, y, properties in fgb['features']}
+        self.assertEqual(served[self.cafe.pk][:2], (-0.1278, 51.5074))
+        self.assertEqual(served[self.cafe.pk][2]['business_name'], "Snapshot Cafe")
+        self.assertEqual(served[self.cafe.pk][2]['public_email'], '')
+
+    def test_incremental_rebuild(self):
+        """Rebuilds should only pick up changes, and skip writing when there are none."""
+        build_snapshot()
+        self.assertFalse(build_snapshot()['written'])
+        self.cafe.business_name = "Renamed Cafe"
+        self.cafe.save()
+        self.shop.delete()
+        summary = build_snapshot()
+        self.assertEqual((summary['changed'], summary['removed'], summary['total']), (1, 1, 1))
+        features = self.features(self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(features[self.cafe.pk]['properties']['business_name'], "Renamed Cafe")
+
+    def test_served_without_queries_and_revalidated(self):
+        """Serving the snapshot should not query the database, and should honour its ETag."""
+        build_snapshot()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+            etag = response['ETag']
+            self.assertEqual(len(self.features_plain(response)), 2)
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+    def test_each_encoding_has_its_own_etag(self):
+        """Gzipped and plain GeoJSON should carry different ETags and vary on Accept-Encoding."""
+        build_snapshot()
+        plain = self.client.get(self.url)
+        gzipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertNotEqual(plain['ETag'], gzipped['ETag'])
+        self.assertIn('Accept-Encoding', gzipped['Vary'])
+        self.assertEqual(sorted(self.features(gzipped)), sorted(feature['id'] for feature in self.features_plain(plain)))
+        stale = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(stale.status_code, 200)
+
+    def test_rebuild_keeps_previous_files(self):
+        """A rebuild should write new files under new names and keep the previous build's files."""
+        build_snapshot()
+        first = read_manifest()['files']['geojson']['gzip']['name']
+        self.cafe.business_name = "Renamed Cafe"
+        self.cafe.save()
+        build_snapshot()
+        second = read_manifest()['files']['geojson']['gzip']['name']
+        self.assertNotEqual(first, second)
+        self.assertTrue(os.path.exists(os.path.join(settings.BUSINESS_SNAPSHOT_DIR, first)))
+        self.shop.delete()
+        build_snapshot()
+        self.assertFalse(os.path.exists(os.path.join(settings.BUSINESS_SNAPSHOT_DIR, first)))
+        self.assertTrue(os.path.exists(os.path.join(settings.BUSINESS_SNAPSHOT_DIR, second)))
+
+    def test_missing_snapshot(self):
+        """Before the first build, and for unknown formats, the endpoint should return 404."""
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        build_snapshot()
+        self.assertEqual(self.client.get(reverse('business_snapshot', args=['kml'])).status_code, 404)
+
+
+class FlatGeobufTests(SimpleTestCase):
+    """Round-trip tests for the FlatGeobuf writer, read back with a minimal reader."""
+
+    columns = [('id', 'long'), ('name', 'string'), ('tags', 'json'), ('open', 'bool')]
+
+    def write(self, features):
+        """The bytes of a layer written with the test columns."""
+        f = io.BytesIO()
+        write_flatgeobuf(f, 'places', self.columns, features)
+        return f.getvalue()
+
+    def test_header_and_index(self):
+        """The header should describe the layer, and the index root should cover every feature."""
+        layer = read_flatgeobuf(self.write([(i * 0.1, 50 + i * 0.05, {'id': i}) for i in range(40)]))
+        self.assertEqual(layer['name'], 'places')
+        self.assertEqual(layer['count'], 40)
+        self.assertEqual(layer['geometry_type'], 1)
+        self.assertEqual(layer['crs'], ('EPSG', 4326))
+        self.assertEqual(layer['columns'], [('id', 7), ('name', 11), ('tags', 12), ('open', 2)])
+        self.assertEqual(layer['envelope'], [0.0, 50.0, 3.9000000000000004, 51.95])
+        self.assertEqual(layer['root_bbox'], layer['envelope'])
+        self.assertEqual(sorted(properties['id'] for _, _, properties in layer['features']), list(range(40)))
+
+    def test_feature_properties(self):
+        """A feature's geometry and properties should read back as written, without the empty ones."""
+        layer = read_flatgeobuf(self.write([
+            (-0.1278, 51.5074, {'id': 7, 'name': "Café", 'tags': ['ramp', 'lift'], 'open': True}),
+            (-1.5491, 53.7965, {'id': 8, 'name': None, 'tags': [], 'open': False}),
+        ]))
+        features = {properties['id']: (x, y, properties) for x, y, properties in layer['features']}
+        self.assertEqual(features[7], (-0.1278, 51.5074, {'id': 7, 'name': "Café", 'tags': ['ramp', 'lift'], 'open': True}))
+        self.assertEqual(features[8][2], {'id': 8, 'tags': [], 'open': False})
+
+    def test_single_feature(self):
+        """A layer of one feature should still have a root above its leaf."""
+        layer = read_flatgeobuf(self.write([(1.5, 2.5, {'id': 1})]))
+        self.assertEqual(layer['root_bbox'], [1.5, 2.5, 1.5, 2.5])
+        self.assertEqual(layer['features'], [(1.5, 2.5, {'id': 1})])
+
+
+class ApprovedSearchScopeTests(TestCase):
+    """Tests for the approved-only search scope and the indexes behind the hot queries."""
+
+    def setUp(self):
+        """Create an approved and an unapproved business and log in."""
+        self.approved = create_business("Open Cafe")
+        self.pending = create_business("Hidden Cafe", lng=-0.1270, is_approved=False)
+        self.user = User.objects.create_user(username='walker', email='walker@example.com', password='testpass123')
+        self.client.login(username='walker', password='testpass123')
+
+    def search_names(self, **params):
+        """Names of the businesses the search endpoint returns for `params`."""
+        data = self.client.get(reverse('ajax_search_businesses'), params).json()
+        return [row['business_name'] for row in data['businesses']]
+
+    def test_unapproved_businesses_are_not_searchable(self):
+        """Only approved businesses should be searched, listed in detail or suggested."""
+        self.assertEqual(self.search_names(q='cafe'), ["Open Cafe"])
+        self.assertEqual(self.search_names(min_lat=51.4, min_lng=-0.2, max_lat=51.6, max_lng=0.0), ["Open Cafe"])
+        detail_url = reverse('ajax_business_detail', args=[self.pending.pk])
+        self.assertEqual(self.client.get(detail_url).status_code, 404)
+        self.pending.is_approved = True
+        self.pending.save()
+        self.assertCountEqual(self.search_names(q='cafe'), ["Open Cafe", "Hidden Cafe"])
+        self.assertEqual(self.client.get(detail_url).status_code, 200)
+
+    def plan(self, qs):
+        """EXPLAIN output for a queryset, with sequential scans disabled so any usable index shows."""
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return qs.explain()
+
+    def test_hot_queries_use_indexes(self):
+        """The viewport, tier, verification and purchase lookups should be index scans."""
+        bounds = QueryDict('min_lat=51.4&min_lng=-0.2&max_lat=51.6&max_lng=0.0')
+        self.assertIn('search_doc_approved_geom_gist', self.plan(filter_businesses(bounds)))
+        self.assertIn('search_doc_approved_tier', self.plan(searchable_documents().filter(tier_rank=1)))
+        applications = WheelerVerificationApplication.objects.filter(wheeler=self.user, approved=True)
+        self.assertIn('verification_app_wheeler_appr', self.plan(applications.values_list('business_id', flat=True)))
+        self.assertIn('verification_wheeler_business', self.plan(WheelerVerification.objects.filter(wheeler=self.user)))
+        purchases = Purchase.objects.filter(business=self.approved, purchase_type='membership').order_by('-created_at')
+        self.assertIn('purchase_business_type_date', self.plan(purchases[:1]))
+
+
+class FullTextSearchTests(TestCase):
+    """Tests for the weighted full-text search of the search endpoint."""
+
+    def setUp(self):
+        """Create free-tier businesses matching on name or description, and log in."""
+        create_business("Riverside Bakery", description="Fresh bread baked every morning.")
+        create_business("Corner Shop", description="Newspapers, groceries and a small bakery counter.")
+        create_business("Wheelchair Repairs", description="Repairing wheelchairs and mobility scooters.")
+        User.objects.create_user(username='reader', email='reader@example.com', password='testpass123')
+        self.client.login(username='reader', password='testpass123')
+
+    def search_names(self, q):
+        """Names of the businesses the search endpoint returns for `q`, in order."""
+        data = self.client.get(reverse('ajax_search_businesses'), {'q': q}).json()
+        return [row['business_name'] for row in data['businesses']]
+
+    def test_stemmed_multi_word_query(self):
+        """Every word should match, in any inflection ("repairing" finds "Repairs")."""
+        self.assertEqual(self.search_names('repairing wheelchair'), ["Wheelchair Repairs"])
+        self.assertEqual(self.search_names('scooter repair'), ["Wheelchair Repairs"])
+
+    def test_name_outranks_description(self):
+        """Within a tier, a match in the name should rank above one in the description."""
+        self.assertEqual(self.search_names('bakery'), ["Riverside Bakery", "Corner Shop"])
+
+    def test_websearch_exclusion(self):
+        """A `-term` should drop businesses matching it."""
+        self.assertEqual(self.search_names('bakery -bread'), ["Corner Shop"])
+
+
+class FuzzySearchTests(TestCase):
+    """Tests for the trigram fallback and "did you mean" suggestion of the search endpoint."""
+
+    def setUp(self):
+        """Create a bakery in a Bakery category and a similarly named business, and log in."""
+        bakery = Category.objects.create(code='bakery', name='Bakery', tags=[])
+        create_business("Sunrise Bakery").categories.add(bakery)
+        create_business("Bakers Dozen")
+        User.objects.create_user(username='speller', email='speller@example.com', password='testpass123')
+        self.client.login(username='speller', password='testpass123')
+
+    def search(self, q):
+        """The decoded search response for `q`."""
+        return self.client.get(reverse('ajax_search_businesses'), {'q': q}).json()
+
+    def test_misspelt_term_falls_back_with_suggestion(self):
+        """A term with no full-text match should return similar businesses and a suggestion."""
+        data = self.search('bakerry')
+        self.assertIn("Sunrise Bakery", [row['business_name'] for row in data['businesses']])
+        self.assertEqual(data['suggestion'], 'Bakery')
+
+    def test_exact_match_skips_fallback(self):
+        """A term with full-text matches should not be widened to similar names or suggested."""
+        data = self.search('bakery')
+        self.assertEqual([row['business_name'] for row in data['businesses']], ["Sunrise Bakery"])
+        self.assertIsNone(data['suggestion'])
+
+
+class SearchDocumentTests(TestCase):
+    """Tests for the incrementally maintained search documents."""
+
+    def setUp(self):
+        """Create a free-tier business with a category and a feature."""
+        self.free = MembershipTier.objects.create(tier='free', description=[])
+        self.premium = MembershipTier.objects.create(tier='premium', description=[])
+        self.category = Category.objects.create(code='cafe', name='Café', tags=['coffee'])
+        self.feature = AccessibilityFeature.objects.create(code='step_free', name='Step-free access')
+        self.biz = create_business("Bean There", membership_tier=self.free, public_email='bean@example.com')
+
+    def document(self):
+        """Reload the business's search document."""
+        return BusinessSearchDocument.objects.get(business=self.biz)
+
+    def test_document_follows_business_and_relations(self):
+        """Saving the business or changing its categories and features should refresh the document."""
+        self.biz.categories.add(self.category)
+        self.biz.accessibility_features.add(self.feature)
+        doc = self.document()
+        self.assertEqual(doc.category_ids, [self.category.id])
+        self.assertEqual(doc.feature_mask, feature_bit(self.feature.id))
+        self.assertEqual(doc.payload['categories'], ['Café'])
+        self.assertEqual(doc.detail['public_email'], '')
+        self.biz.membership_tier = self.premium
+        self.biz.save()
+        doc = self.document()
+        self.assertEqual((doc.tier, doc.tier_rank), ('premium', 1))
+        self.assertEqual(doc.payload['tier'], 'premium')
+        self.assertEqual(doc.detail['public_email'], 'bean@example.com')
+        self.category.businesses.clear()
+        self.assertEqual(self.document().category_ids, [])
+
+    def test_related_rename_refreshes_payload(self):
+        """Renaming a category should update the payload and text search of its businesses."""
+        self.biz.categories.add(self.category)
+        self.category.name = 'Coffee house'
+        self.category.save()
+        self.assertEqual(self.document().payload['categories'], ['Coffee house'])
+        self.assertTrue(BusinessSearchDocument.objects.filter(search_vector='house').exists())
+
+    def test_refresh_recreates_missing_documents(self):
+        """refresh_search_documents should rebuild a deleted document."""
+        BusinessSearchDocument.objects.all().delete()
+        self.assertEqual(refresh_search_documents([self.biz.pk]), 1)
+        self.assertEqual(self.document().business_name, "Bean There")
+
+    def test_feature_filter_uses_mask(self):
+        """Accessibility filters should require every selected feature by default."""
+        toilet = AccessibilityFeature.objects.create(code='toilet', name='Accessible toilet')
+        self.biz.accessibility_features.add(self.feature)
+        params = QueryDict(mutable=True)
+        params.setlist('accessibility', ['Step-free access'])
+        self.assertEqual(filter_businesses(params).count(), 1)
+        params.setlist('accessibility', ['Step-free access', toilet.name])
+        self.assertEqual(filter_businesses(params).count(), 0)
+        params.setlist('accessibility', ['No such feature'])
+        self.assertEqual(filter_businesses(params).count(), 0)
+
+    def test_feature_filter_any_mode(self):
+        """With accessibility_match=any a single selected feature is enough."""
+        toilet = AccessibilityFeature.objects.create(code='toilet', name='Accessible toilet')
+        self.biz.accessibility_features.add(self.feature)
+        self.assertEqual(self.document().feature_ids, [self.feature.id])
+        params = QueryDict(mutable=True)
+        params.setlist('accessibility', ['Step-free access', toilet.name, 'No such feature'])
+        params['accessibility_match'] = 'any'
+        self.assertEqual(filter_businesses(params).count(), 1)
+        params.setlist('accessibility', [toilet.name])
+        self.assertEqual(filter_businesses(params).count(), 0)
+        params['accessibility_match'] = 'some'
+        with self.assertRaises(ValueError):
+            filter_businesses(params)
+
+
+class CategoryTagTests(TestCase):
+    """Tests for the normalised, prefix-indexed category tags."""
+
+    def setUp(self):
+        """Create a business in a category tagged with accented and mixed-case tags."""
+        self.category = Category.objects.create(code='hire', name='Hire', tags=['Wheelchair Hire', 'Crème  Brûlée', 'wheelchair hire'])
+        self.biz = create_business("Rolling Along")
+        self.biz.categories.add(self.category)
+
+    def test_tags_synced_on_save(self):
+        """Saving a category should rewrite its tag rows, one per distinct normalised tag."""
+        rows = set(CategoryTag.objects.filter(category=self.category).values_list('normalised', flat=True))
+        self.assertEqual(rows, {'wheelchair hire', 'creme brulee'})
+        self.category.tags = ['Scooters']
+        self.category.save()
+        self.assertEqual(list(self.category.tag_rows.values_list('tag', flat=True)), ['Scooters'])
+
+    def test_prefix_and_accent_insensitive_lookup(self):
+        """Partial and unaccented terms should find the category; one letter should not."""
+        self.assertEqual(tag_category_ids('WHEEL'), [self.category.id])
+        self.assertEqual(tag_category_ids('creme b'), [self.category.id])
+        self.assertEqual(tag_category_ids('w'), [])
+        self.assertEqual(normalise_tag('  Café\tAu Lait '), 'cafe au lait')
+
+    def test_text_search_matches_partial_tag(self):
+        """A partial tag should match businesses in the tagged category."""
+        docs, _ = search_page(filter_businesses(QueryDict()), 'wheelch', 'text', 'seed', 100)
+        self.assertEqual([doc.business_id for doc in docs], [self.biz.id])
+
+
+class LookupCacheTests(TestCase):
+    """Tests for the process-wide lookup table cache and its form fields."""
+
+    def setUp(self):
+        """Create tiers and features, then warm the cache."""
+        cache.clear()
+        self.free = MembershipTier.objects.create(tier='free', description=[])
+        MembershipTier.objects.create(tier='premium', description=[], is_active=False)
+        self.feature = AccessibilityFeature.objects.create(code='ramp', name='Ramp')
+        for name in lookups.LOOKUP_TABLES:
+            lookups.rows(name)
+
+    def test_reads_cost_no_queries(self):
+        """Within a request, warm tables, filters and form choices should be served without queries."""
+        # the version stamp (in the shared cache) is compared on the first read of a request
+        lookups.start_request()
+        self.addCleanup(lookups.finish_request)
+        lookups.rows('membership_tiers')
+        with self.assertNumQueries(0):
+            self.assertEqual(lookups.find('membership_tiers', tier='FREE'), self.free)
+            self.assertEqual(lookups.get('accessibility_features', str(self.feature.pk)), self.feature)
+            params = QueryDict(mutable=True)
+            params.setlist('accessibility', ['Ramp'])
+            filter_businesses(params)
+            form = BusinessRegistrationForm()
+            html = str(form['membership_tier']) + str(form['accessibility_features'])
+        self.assertIn('Ramp', html)
+        self.assertNotIn('premium', html.lower())
+        self.assertEqual(form.initial['membership_tier'], self.free.pk)
+
+    def test_changes_invalidate(self):
+        """Saving or deleting a row should be visible on the next read."""
+        toilet = AccessibilityFeature.objects.create(code='toilet', name='Accessible toilet')
+        self.assertIn(toilet, lookups.rows('accessibility_features'))
+        toilet.delete()
+        self.assertEqual(list(lookups.rows(AccessibilityFeature)), [self.feature])
+
+    def test_tables_expire(self):
+        """A table older than LOOKUP_TABLE_TTL should be reloaded even without a new stamp."""
+        AccessibilityFeature.objects.filter(pk=self.feature.pk).update(name='Ramped entrance')
+        self.assertEqual(lookups.get('accessibility_features', self.feature.pk).name, 'Ramp')
+        with mock.patch.object(lookups, 'LOOKUP_TABLE_TTL', -1):
+            self.assertEqual(lookups.get('accessibility_features', self.feature.pk).name, 'Ramped entrance')
+
+    def test_form_validates_against_cache(self):
+        """Submitted ids should be resolved from the cache; unknown ids rejected."""
+        form = BusinessRegistrationForm(data={'accessibility_features': [self.feature.pk, 999999]})
+        form.is_valid()
+        self.assertIn('accessibility_features', form.errors)
+        form = BusinessRegistrationForm(data={'accessibility_features': [self.feature.pk]})
+        form.is_valid()
+        self.assertEqual(form.cleaned_data['accessibility_features'], [self.feature])
+
+
+class SearchPaginationTests(TestCase):
+    """Tests for SQL ordering and cursor pagination of the search endpoint."""
+
+    def setUp(self):
+        """Create businesses across tiers and log in a searching user."""
+        free = MembershipTier.objects.create(tier='free', description=[])
+        standard = MembershipTier.objects.create(tier='standard', description=[])
+        premium = MembershipTier.objects.create(tier='premium', description=[])
+        tiers = [free, standard, premium, None]
+        for i in range(9):
+            create_business(f"Shop {i}", membership_tier=tiers[i % 4])
+        User.objects.create_user(username='pager', email='pager@example.com', password='testpass123')
+        self.client.login(username='pager', password='testpass123')
+        self.url = reverse('ajax_search_businesses')
+
+    def fetch_all(self, **params):
+        """Follow next_cursor until exhausted and return all result rows."""
+        rows = []
+        cursor = None
+        while True:
+            query = dict(params, page_size=2)
+            if cursor:
+                query['cursor'] = cursor
+            data = self.client.get(self.url, query).json()
+            self.assertLessEqual(len(data['businesses']), 2)
+            rows.extend(data['businesses'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return rows
+
+    def test_pages_cover_all_results_once_in_tier_order(self):
+        """Paging should return every business exactly once, premium first and free last."""
+        rows = self.fetch_all()
+        ids = [row['id'] for row in rows]
+        self.assertEqual(len(ids), 9)
+        self.assertEqual(len(set(ids)), 9)
+        tier_by_id = {
+            b.id: (b.membership_tier.tier if b.membership_tier else 'free')
+            for b in Business.objects.select_related('membership_tier')
+        }
+        order = {'premium': 1, 'standard': 2, 'free': 3}
+        ranks = [order[tier_by_id[i]] for i in ids]
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_order_is_stable_within_session(self):
+        """Repeating the same search in one session should return the same order."""
+        self.assertEqual(self.fetch_all(), self.fetch_all())
+
+    def test_invalid_cursor_rejected(self):
+        """A malformed cursor should return 400."""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_results_revalidate(self):
+        """A repeated search should 304 on its ETag until a matched business changes."""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        biz = Business.objects.first()
+        biz.business_name = 'Changed'
+        biz.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_large_response_gzipped(self):
+        """Large result pages should be gzip compressed when the client accepts it."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(response.json()['businesses']), 9)
+
+    def test_streamed_results(self):
+        """Streaming modes should return every result, in the same order, without paging."""
+        paged = [row['id'] for row in self.fetch_all()]
+        response = self.client.get(self.url, {'stream': 'ndjson'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], paged)
+        response = self.client.get(self.url, {'stream': 'json'})
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in data['businesses']], paged)
+        self.assertIsNone(data['suggestion'])
+        self.assertEqual(self.client.get(self.url, {'stream': 'xml'}).status_code, 400)
+
+    def test_cursor_round_trip(self):
+        """Cursors should decode to the mode and values they were built from."""
+        cursor = encode_cursor('text', [1, 523, 'abc', 7])
+        self.assertEqual(decode_cursor(cursor), ('text', [1, 523, 'abc', 7]))
+
+
+class OpeningHoursFilterTests(TestCase):
+    """Tests for the OpeningPeriod rows and the open_now / open_at filter."""
+
+    def setUp(self):
+        """Create a daytime shop, a late bar running past midnight and a business without hours."""
+        self.shop = create_business("Day Shop", opening_hours=json.dumps({
+            'Monday': [{'start': '09:00', 'end': '12:00'}, {'start': '13:00', 'end': '17:30'}],
+            'Tuesday': [],
+        }))
+        self.bar = create_business("Late Bar", opening_hours=json.dumps({'Friday': [{'open': '20:00', 'close': '02:00'}]}))
+        create_business("No Hours")
+        User.objects.create_user(username='owl', email='owl@example.com', password='testpass123')
+        self.client.login(username='owl', password='testpass123')
+        self.url = reverse('ajax_search_businesses')
+
+    def open_at(self, when):
+        """Names of businesses the search endpoint returns as open at `when`."""
+        data = self.client.get(self.url, {'open_at': when}).json()
+        return sorted(row['business_name'] for row in data['businesses'])
+
+    def test_periods_split_at_midnight(self):
+        """Overnight periods should be stored as two rows meeting at midnight."""
+        self.assertEqual(
+            list(self.bar.opening_periods.values_list('weekday', 'start_minute', 'end_minute')),
+            [(4, 1200, 1440), (5, 0, 120)],
+        )
+        self.assertEqual(opening_periods('not json'), [])
+
+    def test_equal_start_and_end_is_closed(self):
+        """A period ending at its start should be closed; 00:00 - 24:00 is the whole day."""
+        self.assertEqual(opening_periods(json.dumps({
+            'Monday': [{'start': '00:00', 'end': '00:00'}],
+            'Tuesday': [{'start': '09:00', 'end': '09:00'}],
+            'Wednesday': [{'start': '00:00', 'end': '24:00'}],
+        })), [(2, 0, 1440)])
+
+    def test_open_at_filter(self):
+        """Only businesses with a period covering the time should be returned (2026-10-19 is a Monday)."""
+        self.assertEqual(self.open_at('2026-10-19T10:15'), ['Day Shop'])
+        self.assertEqual(self.open_at('2026-10-19T12:30'), [])
+        self.assertEqual(self.open_at('2026-10-24T01:00'), ['Late Bar'])
+        self.assertEqual(self.client.get(self.url, {'open_at': 'soon'}).status_code, 400)
+
+    def test_periods_follow_saved_hours(self):
+        """Saving new opening hours should rewrite the business's periods."""
+        self.shop.opening_hours = json.dumps({'Sunday': [{'start': '10:00', 'end': '16:00'}]})
+        self.shop.save()
+        self.assertEqual(list(self.shop.opening_periods.values_list('weekday', 'start_minute', 'end_minute')), [(6, 600, 960)])
+        self.assertEqual(self.open_at('2026-10-19T10:15'), [])
+
+
+class CompiledOpeningHoursTests(SimpleTestCase):
+    """Tests for the memoised opening hours compiler."""
+
+    hours = json.dumps({
+        'Monday': [{'start': '09:00', 'end': '17:30'}],
+        'Tuesday': [{'open': '00:00', 'close': '12:00'}, {'start': '', 'end': '13:00'}],
+        'Sunday': [],
+    })
+
+    def test_compiled_with_display_strings(self):
+        """Days keep their order and periods carry pre-rendered 12-hour strings."""
+        compiled = compile_opening_hours(self.hours)
+        self.assertEqual([day for day, _ in compiled.days], ['Monday', 'Tuesday', 'Sunday'])
+        self.assertEqual(compiled.days[0][1][0].display, '9:00 am - 5:30 pm')
+        self.assertEqual([p.display for p in compiled.days[1][1]], ['12:00 am - 12:00 pm'])
+        self.assertEqual(compiled.days[2][1], ())
+        self.assertIsNone(compile_opening_hours('{"Monday": 5}'))
+        self.assertIsNone(compile_opening_hours(''))
+
+    def test_memoised_by_content(self):
+        """Equal texts should share one compiled object, within the LRU bound."""
+        self.assertIs(compile_opening_hours(self.hours), compile_opening_hours(json.dumps(json.loads(self.hours))))
+        for i in range(COMPILED_CACHE_SIZE + 1):
+            compile_opening_hours(json.dumps({f'Day {i}': []}))
+        self.assertLessEqual(len(opening_hours._compiled), COMPILED_CACHE_SIZE)
+
+    def test_format_time(self):
+        """The template filter should convert valid times and pass anything else through."""
+        self.assertEqual(format_time('15:05'), '3:05 pm')
+        self.assertEqual(format_time('00:30'), '12:30 am')
+        self.assertEqual(format_time('later'), 'later')
+        self.assertEqual(format_time(None), '')
+
+
+class NearestSearchTests(TestCase):
+    """Tests for searches around a point: nearest first, radius and distance sorting."""
+
+    def setUp(self):
+        """Create businesses at increasing distances east of a point and log in."""
+        self.step_free = AccessibilityFeature.objects.create(code='step_free', name='Step-free access')
+        self.businesses = []
+        for i in range(5):
+            biz = create_business(f"Cafe {i}", lng=-0.1278 + (4 - i) * 0.01, lat=51.5074)
+            if i != 2:
+                biz.accessibility_features.add(self.step_free)
+            self.businesses.append(biz)
+        User.objects.create_user(username='walker', email='walker@example.com', password='testpass123')
+        self.client.login(username='walker', password='testpass123')
+        self.url = reverse('ajax_search_businesses')
+        self.near = {'sort': 'nearest', 'lat': 51.5074, 'lng': -0.1278}
+
+    def test_nearest_first_with_distance(self):
+        """Results should be ordered by distance and carry it in metres."""
+        data = self.client.get(self.url, dict(self.near, page_size=3)).json()
+        names = [row['business_name'] for row in data['businesses']]
+        self.assertEqual(names, ['Cafe 4', 'Cafe 3', 'Cafe 2'])
+        distances = [row['distance_m'] for row in data['businesses']]
+        self.assertAlmostEqual(distances[0], 0, delta=1)
+        # 0.01 degrees of longitude at this latitude is roughly 690m
+        self.assertAlmostEqual(distances[1], 694, delta=10)
+        rest = self.client.get(self.url, dict(self.near, page_size=3, cursor=data['next_cursor'])).json()
+        self.assertEqual([row['business_name'] for row in rest['businesses']], ['Cafe 1', 'Cafe 0'])
+
+    def test_nearest_combines_with_filters(self):
+        """Accessibility filters should still apply to nearest-first searches."""
+        data = self.client.get(self.url, dict(self.near, accessibility='Step-free access', page_size=3)).json()
+        self.assertEqual([row['business_name'] for row in data['businesses']], ['Cafe 4', 'Cafe 3', 'Cafe 1'])
+
+    def test_radius_filter(self):
+        """radius_m should keep only businesses within that many metres, with their distances."""
+        data = self.client.get(self.url, {'lat': 51.5074, 'lng': -0.1278, 'radius_m': 1500}).json()
+        self.assertCountEqual([row['business_name'] for row in data['businesses']], ['Cafe 4', 'Cafe 3', 'Cafe 2'])
+        self.assertTrue(all(row['distance_m'] <= 1500 for row in data['businesses']))
+
+    def test_distance_sort_keeps_tier_grouping(self):
+        """sort=distance should order by distance within each membership tier."""
+        premium = MembershipTier.objects.create(tier='premium', description=[])
+        far = self.businesses[0]
+        far.membership_tier = premium
+        far.save()
+        data = self.client.get(self.url, {'sort': 'distance', 'lat': 51.5074, 'lng': -0.1278, 'page_size': 2}).json()
+        rows = data['businesses']
+        rest = self.client.get(self.url, {
+            'sort': 'distance', 'lat': 51.5074, 'lng': -0.1278, 'page_size': 5, 'cursor': data['next_cursor'],
+        }).json()
+        rows += rest['businesses']
+        self.assertEqual([row['business_name'] for row in rows], ['Cafe 0', 'Cafe 4', 'Cafe 3', 'Cafe 2', 'Cafe 1'])
+
+    def test_radius_requires_point(self):
+        """radius_m without a point, or out of range, should return 400."""
+        self.assertEqual(self.client.get(self.url, {'radius_m': 500}).status_code, 400)
+        response = self.client.get(self.url, {'lat': 51.5, 'lng': -0.1, 'radius_m': -5})
+        self.assertEqual(response.status_code, 400)
+
+    def test_nearest_requires_point(self):
+        """sort=nearest without lat/lng, or with half a point, should return 400."""
+        self.assertEqual(self.client.get(self.url, {'sort': 'nearest'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'sort': 'nearest', 'lat': 51.5}).status_code, 400)
+
+
+class GazetteerTests(TestCase):
+    """Tests for recognising postcodes and towns and searching around them."""
+
+    def setUp(self):
+        """Create places in Leeds and London, businesses near each, and log in."""
+        for name, kind, lng, lat in [
+            ('LS1 4AP', 'postcode', -1.5491, 53.7965),
+            ('LS1', 'outcode', -1.5478, 53.7974),
+            ('Leeds', 'town', -1.5491, 53.8008),
+            ('Newcastle-under-Lyme', 'town', -2.2270, 53.0109),
+        ]:
+            Place.objects.create(
+                name=name, kind=kind, normalised=normalise_place(name, kind), location=Point(lng, lat)
+            )
+        create_business("Leeds Cafe", lng=-1.5491, lat=53.7970)
+        create_business("Leeds Bookshop", lng=-1.5400, lat=53.7990)
+        create_business("London Cafe")
+        User.objects.create_user(username='walker', email='walker@example.com', password='testpass123')
+        self.client.login(username='walker', password='testpass123')
+        self.url = reverse('ajax_search_businesses')
+
+    def test_find_place(self):
+        """Postcodes, districts, sectors and towns should be recognised however they are typed."""
+        self.assertEqual(find_place('ls14ap').kind, 'postcode')
+        self.assertEqual(find_place(' LS1  4AP ').name, 'LS1 4AP')
+        # an unknown postcode falls back to its district
+        self.assertEqual(find_place('LS1 9ZZ').kind, 'outcode')
+        self.assertEqual(find_place('ls1').kind, 'outcode')
+        self.assertEqual(find_place('LS1 4').name, 'LS1 4AP')
+        self.assertEqual(find_place('LEEDS').name, 'Leeds')
+        self.assertIsNone(find_place('Leeds', towns=False))
+        self.assertEqual(find_place('newcastle under lyme'), None)
+        self.assertEqual(find_place('Newcastle-under-Lyme').kind, 'town')
+        self.assertIsNone(find_place('cafe'))
+
+    def test_split_location(self):
+        """"[<term>] in/near <place>" and bare postcodes should split off the place, but not bare towns."""
+        text, place = split_location('cafe in Leeds')
+        self.assertEqual((text, place.name), ('cafe', 'Leeds'))
+        text, place = split_location('step free cafe near LS1 4AP')
+        self.assertEqual((text, place.kind), ('step free cafe', 'postcode'))
+        text, place = split_location('near Leeds')
+        self.assertEqual((text, place.name), ('', 'Leeds'))
+        text, place = split_location('LS1')
+        self.assertEqual((text, place.kind), ('', 'outcode'))
+        self.assertEqual(split_location('Leeds'), ('Leeds', None))
+        self.assertEqual(split_location('bed in breakfast'), ('bed in breakfast', None))
+
+    def test_search_around_place(self):
+        """A term naming a place should search nearest first around it, ignoring the viewport."""
+        data = self.client.get(self.url, {
+            'q': 'cafe in Leeds', 'min_lat': 51.4, 'min_lng': -0.2, 'max_lat': 51.6, 'max_lng': 0.0,
+        }).json()
+        self.assertEqual(data['place']['name'], 'Leeds')
+        self.assertEqual([row['business_name'] for row in data['businesses']], ['Leeds Cafe'])
+        self.assertIn('distance_m', data['businesses'][0])
+
+    def test_postcode_only_search(self):
+        """A bare postcode should list every business within its radius, nearest first."""
+        data = self.client.get(self.url, {'q': 'LS1 4AP'}).json()
+        self.assertEqual(data['place']['kind'], 'postcode')
+        self.assertEqual([row['business_name'] for row in data['businesses']], ['Leeds Cafe', 'Leeds Bookshop'])
+
+    def test_other_terms_unchanged(self):
+        """Terms that name no place, or searches with their own point, should not be rewritten."""
+        data = self.client.get(self.url, {'q': 'cafe'}).json()
+        self.assertIsNone(data['place'])
+        self.assertEqual(len(data['businesses']), 2)
+        data = self.client.get(self.url, {'q': 'in Leeds', 'lat': 51.5074, 'lng': -0.1278}).json()
+        self.assertIsNone(data['place'])
+
+    def test_bare_town_is_text(self):
+        """A bare town name should stay a text search, as towns are also words."""
+        data = self.client.get(self.url, {'q': 'Leeds'}).json()
+        self.assertIsNone(data['place'])
+        self.assertEqual(
+            sorted(row['business_name'] for row in data['businesses']), ['Leeds Bookshop', 'Leeds Cafe']
+        )
+
+    def test_in_view_keeps_viewport(self):
+        """With in_view, the place should be dropped from the term and the viewport searched instead."""
+        data = self.client.get(self.url, {
+            'q': 'cafe in Leeds', 'in_view': '1', 'min_lat': 51.4, 'min_lng': -0.2, 'max_lat': 51.6, 'max_lng': 0.0,
+        }).json()
+        self.assertIsNone(data['place'])
+        self.assertEqual([row['business_name'] for row in data['businesses']], ['London Cafe'])
+
+
+class RequestTimingTests(TestCase):
+    """Tests for the Server-Timing instrumentation on the search endpoint."""
+
+    def setUp(self):
+        """Create a business and a staff and a regular user."""
+        create_business("Timed Shop")
+        User.objects.create_user(username='timer', email='timer@example.com', password='testpass123', is_staff=True)
+        User.objects.create_user(username='visitor', email='visitor@example.com', password='testpass123')
+
+    def test_server_timing_header_and_log_line(self):
+        """Staff responses should carry db/tpl/total timings and log a matching JSON line."""
+        self.client.login(username='timer', password='testpass123')
+        with self.assertLogs('core.request_timing', 'INFO') as logs:
+            response = self.client.get(reverse('ajax_search_businesses'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['path'], record['status']), (reverse('ajax_search_businesses'), 200))
+        self.assertGreater(record['queries'], 0)
+
+    def test_header_hidden_from_other_users(self):
+        """Non-staff users should not get the header unless it is enabled for everyone."""
+        self.client.login(username='visitor', password='testpass123')
+        self.assertNotIn('Server-Timing', self.client.get(reverse('ajax_search_businesses')))
+        with self.settings(REQUEST_TIMING_HEADER_FOR_ALL=True):
+            self.assertIn('Server-Timing', self.client.get(reverse('ajax_search_businesses')))
+
+    def test_streamed_queries_are_logged(self):
+        """Queries run while a streaming body is sent should be counted once the stream ends."""
+        self.client.login(username='visitor', password='testpass123')
+        with self.assertLogs('core.request_timing', 'INFO') as logs:
+            response = self.client.get(reverse('ajax_search_businesses'), {'stream': 'ndjson'})
+            self.assertEqual(logs.records, [])
+            b''.join(response.streaming_content)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(record['streamed'])
+        self.assertGreater(record['queries'], 0)
+
+
+class ResultCacheTests(TestCase):
+    """Tests for the viewport search result cache."""
+
+    def setUp(self):
+        """Create businesses in central London and log in."""
+        cache.clear()
+        reset_cache_stats()
+        premium = MembershipTier.objects.create(tier='premium', description=[])
+        self.businesses = [
+            create_business(f"Shop {i}", lng=-0.1278 + i * 0.001, lat=51.5074, membership_tier=premium if i % 2 else None)
+            for i in range(6)
+        ]
+        User.objects.create_user(username='cacher', email='cacher@example.com', password='testpass123')
+        self.client.login(username='cacher', password='testpass123')
+        self.url = reverse('ajax_search_businesses')
+        self.bounds = {'min_lat': 51.50, 'min_lng': -0.13, 'max_lat': 51.51, 'max_lng': -0.12}
+
+    def search(self, **params):
+        """Run a viewport search and return the decoded response."""
+        return self.client.get(self.url, dict(self.bounds, **params)).json()
+
+    def test_repeat_search_is_a_hit(self):
+        """A second identical viewport search should be served from the cache with the same rows."""
+        first = self.search()
+        second = self.search()
+        self.assertEqual(first, second)
+        self.assertEqual(len(first['businesses']), 6)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_cached_pages_match_uncached_order(self):
+        """Paging through cached rows should give the same order as the SQL search."""
+        rows = []
+        data = self.search(page_size=4)
+        rows.extend(data['businesses'])
+        data = self.search(page_size=4, cursor=data['next_cursor'])
+        rows.extend(data['businesses'])
+        self.assertIsNone(data['next_cursor'])
+        params = QueryDict(mutable=True)
+        params.update(self.bounds)
+        docs, _ = search_page(filter_businesses(params), '', 'all', self.client.session['search_seed'], 100)
+        self.assertEqual([r['id'] for r in rows], [doc.business_id for doc in docs])
+
+    def test_exact_bounds_applied_to_cached_rows(self):
+        """A smaller viewport in the same tile block should only return its own businesses."""
+        self.search()
+        data = self.client.get(self.url, dict(self.bounds, max_lng=-0.1265)).json()
+        self.assertEqual(len(data['businesses']), 2)
+
+    def test_business_change_invalidates_area(self):
+        """Saving a business should invalidate cached results around it."""
+        self.search()
+        biz = self.businesses[0]
+        biz.business_name = 'Renamed shop'
+        # stamps are replaced when the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            biz.save()
+        names = [row['business_name'] for row in self.search()['businesses']]
+        self.assertIn('Renamed shop', names)
+        self.assertEqual(cache_stats()['misses'], 2)
+
+    def test_lost_generation_never_revives_old_entries(self):
+        """A new generation, including one replacing a lost stamp, should never reuse an old one."""
+        first = current_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_all_results()
+        second = current_generation()
+        caches['stamps'].delete(GENERATION_KEY)
+        self.assertEqual(len({first, second, current_generation()}), 3)
+
+    def test_invalidated_on_commit_only(self):
+        """A change should leave cached results alone until its transaction commits."""
+        self.search()
+        self.businesses[0].business_name = 'Renamed shop'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.businesses[0].save()
+            self.assertNotIn('Renamed shop', [row['business_name'] for row in self.search()['businesses']])
+        for callback in callbacks:
+            callback()
+        self.assertIn('Renamed shop', [row['business_name'] for row in self.search()['businesses']])
+
+    def test_cache_area(self):
+        """Viewports snap to a small tile block; antimeridian viewports are not cached."""
+        zoom, x0, y0, x1, y1 = cache_area((-0.13, 51.50, -0.12, 51.51))
+        self.assertLessEqual((x1 - x0 + 1) * (y1 - y0 + 1), 16)
+        self.assertIsNone(cache_area((170.0, -10.0, -170.0, 10.0)))
+        self.assertIsNone(cache_area(None))
+
+    def test_stats_staff_only(self):
+        """The hit/miss counters should only be visible to staff."""
+        response = self.client.get(reverse('ajax_search_cache_stats'))
+        self.assertEqual(response.status_code, 302)
+
+
+class ClusterEndpointTests(TestCase):
+    """Tests for the zoom-aware clustering endpoint."""
+
+    def setUp(self):
+        """Create a tight group of businesses in London and one in Leeds."""
+        premium = MembershipTier.objects.create(tier='premium', description=[])
+        for i in range(3):
+            create_business(f"London {i}", lng=-0.1278 + i * 0.0001, lat=51.5074, membership_tier=premium)
+        create_business("Leeds", lng=-1.5491, lat=53.8008, verified_by_wheelers=True)
+        User.objects.create_user(username='mapper', email='mapper@example.com', password='testpass123')
+        self.client.login(username='mapper', password='testpass123')
+        self.url = reverse('ajax_cluster_businesses')
+
+    def test_low_zoom_returns_clusters(self):
+        """At country zoom the endpoint should return one cluster per city with breakdowns."""
+        data = self.client.get(self.url, {'zoom': 6}).json()
+        clusters = sorted(data['clusters'], key=lambda c: c['count'])
+        self.assertEqual([c['count'] for c in clusters], [1, 3])
+        self.assertEqual(clusters[0]['verified'], 1)
+        self.assertEqual(clusters[0]['tiers']['free'], 1)
+        self.assertEqual(clusters[1]['tiers']['premium'], 3)
+
+    def test_high_zoom_returns_businesses(self):
+        """Past the threshold zoom the endpoint should return individual businesses."""
+        data = self.client.get(self.url, {
+            'zoom': 16, 'min_lat': 51.5, 'min_lng': -0.2, 'max_lat': 51.6, 'max_lng': 0,
+        }).json()
+        self.assertNotIn('clusters', data)
+        self.assertEqual(len(data['businesses']), 3)
+
+    def test_missing_zoom_rejected(self):
+        """A missing zoom should return 400."""
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class ParseBoundsTests(SimpleTestCase):
+    """Tests for viewport bounds parsing and envelope construction."""
+
+    def test_no_bounds(self):
+        """Missing bounds should mean no viewport filter."""
+        self.assertIsNone(parse_bounds(QueryDict('')))
+
+    def test_partial_or_invalid_bounds_rejected(self):
+        """Partial, non-numeric or inverted bounds should raise ValueError."""
+        for query in (
+            'min_lat=50&min_lng=-1',
+            'min_lat=a&min_lng=-1&max_lat=51&max_lng=0',
+            'min_lat=52&min_lng=-1&max_lat=51&max_lng=0',
+            'min_lat=-91&min_lng=-1&max_lat=51&max_lng=0',
+            'min_lat=nan&min_lng=-1&max_lat=51&max_lng=0',
+        ):
+            with self.assertRaises(ValueError, msg=query):
+                parse_bounds(QueryDict(query))
+
+    def test_antimeridian_split(self):
+        """A viewport crossing the antimeridian should become two envelopes."""
+        bounds = parse_bounds(QueryDict('min_lat=-10&min_lng=170&max_lat=10&max_lng=190'))
+        self.assertEqual(bounds, (170.0, -10.0, -170.0, 10.0))
+        self.assertEqual(bounds_envelope(bounds).geom_type, 'MultiPolygon')
+
+    def test_whole_world(self):
+        """A viewport wider than the world should span all longitudes."""
+        bounds = parse_bounds(QueryDict('min_lat=-80&min_lng=-400&max_lat=80&max_lng=400'))
+        self.assertEqual(bounds, (-180.0, -80.0, 180.0, 80.0))
+
+
+class BusinessTileTests(TestCase):
+    """Tests for the vector tile endpoint."""
+
+    def setUp(self):
+        """Create a business in London and log in."""
+        create_business("Tile Cafe")
+        User.objects.create_user(username='tiler', email='tiler@example.com', password='testpass123')
+        self.client.login(username='tiler', password='testpass123')
+
+    def test_tile_served_and_revalidated(self):
+        """A tile containing a business should be served, then revalidate with a 304."""
+        url = reverse('business_tile', args=[10, 511, 340])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertTrue(response.content)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_feature_ids_in_tile(self):
+        """Points should list their feature ids as a delimited string, dropped when a feature is deleted."""
+        ramp = AccessibilityFeature.objects.create(code='ramp', name='Ramp')
+        url = reverse('business_tile', args=[10, 511, 340])
+        self.client.get(url)
+        # cached tiles are dropped when the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            Business.objects.get(business_name="Tile Cafe").accessibility_features.add(ramp)
+        self.assertIn(f',{ramp.pk},'.encode(), self.client.get(url).content)
+        with self.captureOnCommitCallbacks(execute=True):
+            ramp.delete()
+        self.assertNotIn(f',{ramp.pk},'.encode(), self.client.get(url).content)
+
+    def test_out_of_range_tile(self):
+        """Tile coordinates outside the zoom level's grid should 404."""
+        response = self.client.get(reverse('business_tile', args=[2, 4, 0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class TileHelperTests(SimpleTestCase):
+    """Tests for vector tile addressing helpers."""
+
+    def test_tiles_for_point(self):
+        """A London point should fall in the expected tile at zoom 10, once per zoom level."""
+        tiles = list(tiles_for_point(-0.1278, 51.5074))
+        self.assertIn((10, 511, 340), tiles)
+        self.assertEqual({z for z, _, _ in tiles}, set(range(21)))
+
+    def test_feature_bit(self):
+        """Feature ids map to single bits, and ids beyond the mask have none."""
+        self.assertEqual(feature_bit(1), 1)
+        self.assertEqual(feature_bit(4), 8)
+        self.assertEqual(feature_bit(64), 0)
+
+
+class PrefixIndexTests(SimpleTestCase):
+    """Tests for the in-memory typeahead index."""
+
+    def setUp(self):
+        """Index a category with tags and two businesses."""
+        self.index = PrefixIndex()
+        self.index.replace(('category', 1), [('Café', 'category'), ('coffee', 'tag'), ('Cake shop', 'tag')])
+        self.index.replace(('business', 1), [('Cafe Nero', 'business')])
+        self.index.replace(('business', 2), [('The Coffee House', 'business')])
+
+    def test_prefix_completion_order(self):
+        """Completions should match word prefixes, categories and tags before businesses."""
+        self.assertEqual(
+            self.index.complete('ca'),
+            [{'text': 'Café', 'type': 'category'}, {'text': 'Cake shop', 'type': 'tag'},
+             {'text': 'Cafe Nero', 'type': 'business'}],
+        )
+        self.assertEqual(
+            [s['text'] for s in self.index.complete('COFF')], ['coffee', 'The Coffee House']
+        )
+        self.assertEqual(self.index.complete('ca', limit=1), [{'text': 'Café', 'type': 'category'}])
+        self.assertEqual(self.index.complete(' '), [])
+
+    def test_replace_and_remove(self):
+        """Replacing or removing a source should update its completions only."""
+        self.index.replace(('business', 1), [('Bean Counter', 'business')])
+        self.assertNotIn('Cafe Nero', [s['text'] for s in self.index.complete('ca')])
+        self.assertEqual(self.index.complete('bean'), [{'text': 'Bean Counter', 'type': 'business'}])
+        self.index.remove(('category', 1))
+        self.assertEqual(self.index.complete('ca'), [])
+        self.assertEqual(len(self.index), 5)
+
+    def test_bulk_build_matches_incremental(self):
+        """An index built in one sort should hold the same entries as one built incrementally."""
+        bulk = PrefixIndex.from_sources([
+            (('business', 2), [('The Coffee House', 'business')]),
+            (('category', 1), [('Café', 'category'), ('coffee', 'tag'), ('Cake shop', 'tag')]),
+            (('business', 1), [('Cafe Nero', 'business')]),
+        ])
+        self.assertEqual(bulk._entries, self.index._entries)
+        self.assertEqual(bulk.complete('coff'), self.index.complete('coff'))
+
+
+class SuggestEndpointTests(TestCase):
+    """Tests for the typeahead endpoint."""
+
+    def setUp(self):
+        """Create a category and business, reset the worker index and log in."""
+        reset_index()
+        Category.objects.create(code='cafe', name='Café', tags=['coffee'])
+        self.biz = create_business("Cafe Nero")
+        User.objects.create_user(username='typist', email='typist@example.com', password='testpass123')
+        self.client.login(username='typist', password='testpass123')
+        self.url = reverse('ajax_suggest')
+
+    def tearDown(self):
+        """Drop the index built from this test's (rolled back) data."""
+        reset_index()
+
+    def test_suggestions_without_queries_once_built(self):
+        """After the first build, completions should not query the database beyond the session."""
+        self.client.get(self.url, {'q': 'ca'})
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(self.url, {'q': 'ca'}).json()
+        self.assertEqual([s['text'] for s in data['suggestions']], ['Café', 'Cafe Nero'])
+        self.assertFalse(any('businesses_' in q['sql'] for q in queries.captured_queries))
+
+    def test_index_updated_incrementally(self):
+        """Renaming a business should update the built index."""
+        self.client.get(self.url, {'q': 'ca'})
+        self.biz.business_name = 'Bean Counter'
+        self.biz.save()
+        data = self.client.get(self.url, {'q': 'bean'}).json()
+        self.assertEqual(data['suggestions'], [{'text': 'Bean Counter', 'type': 'business'}])
+
+    def test_stale_index_served_while_rebuilding(self):
+        """An old index should be returned at once while one background build replaces it."""
+        index = typeahead.get_index()
+        started = []
+        with mock.patch.object(typeahead, '_built_at', -typeahead.TYPEAHEAD_MAX_AGE), \
+                mock.patch.object(typeahead.threading, 'Thread') as thread:
+            thread.return_value.start.side_effect = lambda: started.append(True)
+            self.assertIs(typeahead.get_index(), index)
+            self.assertIs(typeahead.get_index(), index)
+            self.assertEqual(started, [True])
+            # the thread's work, run here; its connections are left open for the test transaction
+            create_business("Bean Counter")
+            with mock.patch.object(typeahead, 'connections'):
+                typeahead.rebuild_index()
+        rebuilt = typeahead.get_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.complete('bean'), [{'text': 'Bean Counter', 'type': 'business'}])
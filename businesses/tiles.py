@@ -0,0 +1,168 @@
+"""
+Mapbox Vector Tiles of business locations.
+
+- render_tile: builds a tile with ST_AsMVT from the business search documents; each point
+  carries its id, name, membership tier, verified flag and accessibility feature ids, as
+  a comma-delimited string (",3,7,") that style expressions can test without bitwise ops.
+- cached_tile: serves tiles from Django's cache.
+- invalidate_location / invalidate_all_tiles: drop cached tiles when businesses change,
+  once the change's transaction commits, so a tile rendered before the commit is not
+  kept. The tiles of a transaction are dropped together.
+"""
+
+import math
+import secrets
+import threading
+
+from django.core.cache import cache, caches
+from django.db import connection, transaction
+
+from .models import BusinessSearchDocument
+
+# Tiles are generated (and invalidated) for zoom levels 0 to MAX_TILE_ZOOM
+MAX_TILE_ZOOM = 20
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_CACHE_TIMEOUT = 60 * 60 * 24
+TILE_LAYER = 'businesses'
+TILE_VERSION_KEY = 'business_mvt_version'
+
+# Per thread: (lng, lat) positions whose tiles are dropped when the current transaction commits
+_pending = threading.local()
+
+TILE_SQL = """
+WITH bounds AS (
+    SELECT ST_TileEnvelope(%(z)s::int, %(x)s::int, %(y)s::int) AS geom
+), buffered AS (
+    -- points in the buffer are drawn too, so symbols are not cut at tile edges
+    SELECT ST_Transform(
+        ST_Expand(geom, (ST_XMax(geom) - ST_XMin(geom)) * %(buffer)s::int / %(extent)s::int),
+        4326
+    ) AS geom
+    FROM bounds
+)
+SELECT ST_AsMVT(tile, %(layer)s::text, %(extent)s::int, 'geom', 'id')
+FROM (
+    SELECT
+        d.business_id AS id,
+        d.business_name AS name,
+        d.tier,
+        d.verified_by_wheelers AS verified,
+        -- ",3,7,": MapLibre can test a feature with ["in", ",3,", ["get", "features"]]
+        CASE WHEN cardinality(d.feature_ids) > 0
+            THEN ',' || array_to_string(d.feature_ids, ',') || ',' ELSE '' END AS features,
+        ST_AsMVTGeom(
+            ST_Transform(d.location::geometry(Point, 4326), 3857),
+            bounds.geom, %(extent)s::int, %(buffer)s::int, true
+        ) AS geom
+    FROM {document_table} d
+    CROSS JOIN bounds
+    CROSS JOIN buffered
+    WHERE d.is_approved AND d.location::geometry(Point, 4326) && buffered.geom
+) AS tile
+WHERE tile.geom IS NOT NULL
+"""
+
+
+def is_valid_tile(z, x, y):
+    """Return True if z/x/y address an existing tile at a supported zoom."""
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def render_tile(z, x, y):
+    """Build the vector tile for z/x/y and return its bytes (empty when no businesses fall in it)."""
+    sql = TILE_SQL.format(
+        document_table=connection.ops.quote_name(BusinessSearchDocument._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'z': z, 'x': x, 'y': y,
+            'layer': TILE_LAYER,
+            'extent': TILE_EXTENT,
+            'buffer': TILE_BUFFER,
+        })
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] else b''
+
+
+def tile_version():
+    """
+    Stamp of the current tile cache generation; replacing it invalidates every cached tile.
+
+    Kept in the 'stamps' cache, and a random token, so a lost stamp can never bring back
+    the tiles of an older generation.
+    """
+    stamps = caches['stamps']
+    version = stamps.get(TILE_VERSION_KEY)
+    if version is None:
+        stamps.add(TILE_VERSION_KEY, secrets.token_hex(4), None)
+        version = stamps.get(TILE_VERSION_KEY)
+    return version
+
+
+def tile_cache_key(z, x, y, version=None):
+    """Cache key for a tile in the current (or given) cache generation."""
+    return f"business_mvt:{version or tile_version()}:{z}:{x}:{y}"
+
+
+def cached_tile(z, x, y):
+    """Return the tile bytes for z/x/y, rendering and caching them on a miss."""
+    key = tile_cache_key(z, x, y)
+    tile = cache.get(key)
+    if tile is None:
+        tile = render_tile(z, x, y)
+        cache.set(key, tile, TILE_CACHE_TIMEOUT)
+    return tile
+
+
+def tiles_for_point(lng, lat):
+    """
+    Yield (z, x, y) for every tile, at every cached zoom level, that draws a WGS84 point:
+    the tile containing it plus any neighbour whose buffer reaches it.
+    """
+    # clamp to the Web Mercator latitude limit
+    lat = max(min(lat, 85.0511), -85.0511)
+    lat_rad = math.radians(lat)
+    margin = TILE_BUFFER / TILE_EXTENT
+    for z in range(MAX_TILE_ZOOM + 1):
+        n = 2 ** z
+        # position in tile units
+        fx = (lng + 180.0) / 360.0 * n
+        fy = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+        xs = {int(v) for v in (fx - margin, fx, fx + margin) if 0 <= v < n}
+        ys = {int(v) for v in (fy - margin, fy, fy + margin) if 0 <= v < n}
+        for x in xs:
+            for y in ys:
+                yield z, x, y
+
+
+def invalidate_location(location):
+    """
+    Drop every cached tile (at any zoom) containing `location`, a GEOS point or None,
+    once the current transaction commits (at once outside a transaction).
+    """
+    if location is None:
+        return
+    if not hasattr(_pending, 'positions'):
+        _pending.positions = set()
+    _pending.positions.add((location.x, location.y))
+    transaction.on_commit(drop_pending_tiles)
+
+
+def drop_pending_tiles():
+    """Drop the tiles of every position collected by invalidate_location, in one call."""
+    positions = getattr(_pending, 'positions', None)
+    if not positions:
+        return
+    _pending.positions = set()
+    version = tile_version()
+    cache.delete_many([
+        tile_cache_key(z, x, y, version)
+        for lng, lat in positions
+        for z, x, y in tiles_for_point(lng, lat)
+    ])
+
+
+def invalidate_all_tiles():
+    """Invalidate every cached tile by starting a new cache generation, on commit."""
+    transaction.on_commit(lambda: caches['stamps'].set(TILE_VERSION_KEY, secrets.token_hex(4), None))
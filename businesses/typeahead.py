@@ -0,0 +1,241 @@
+"""
+In-process typeahead index over business names, category names and category tags.
+
+- PrefixIndex: a sorted array of normalised keys searched with bisect, so a
+  completion is a binary search plus a short scan and never touches the database.
+- get_index: builds the index lazily, once per worker, and rebuilds it after
+  TYPEAHEAD_MAX_AGE so workers that did not see a change still converge. Rebuilds run
+  in one background thread while requests keep using the current index; only the
+  first build makes a request wait.
+- update_business / remove_business / update_category / remove_category: keep this
+  worker's index in step incrementally (called by businesses.signals).
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.db import connections
+
+from .models import Business, Category
+
+logger = logging.getLogger(__name__)
+
+# Completions returned when the caller does not ask for a number, and the most it may ask for
+DEFAULT_COMPLETIONS = 8
+MAX_COMPLETIONS = 20
+# Matching keys examined per completion: bounds the work for very short prefixes
+SCAN_LIMIT = 200
+# Seconds before a worker rebuilds its index from the database
+TYPEAHEAD_MAX_AGE = 60 * 5
+
+# Rank of each kind of completion: categories first, then tags, then businesses
+KIND_WEIGHTS = {'category': 3, 'tag': 2, 'business': 1}
+
+
+def normalise(text):
+    """Case- and whitespace-insensitive form of a text, used for keys and prefixes."""
+    return ' '.join(str(text).lower().split())
+
+
+def word_keys(text):
+    """Keys for a text: the whole text and every suffix starting at a later word."""
+    words = normalise(text).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+def index_entries(texts):
+    """The (key, -weight, text, kind) entries for a list of (text, kind) pairs."""
+    return [
+        (key, -KIND_WEIGHTS[kind], text, kind)
+        for text, kind in texts if text
+        for key in word_keys(text)
+    ]
+
+
+class PrefixIndex:
+    """
+    Sorted array of (key, -weight, text, kind) entries with bisect prefix lookup.
+
+    Entries are registered under a source such as ('business', 7), so everything a
+    business or category contributed can be replaced or removed in one call.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._by_source = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def from_sources(cls, sources):
+        """Build an index from (source, texts) pairs, sorting all the entries once."""
+        index = cls()
+        for source, texts in sources:
+            entries = index_entries(texts)
+            if entries:
+                index._by_source[source] = entries
+                index._entries.extend(entries)
+        index._entries.sort()
+        return index
+
+    def replace(self, source, texts):
+        """Replace the entries for `source` with `texts`, a list of (text, kind) pairs."""
+        with self._lock:
+            self._remove(source)
+            entries = index_entries(texts)
+            for entry in entries:
+                insort(self._entries, entry)
+            if entries:
+                self._by_source[source] = entries
+
+    def remove(self, source):
+        """Drop every entry registered for `source`."""
+        with self._lock:
+            self._remove(source)
+
+    def _remove(self, source):
+        for entry in self._by_source.pop(source, []):
+            index = bisect_left(self._entries, entry)
+            if index < len(self._entries) and self._entries[index] == entry:
+                del self._entries[index]
+
+    def complete(self, prefix, limit=DEFAULT_COMPLETIONS):
+        """
+        Return up to `limit` completions of `prefix` as {'text', 'type'} dicts,
+        categories before tags before business names, each group alphabetical.
+        """
+        prefix = normalise(prefix)
+        if not prefix:
+            return []
+        best = {}
+        with self._lock:
+            index = bisect_left(self._entries, (prefix,))
+            end = min(index + SCAN_LIMIT, len(self._entries))
+            for key, weight, text, kind in self._entries[index:end]:
+                if not key.startswith(prefix):
+                    break
+                folded = text.lower()
+                if folded not in best or (weight, text) < best[folded][:2]:
+                    best[folded] = (weight, text, kind)
+        ranked = sorted(best.values(), key=lambda item: (item[0], item[1].lower()))
+        return [{'text': text, 'type': kind} for _, text, kind in ranked[:limit]]
+
+
+_index = None
+_built_at = 0.0
+# Held by whoever is building the index, so there is at most one build per worker
+_build_lock = threading.Lock()
+# Serialises changes to the index with the swap to a rebuilt one
+_changes_lock = threading.Lock()
+# Changes made while a background rebuild runs, replayed onto the new index
+_pending = None
+
+
+def business_texts(name):
+    """Index entries contributed by a business."""
+    return [(name, 'business')]
+
+
+def category_texts(name, tags):
+    """Index entries contributed by a category: its name and each tag."""
+    return [(name, 'category')] + [(str(tag), 'tag') for tag in tags or []]
+
+
+def build_index():
+    """Build a PrefixIndex from the database: two queries, names and tags only, one sort."""
+    # only approved businesses are searchable, so only they are completed
+    sources = [
+        (('business', pk), business_texts(name))
+        for pk, name in Business.objects.filter(is_approved=True).values_list('pk', 'business_name')
+    ]
+    sources += [
+        (('category', pk), category_texts(name, tags))
+        for pk, name, tags in Category.objects.values_list('pk', 'name', 'tags')
+    ]
+    return PrefixIndex.from_sources(sources)
+
+
+def rebuild_index():
+    """
+    Build a new index and swap it in, replaying the changes made meanwhile.
+
+    Runs in the background thread started by get_index, which holds _build_lock.
+    """
+    global _index, _built_at, _pending
+    try:
+        index = build_index()
+        with _changes_lock:
+            for source, texts in _pending:
+                index.replace(source, texts)
+            _index = index
+            _built_at = time.monotonic()
+    except Exception:
+        # keep serving the old index; the next request past TYPEAHEAD_MAX_AGE retries
+        logger.exception("Typeahead index rebuild failed")
+    finally:
+        with _changes_lock:
+            _pending = None
+        connections.close_all()
+        _build_lock.release()
+
+
+def get_index():
+    """
+    Return this worker's index, building it on first use.
+
+    Once it is TYPEAHEAD_MAX_AGE old the current index is still returned, and a
+    single background thread builds its replacement.
+    """
+    global _index, _built_at, _pending
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _index = build_index()
+                _built_at = time.monotonic()
+    elif time.monotonic() - _built_at > TYPEAHEAD_MAX_AGE and _build_lock.acquire(blocking=False):
+        with _changes_lock:
+            _pending = []
+        threading.Thread(target=rebuild_index, name='typeahead-rebuild', daemon=True).start()
+    return _index
+
+
+def reset_index():
+    """Forget this worker's index; the next get_index call rebuilds it."""
+    global _index
+    with _changes_lock:
+        _index = None
+
+
+def apply_change(source, texts):
+    """Replace `source`'s entries in this worker's index, if built, and in one being rebuilt."""
+    with _changes_lock:
+        if _index is None:
+            return
+        _index.replace(source, texts)
+        if _pending is not None:
+            _pending.append((source, texts))
+
+
+def update_business(business):
+    """Re-index a saved business (dropping it unless approved), if this worker has built its index."""
+    texts = business_texts(business.business_name) if business.is_approved else []
+    apply_change(('business', business.pk), texts)
+
+
+def remove_business(business_id):
+    """Drop a deleted business from this worker's index."""
+    apply_change(('business', business_id), [])
+
+
+def update_category(category):
+    """Re-index a saved category's name and tags, if this worker has built its index."""
+    apply_change(('category', category.pk), category_texts(category.name, category.tags))
+
+
+def remove_category(category_id):
+    """Drop a deleted category from this worker's index."""
+    apply_change(('category', category_id), [])
@@ -9,6 +9,12 @@ urlpatterns = [
     path('cancel-membership/', views.cancel_membership, name='cancel_membership'),
     path('accessible-business-search/', views.accessible_business_search, name='accessible_business_search'),
     path('ajax/search-businesses/', views.ajax_search_businesses, name='ajax_search_businesses'),
+    path('ajax/cluster-businesses/', views.ajax_cluster_businesses, name='ajax_cluster_businesses'),
+    path('ajax/<int:business_id>/', views.ajax_business_detail, name='ajax_business_detail'),
+    path('ajax/suggest/', views.ajax_suggest, name='ajax_suggest'),
+    path('ajax/search-cache-stats/', views.ajax_search_cache_stats, name='ajax_search_cache_stats'),
+    path('snapshot/businesses.<str:fmt>', views.business_snapshot, name='business_snapshot'),
+    path('tiles/<int:z>/<int:x>/<int:y>.mvt', views.business_tile, name='business_tile'),
     path('upgrade-membership/', views.upgrade_membership, name='upgrade_membership'),
     path('current-membership/', views.view_existing_membership, name='view_existing_membership'),
 ]
@@ -6,26 +6,39 @@ Views for the businesses app.
 - Integrates with user profiles, membership tiers, accessibility features, and verification.
 """
 
+import hashlib
 import json
-import random
 from datetime import timedelta
 from urllib.parse import urlencode
 
 from django import template
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template.defaultfilters import slugify
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
 from django.views.decorators.http import require_GET
 
 from .forms import BusinessRegistrationForm, BusinessUpdateForm
-from .models import Category
-from .models import Business, MembershipTier
+from .gazetteer import location_params, place_payload
+from .http import accepted_encodings, compress_response, json_stream, ndjson_stream
+from .models import Business, Category
+from .opening_hours import compile_opening_hours
+from .result_cache import cache_stats, cached_search_page
+from .search import (
+    CLUSTER_MAX_ZOOM, apply_search, cluster_businesses, decode_cursor, filter_businesses,
+    parse_page_size, parse_point, parse_sort, parse_zoom, search_mode, searchable_documents, session_seed,
+    stream_results, suggest_term,
+)
+from .snapshot import manifest, snapshot_path
+from .tiles import cached_tile, is_valid_tile
+from .typeahead import DEFAULT_COMPLETIONS, MAX_COMPLETIONS, get_index
 from accounts.models import UserProfile
-from businesses.models import Business, AccessibilityFeature
+from core import lookups
 from checkout.models import Purchase
 from verification.models import WheelerVerification
 
@@ -58,8 +71,8 @@ def register_business(request):
     if Business.objects.filter(business_owner=user_profile).exists():
         return redirect('business_dashboard')
 
-    # get active membership tiers
-    membership_tiers = MembershipTier.objects.filter(is_active=True)
+    # get active membership tiers (cached, no query)
+    membership_tiers = [tier for tier in lookups.rows('membership_tiers') if tier.is_active]
     days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
     if request.method == 'POST':
@@ -82,12 +95,7 @@ def register_business(request):
             intended_tier = form.cleaned_data.get('membership_tier')
             # Set new businesses tier to Free until payment completes. If no Free tier row exists
             # fall back to the canonical Free tier with PK=1 (project convention).
-            free_tier = MembershipTier.objects.filter(tier__iexact='free', is_active=True).first()
-            if not free_tier:
-                try:
-                    free_tier = MembershipTier.objects.get(pk=1)
-                except MembershipTier.DoesNotExist:
-                    free_tier = None
+            free_tier = lookups.find('membership_tiers', tier='free', is_active=True) or lookups.get('membership_tiers', 1)
             business.membership_tier = free_tier
             business.save()
             # Persist categories and accessibility features
@@ -155,7 +163,7 @@ def business_dashboard(request):
 
     # Prepare a JSON-serializable dict for the map JS if business exists
     business_json = None
-    opening_hours_dict = None
+    opening_hours_table = None
     if business:
         business_json = {
             "business_name": business.business_name,
@@ -164,24 +172,8 @@ def business_dashboard(request):
                 "y": business.location.y,
             },
         }
-        # Parse and normalise opening_hours JSON for server-side table rendering
-        if business.opening_hours:
-            try:
-                raw = json.loads(business.opening_hours)
-                normalized = {}
-                for day, info in raw.items():
-                    periods = []
-                    for p in info:
-                        start = p.get('start') or p.get('open')
-                        end = p.get('end') or p.get('close')
-                        if start and end:
-                            periods.append({'start': start, 'end': end})
-                    normalized[day] = periods
-                opening_hours_dict = normalized
-            except Exception:
-                opening_hours_dict = None
-        else:
-            opening_hours_dict = None
+        # Compiled (and memoised) opening hours for server-side table rendering
+        opening_hours_table = compile_opening_hours(business.opening_hours)
 
     if business and business.logo:
         logo_url = business.logo.url
@@ -196,7 +188,7 @@ def business_dashboard(request):
         'user_verifications': user_verifications,
         'verification_status': verification_status,
         'verification_approved': verification_approved,
-        'opening_hours_dict': opening_hours_dict,
+        'opening_hours_table': opening_hours_table,
         'page_title': 'Business Dashboard',
     })
 
@@ -210,7 +202,7 @@ def edit_business(request):
     - Supports updating opening hours and adding custom categories.
     """
     business = get_object_or_404(Business, business_owner=getattr(request.user, 'profile', None))
-    membership_tiers = MembershipTier.objects.filter(is_active=True)
+    membership_tiers = [tier for tier in lookups.rows('membership_tiers') if tier.is_active]
 
     if request.method == 'POST':
         post_data = request.POST.copy()
@@ -280,7 +272,10 @@ def upgrade_membership(request):
     business = get_object_or_404(Business, business_owner=getattr(request.user, 'profile', None))
     current_tier = business.membership_tier
     # get all membership tiers (ordered by the membership price field)
-    all_membership_tiers = MembershipTier.objects.filter(is_active=True).order_by('membership_price')
+    all_membership_tiers = sorted(
+        (tier for tier in lookups.rows('membership_tiers') if tier.is_active),
+        key=lambda tier: (tier.membership_price is None, tier.membership_price or 0),
+    )
     # Determine higher-tier upgrade options using membership_price if available
     upgrade_tiers = [tier for tier in all_membership_tiers if not current_tier or (getattr(tier, 'membership_price', getattr(tier, 'membership_price', 0)) > getattr(current_tier, 'membership_price', getattr(current_tier, 'membership_price', 0)))]
     upgrade_count = len(upgrade_tiers)
@@ -324,89 +319,239 @@ def ajax_search_businesses(request):
     """
     AJAX endpoint to search businesses based on filters.
 
-    - Supports search by name, description, category, accessibility features, and map bounds.
-    - Returns a JSON response with matching businesses, sorted by membership tier.
+    - Supports full-text search over name, categories/tags, description and services,
+      plus category, accessibility feature and map bounds filters.
+    - Falls back to trigram fuzzy matching when the exact search finds nothing, and
+      includes a "did you mean" suggestion for the misspelt term.
+    - Orders results in SQL: by membership tier, then relevance when a search term is
+      given, then a per-session pseudo-random order that rotates placements fairly.
+    - Returns one page of results as JSON with an opaque `next_cursor` for the next page
+      (`page_size` defaults to 100, capped at 500). Results are slim rows (see
+      businesses.serializers.serialize_business); ajax_business_detail has the rest.
+    - Viewport searches are served from a result cache shared by everyone viewing the
+      same area with the same filters (see businesses.result_cache).
+    - Responses carry an ETag built from the page's ids and their newest update, so an
+      unchanged page revalidates with a 304; large bodies are Brotli or gzip compressed.
+    - With `stream=json` or `stream=ndjson`, every result is streamed unpaged instead
+      (see stream_search_response).
+    - Given a `lat`/`lng`, results carry `distance_m` and can be limited to `radius_m`
+      metres. `sort=distance` orders by distance within each tier; `sort=nearest` orders
+      nearest first by a k-nearest-neighbour index scan. The other filters still apply.
+    - `open_now=1`, or `open_at` with an ISO date and time, keeps only businesses open
+      at that moment (see businesses.opening_hours).
+    - A term naming a postcode, postcode district or town ("LS1 4AP", "cafe in Leeds")
+      becomes a nearest-first radius search around the place, ignoring the map bounds;
+      the place is returned as `place` so the map can move to it (see businesses.gazetteer).
+      With `in_view=1` (the map was moved since) the bounds are searched instead.
     """
     term = request.GET.get('q', '').strip()
-    cat_id = request.GET.get('category')
-    # allow multiple accessibility filters
-    access = request.GET.getlist('accessibility')
-    qs = Business.objects.all()
-    if term:
-        qs = qs.filter(
-            Q(business_name__icontains=term) |
-            Q(description__icontains=term) |
-            Q(categories__name__icontains=term) |
-            Q(categories__tags__contains=[term])
-        )
-    if cat_id:
-        qs = qs.filter(categories__id=cat_id)
-    if access:
-        # filter businesses matching all of the selected features
-        for feature in access:
-            qs = qs.filter(accessibility_features__name=feature)
-        qs = qs.distinct()
-    # Filter by map viewport bounds, suppress any errors
+    params, term, place = location_params(request.GET, term)
+    try:
+        qs = filter_businesses(params)
+        point = parse_point(params)
+        sort = parse_sort(params, point)
+        stream = params.get('stream')
+        if stream:
+            return stream_search_response(request, qs, term, stream, point, sort)
+        page_size = parse_page_size(params.get('page_size'))
+        cursor = params.get('cursor')
+        cursor_mode, cursor_values = decode_cursor(cursor) if cursor else (None, None)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    # text searches start exact and may fall back to fuzzy; a cursor pins the mode of its first page
+    modes = ('text', 'fuzzy') if term else ('all',)
+    mode = cursor_mode or modes[0]
+    if mode not in modes:
+        return JsonResponse({'error': 'Cursor does not match this search.'}, status=400)
+    # per-session seed: a stable order while paging, rotated between sessions
+    seed = session_seed(request.session)
     try:
-        min_lat = request.GET.get('min_lat')
-        min_lng = request.GET.get('min_lng')
-        max_lat = request.GET.get('max_lat')
-        max_lng = request.GET.get('max_lng')
-        if min_lat and min_lng and max_lat and max_lng:
-            min_lat_f, max_lat_f = float(min_lat), float(max_lat)
-            min_lng_f, max_lng_f = float(min_lng), float(max_lng)
-            qs = qs.filter(
-                location__y__gte=min_lat_f,
-                location__y__lte=max_lat_f,
-                location__x__gte=min_lng_f,
-                location__x__lte=max_lng_f
-            )
-    except Exception:
-        # If spatial lookup fails (e.g., unsupported backend), ignore bounds filter
-        pass
-    # make a distinct list, shuffle to randomise order within tiers, then stable-sort by tier
-    qs = list(qs.distinct())
-    random.shuffle(qs)
-    membership_order = {'premium': 1, 'standard': 2, 'free': 3}
-    # sort is stable so the random order within each tier is preserved
-    qs.sort(key=lambda b: membership_order.get(
-        (b.membership_tier.tier if getattr(b, 'membership_tier', None) and getattr(b.membership_tier, 'tier', None) else 'free').lower(),
-        4
-    ))
-    results = []
-    for biz in qs:
-        # Determine membership tier (default to 'free' if not set)
-        membership_tier = biz.membership_tier.tier
-        # Determine logo URL (empty string if no logo)
-        # only show logo if not on free tier
-        logo_url = biz.logo.url if getattr(biz, 'logo', None) and (membership_tier != 'free') else ''
-        results.append({
-            'id': biz.id,
-            'business_name': biz.business_name,
-            'categories': list(biz.categories.values_list('name', flat=True)),
-            'street_address1': biz.street_address1,
-            'street_address2': biz.street_address2,
-            'town_or_city': biz.town_or_city,
-            'county': biz.county,
-            'postcode': biz.postcode,
-            'location': {'lat': biz.location.y, 'lng': biz.location.x} if biz.location else None,
-            'is_wheeler_verified': getattr(biz, 'verified_by_wheelers', False),
-            'accessibility_features': list(biz.accessibility_features.values_list('name', flat=True)),
-            'public_phone': biz.public_phone,
-            'website': biz.website,
-            'opening_hours': biz.opening_hours,
-            # only if not on free tier
-            'public_email': biz.public_email if membership_tier != 'free' else '',
-            'facebook': biz.facebook_url if membership_tier != 'free' else '',
-            'twitter': biz.x_twitter_url if membership_tier != 'free' else '',
-            'instagram': biz.instagram_url if membership_tier != 'free' else '',
-            'description': biz.description if membership_tier != 'free' else '',
-            'special_offers': biz.special_offers if membership_tier != 'free' else '',
-            'services_offered': biz.services_offered if membership_tier != 'free' else '',
-            'logo': logo_url,
-            'wheeler_verification_requested': biz.wheeler_verification_requested,
+        results, next_cursor, validator = cached_search_page(
+            params, qs, term, mode, seed, page_size, cursor_values, point, sort
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    suggestion = None
+    if term and not results and cursor is None:
+        # nothing matched exactly: retry with trigram similarity and suggest a spelling
+        results, next_cursor, validator = cached_search_page(
+            params, qs, term, 'fuzzy', seed, page_size, point=point, sort=sort
+        )
+        suggestion = suggest_term(term)
+    place = place_payload(place) if place else None
+    # weak: the compressed and uncompressed bodies differ byte-for-byte
+    etag = 'W/' + quote_etag(hashlib.md5(f"{validator}|{next_cursor}|{suggestion}|{place}".encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({
+            'businesses': results, 'next_cursor': next_cursor, 'suggestion': suggestion, 'place': place,
         })
-    return JsonResponse({'businesses': results})
+    response['ETag'] = etag
+    # the order is per session: only the user's own browser may reuse it, after revalidating
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return compress_response(request, response)
+
+
+def stream_search_response(request, qs, term, stream, point=None, sort='relevance'):
+    """
+    Stream every search result, in display order, as it is read from the database.
+
+    - `stream=json` sends {"suggestion": ..., "businesses": [...]}; `stream=ndjson` sends
+      one business per line, so clients can render markers before the last row arrives.
+    - Rows are fetched in chunks through a server-side cursor, keeping memory flat.
+    - Raises ValueError for an unknown stream format.
+    """
+    if stream not in ('json', 'ndjson'):
+        raise ValueError("stream must be 'json' or 'ndjson'.")
+    mode = search_mode(qs, term)
+    results = stream_results(qs, term, mode, session_seed(request.session), point, sort)
+    if stream == 'ndjson':
+        response = StreamingHttpResponse(ndjson_stream(results), content_type='application/x-ndjson')
+    else:
+        suggestion = suggest_term(term) if mode == 'fuzzy' else None
+        response = StreamingHttpResponse(
+            json_stream('businesses', results, {'suggestion': suggestion}), content_type='application/json'
+        )
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@login_required
+@require_GET
+def ajax_cluster_businesses(request):
+    """
+    AJAX endpoint returning map markers for the current viewport and zoom.
+
+    - Accepts the same search, category, accessibility and bounds parameters as
+      ajax_search_businesses, plus the map `zoom`.
+    - Below CLUSTER_MAX_ZOOM, groups businesses into zoom-sized grid cells and returns
+      each cell's centroid, count, tier breakdown and verified count.
+    - From CLUSTER_MAX_ZOOM upwards, returns the first page of individual businesses.
+    - A term naming a place is searched around it, as in ajax_search_businesses.
+    """
+    term = request.GET.get('q', '').strip()
+    params, term, _ = location_params(request.GET, term)
+    try:
+        zoom = parse_zoom(request.GET.get('zoom'))
+        page_size = parse_page_size(request.GET.get('page_size'))
+        qs = filter_businesses(params)
+        mode = search_mode(qs, term)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if zoom < CLUSTER_MAX_ZOOM:
+        return JsonResponse({'clusters': cluster_businesses(apply_search(qs, term, mode), zoom)})
+    results, next_cursor, _ = cached_search_page(params, qs, term, mode, session_seed(request.session), page_size)
+    return JsonResponse({
+        'businesses': results,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+@require_GET
+def ajax_business_detail(request, business_id):
+    """
+    AJAX endpoint returning the details of one search result, fetched when it is expanded.
+
+    - Only approved businesses have details; others return 404.
+    - Returns the public, tier-gated address, contact, social, descriptive and opening
+      hours fields (see businesses.serializers.serialize_business_detail), read from
+      the business's search document with a single primary key lookup.
+    - Carries an ETag of the document's last update, so browsers reuse their copy for a
+      minute and then revalidate with a 304 until the business changes.
+    """
+    document = searchable_documents().filter(pk=business_id).only('detail', 'updated_at').first()
+    if document is None:
+        raise Http404("Business not found.")
+    etag = quote_etag(f"{business_id}-{document.updated_at.timestamp()}")
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(document.detail)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=60)
+    return compress_response(request, response)
+
+
+@login_required
+@require_GET
+def ajax_suggest(request):
+    """
+    AJAX typeahead endpoint completing the search box from business names, categories and tags.
+
+    - Served from the worker's in-memory prefix index (see businesses.typeahead), so
+      completions do not query the database.
+    - `q` is the prefix; `limit` defaults to 8, capped at 20.
+    """
+    try:
+        limit = min(int(request.GET.get('limit') or DEFAULT_COMPLETIONS), MAX_COMPLETIONS)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer.'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be positive.'}, status=400)
+    return JsonResponse({'suggestions': get_index().complete(request.GET.get('q', ''), limit)})
+
+
+@staff_member_required
+@require_GET
+def ajax_search_cache_stats(request):
+    """AJAX endpoint reporting this worker's search result cache hit and miss counters (staff only)."""
+    return JsonResponse(cache_stats())
+
+
+@login_required
+@require_GET
+def business_tile(request, z, x, y):
+    """
+    Serve a Mapbox Vector Tile of businesses for z/x/y.
+
+    - Points carry id, name, tier, verified flag and accessibility feature ids (",3,7,")
+      so MapLibre can style and filter them client-side.
+    - Tiles are cached server-side until a business in them changes, and carry an ETag
+      of their content so unchanged tiles revalidate with a 304.
+    """
+    if not is_valid_tile(z, x, y):
+        raise Http404("Tile out of range.")
+    tile = cached_tile(z, x, y)
+    etag = quote_etag(hashlib.md5(tile).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(tile, content_type='application/vnd.mapbox-vector-tile')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=60)
+    return response
+
+
+@require_GET
+def business_snapshot(request, fmt):
+    """
+    Serve the public snapshot of every business as GeoJSON or FlatGeobuf.
+
+    - The files are written by the build_business_snapshot command (see
+      businesses.snapshot); this view only sends them, without touching the database.
+    - GeoJSON is sent gzipped to clients that accept gzip and from its uncompressed copy
+      otherwise. Each file carries its own ETag recorded when it was built, so unchanged
+      snapshots revalidate with a 304 and caches keep the encodings apart (with Vary).
+    - Returns 404 until the first snapshot has been built.
+    """
+    snapshot = manifest()
+    files = snapshot['files'].get(fmt) if snapshot else None
+    if not files or 'identity' not in files:
+        raise Http404("Snapshot not available.")
+    encoding = 'gzip' if 'gzip' in files and 'gzip' in accepted_encodings(request) else 'identity'
+    entry = files[encoding]
+    etag = quote_etag(entry['etag'])
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content_type = 'application/flatgeobuf' if fmt == 'fgb' else 'application/geo+json'
+        response = FileResponse(open(snapshot_path(entry['name']), 'rb'), content_type=content_type)
+        if encoding == 'gzip':
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = f'inline; filename="businesses.{fmt}"'
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=300)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
 
 
 @login_required
@@ -421,8 +566,8 @@ def accessible_business_search(request):
     if request.user.is_authenticated:
         user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
 
-    # Provide full list of accessibility features for the filter dropdown
-    accessibility_features = AccessibilityFeature.objects.all()
+    # Provide full list of accessibility features for the filter dropdown (cached, no query)
+    accessibility_features = lookups.rows('accessibility_features')
     return render(
         request,
         'businesses/accessible_business_search.html',
@@ -448,12 +593,7 @@ def cancel_membership(request):
         return redirect('business_dashboard')
     try:
         business = Business.objects.get(business_owner=profile)
-        free_tier = MembershipTier.objects.filter(tier='free', is_active=True).first()
-        if not free_tier:
-            try:
-                free_tier = MembershipTier.objects.get(pk=1)
-            except MembershipTier.DoesNotExist:
-                free_tier = None
+        free_tier = lookups.find('membership_tiers', tier='free', is_active=True) or lookups.get('membership_tiers', 1)
 
         if free_tier:
             business.membership_tier = free_tier
@@ -483,7 +623,7 @@ def view_existing_membership(request):
         business = Business.objects.get(business_owner=profile)
         current_tier = business.membership_tier
         # get membership tier object
-        membership_tier = MembershipTier.objects.get(pk=current_tier.id)
+        membership_tier = lookups.get('membership_tiers', current_tier.id)
         # get latest purchase with purchase_type='membership'
         membership_purchase = Purchase.objects.filter(business=business, purchase_type='membership').order_by('-created_at').first()
         start_date = membership_purchase.created_at if membership_purchase else None
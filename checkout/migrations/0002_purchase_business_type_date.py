@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='purchase',
+            name='business',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='businesses.business'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['business', 'purchase_type', '-created_at'], name='purchase_business_type_date'),
+        ),
+    ]
@@ -49,7 +49,8 @@ class Purchase(models.Model):
 
     # Foreign keys
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
-    business = models.ForeignKey(Business, on_delete=models.SET_NULL, null=True, blank=True)
+    # indexed by the (business, purchase_type, created_at) index below
+    business = models.ForeignKey(Business, on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
     membership_tier = models.ForeignKey(MembershipTier, on_delete=models.SET_NULL, null=True, blank=True)
 
     full_name = models.CharField(max_length=50, null=False, blank=False)
@@ -81,6 +82,12 @@ class Purchase(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # a business's latest purchase of a type (e.g. its current membership)
+            models.Index(fields=['business', 'purchase_type', '-created_at'], name='purchase_business_type_date'),
+        ]
+
     def save(self, *args, **kwargs):
         """Generate a unique purchase_number if not set and save the Purchase instance.
         Retries up to 3 times if a unique constraint is hit.
@@ -1,6 +1,8 @@
 # handles signals (webhooks) from Stripe when an event occurs
 # We specify URL the signals are sent to
 # The webhook handler determines what we want to given a particular event signal
+import logging
+
 import stripe
 
 from django.db import IntegrityError
@@ -12,6 +14,8 @@ from django.template.loader import render_to_string
 from .models import Purchase, CheckoutCache
 from businesses.models import Business, MembershipTier
 
+logger = logging.getLogger(__name__)
+
 
 class StripeWebHookHandler:
     """
@@ -26,16 +30,13 @@ class StripeWebHookHandler:
     def _send_confirmation_email(self, purchase):
         """Send the user a confirmation email"""
         cust_email = purchase.email
-        print(f'cust_email: {cust_email}')
         subject = render_to_string(
             'checkout/confirmation_emails/confirmation_email_subject.txt',
             {'purchase': purchase})
-        print(f'subject: {subject}')
         body = render_to_string(
             'checkout/confirmation_emails/confirmation_email_body.txt',
             {'purchase': purchase, 'contact_email': settings.DEFAULT_FROM_EMAIL})
-        print(f'body: {body}')
-        print(f'from_email: {settings.DEFAULT_FROM_EMAIL}')
+        logger.info('Sending confirmation email for purchase %s to %s', purchase.pk, cust_email)
 
         send_mail(
             subject,
@@ -31,6 +31,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # Postgres full-text search and index support
+    'django.contrib.postgres',
     'cloudinary_storage',
     'hijack.contrib.admin',  # Hijack admin integration
     'hijack',  # Hijack app for user session management
@@ -60,6 +62,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',  # should precede WhiteNoise
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.RequestTimingMiddleware',  # after WhiteNoise so static files are not timed
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -164,6 +167,39 @@ DATABASES = {
 # Override the engine to use GeoDjango's PostGIS backend
 DATABASES['default']['ENGINE'] = 'django.contrib.gis.db.backends.postgis'
 
+# Shared by every worker: the search result and tile caches live in 'default', and the
+# version stamps that invalidate them (and core.lookups' tables) in 'stamps', so a change
+# made by one worker is seen by all. Stamps are small and few, and kept apart so that
+# culling or evicting cached pages never drops one. Redis when REDIS_URL is set (needs the
+# redis package; stamps have no expiry, so a volatile-* maxmemory policy never evicts
+# them), otherwise database tables created by `python manage.py createcachetable`.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+        'stamps': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'stamps',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+        'stamps': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache_stamps',
+            # never reached in practice: stamps are not culled
+            'OPTIONS': {'MAX_ENTRIES': 10 ** 9},
+        },
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -184,6 +220,9 @@ LANGUAGE_CODE = 'en-gb'
 
 TIME_ZONE = 'UTC'
 
+# Time zone that business opening hours are entered in (used by the "open now" filter)
+OPENING_HOURS_TIME_ZONE = 'Europe/London'
+
 USE_I18N = True
 
 USE_TZ = True
@@ -209,6 +248,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 OS_MAPS_API_KEY = os.environ.get('OS_MAPS_API_KEY')
 
+# Where build_business_snapshot writes the public GeoJSON/FlatGeobuf snapshots
+BUSINESS_SNAPSHOT_DIR = os.environ.get('BUSINESS_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'snapshots'))
+
 # Redirect URL after ending impersonation via django-hijack
 HIJACK_EXIT_REDIRECT_URL = '/admin/auth/user/'
 # Restrict hijack permission to superusers only
@@ -235,9 +277,32 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': False,
         },
+        # One JSON line per request, plus sampled slow-request warnings (core.middleware)
+        'core.request_timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'checkout': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'verification': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
+# Request instrumentation (core.middleware.RequestTimingMiddleware): requests slower
+# than this many milliseconds are logged with their slowest queries, for a sample of them
+REQUEST_TIMING_SLOW_MS = 500
+REQUEST_TIMING_SLOW_SAMPLE_RATE = 0.1
+# The Server-Timing header is sent to staff users (and everyone when DEBUG is on) unless this is set
+REQUEST_TIMING_HEADER_FOR_ALL = os.environ.get('REQUEST_TIMING_HEADER_FOR_ALL', '') == '1'
+
 # Image validator defaults (used by core.validators.validate_image_file)
 IMAGE_MAX_FILE_SIZE = 5 * 1024 * 1024        # bytes (5 MB)
 IMAGE_MAX_DIMENSION = 3000                  # max width/height in pixels
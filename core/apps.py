@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # time template rendering for core.middleware.RequestTimingMiddleware
+        from .middleware import install_template_timing
+        install_template_timing()
+        # keep the lookup table cache in step with its tables
+        from .lookups import connect_signals
+        connect_signals()
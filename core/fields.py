@@ -0,0 +1,90 @@
+"""
+Form fields for the cached lookup tables (see core.lookups).
+
+LookupModelChoiceField and LookupModelMultipleChoiceField behave like Django's model
+choice fields, but render their choices from, and validate submitted values against,
+the process-wide lookup cache, so they cost no queries once it is warm. `select`, an
+optional callable taking and returning a list of rows, filters or reorders the choices.
+Multiple choice fields clean to a list of instances rather than a queryset.
+"""
+
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceField, ModelChoiceIterator, ModelMultipleChoiceField
+
+from . import lookups
+
+
+class LookupChoiceIterator(ModelChoiceIterator):
+    """Yields a lookup field's choices from the cache instead of its queryset."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for row in self.field.lookup_rows():
+            yield self.choice(row)
+
+    def __len__(self):
+        return len(self.field.lookup_rows()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.lookup_rows())
+
+
+class LookupChoiceMixin:
+    """Shared behaviour of the lookup choice fields."""
+
+    iterator = LookupChoiceIterator
+
+    def __init__(self, *args, select=None, **kwargs):
+        self.select = select
+        super().__init__(*args, **kwargs)
+
+    def lookup_rows(self):
+        """The field's choices: the cached rows of its queryset's model, after `select`."""
+        rows = list(lookups.rows(self.queryset.model))
+        return self.select(rows) if self.select else rows
+
+    def resolve(self, value):
+        """The choice whose key (to_field_name or pk) equals `value`, or None."""
+        key = self.to_field_name or 'pk'
+        if isinstance(value, self.queryset.model):
+            value = getattr(value, key)
+        value = str(value)
+        return next((row for row in self.lookup_rows() if str(getattr(row, key)) == value), None)
+
+
+class LookupModelChoiceField(LookupChoiceMixin, ModelChoiceField):
+    """ModelChoiceField served from the lookup cache."""
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        row = self.resolve(value)
+        if row is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return row
+
+
+class LookupModelMultipleChoiceField(LookupChoiceMixin, ModelMultipleChoiceField):
+    """ModelMultipleChoiceField served from the lookup cache; cleans to a list of rows."""
+
+    def _check_values(self, value):
+        try:
+            value = frozenset(value)
+        except TypeError:
+            raise ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        selected = []
+        for item in value:
+            row = self.resolve(item)
+            if row is None:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': item},
+                )
+            selected.append(row)
+        return selected
@@ -0,0 +1,143 @@
+"""
+Process-wide cache of the reference (lookup) tables.
+
+Accessibility features, categories, membership tiers, mobility devices, counties and
+age groups rarely change but are read on most pages. Each worker loads a table once
+(one query, in the model's default ordering) and then serves it from memory:
+
+- rows / get / find: read a table, one row by primary key, or the first row with
+  matching attributes. Cached instances are shared; treat them as read-only.
+- Saving or deleting a row clears this worker's copy at once and, on commit, replaces
+  a version stamp in Django's cache; other workers compare the stamp once per request
+  (or on every read outside a request) and reload when it has changed. This relies on
+  the shared cache backend in settings.CACHES (a per-process cache would keep the stamp
+  from other workers).
+- As a safety net (a lost stamp update, a change made outside the ORM), a table is
+  also reloaded once it is LOOKUP_TABLE_TTL seconds old.
+- core.fields has form fields that render and validate choices from this cache.
+"""
+
+import secrets
+import threading
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+# Cached tables: name -> model label
+LOOKUP_TABLES = {
+    'accessibility_features': 'businesses.AccessibilityFeature',
+    'categories': 'businesses.Category',
+    'membership_tiers': 'businesses.MembershipTier',
+    'mobility_devices': 'accounts.MobilityDevice',
+    'counties': 'accounts.County',
+    'age_groups': 'accounts.AgeGroup',
+}
+
+VERSION_KEY = 'lookups:version'
+# Seconds after which a worker reloads a table even without a new stamp
+LOOKUP_TABLE_TTL = 60 * 10
+
+# name -> (monotonic load time, rows)
+_tables = {}
+_version = None
+_lock = threading.Lock()
+# Per thread: whether the stamp has already been compared during the current request
+_request = threading.local()
+
+
+def table_name(model):
+    """The lookup table name for a model (or model label), or None if it is not cached."""
+    label = model if isinstance(model, str) else model._meta.label
+    for name, table_label in LOOKUP_TABLES.items():
+        if table_label == label:
+            return name
+    return None
+
+
+def check_version():
+    """Drop this worker's tables if another worker has changed one since they were loaded."""
+    global _version
+    if getattr(_request, 'checked', False):
+        return
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # first use, or the stamp was evicted: start a new one (and reload to be safe)
+        cache.add(VERSION_KEY, secrets.token_hex(8), None)
+        version = cache.get(VERSION_KEY)
+    with _lock:
+        if version != _version:
+            _tables.clear()
+            _version = version
+    if getattr(_request, 'active', False):
+        _request.checked = True
+
+
+def rows(name):
+    """All rows of a lookup table (by name or model) as a tuple of model instances."""
+    if name not in LOOKUP_TABLES:
+        name = table_name(name)
+    check_version()
+    loaded_at, table = _tables.get(name, (None, None))
+    if table is None or time.monotonic() - loaded_at > LOOKUP_TABLE_TTL:
+        model = apps.get_model(LOOKUP_TABLES[name])
+        table = tuple(model.objects.all())
+        with _lock:
+            _tables[name] = (time.monotonic(), table)
+    return table
+
+
+def get(name, pk):
+    """The row of a lookup table with primary key `pk` (int or str), or None."""
+    pk = str(pk)
+    for row in rows(name):
+        if str(row.pk) == pk:
+            return row
+    return None
+
+
+def find(name, **attrs):
+    """The first row of a lookup table whose attributes equal `attrs` (strings compared case-insensitively)."""
+    def matches(row):
+        for attr, value in attrs.items():
+            current = getattr(row, attr)
+            if isinstance(value, str) and isinstance(current, str):
+                if current.lower() != value.lower():
+                    return False
+            elif current != value:
+                return False
+        return True
+
+    return next((row for row in rows(name) if matches(row)), None)
+
+
+def invalidate(sender=None, **kwargs):
+    """Clear this worker's tables now and, once committed, tell the other workers."""
+    with _lock:
+        _tables.clear()
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, secrets.token_hex(8), None))
+
+
+def start_request(**kwargs):
+    """request_started receiver: compare the stamp again on the first read of this request."""
+    _request.active = True
+    _request.checked = False
+
+
+def finish_request(**kwargs):
+    """request_finished receiver: reads outside a request compare the stamp every time."""
+    _request.active = False
+    _request.checked = False
+
+
+def connect_signals():
+    """Invalidate on every change to a lookup table (called from CoreConfig.ready())."""
+    for label in LOOKUP_TABLES.values():
+        model = apps.get_model(label)
+        post_save.connect(invalidate, sender=model, dispatch_uid=f'lookups_save_{label}')
+        post_delete.connect(invalidate, sender=model, dispatch_uid=f'lookups_delete_{label}')
+    request_started.connect(start_request, dispatch_uid='lookups_request_started')
+    request_finished.connect(finish_request, dispatch_uid='lookups_request_finished')
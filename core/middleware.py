@@ -0,0 +1,187 @@
+"""
+Per-request instrumentation.
+
+RequestTimingMiddleware counts each request's SQL queries and measures the time spent
+in the database and in template rendering. It reports them:
+
+- in a `Server-Timing` header (shown in the browser's network panel), only for staff
+  users, when DEBUG is on, or for everyone with REQUEST_TIMING_HEADER_FOR_ALL, since
+  it reveals how the server spends its time;
+- as one structured (JSON) log line per request on the `core.request_timing` logger;
+- for a sample of requests slower than REQUEST_TIMING_SLOW_MS, as a warning listing the
+  slowest queries.
+
+Streaming responses (e.g. the NDJSON search results) run most of their queries while
+the body is sent, after the headers: their Server-Timing header only covers the view
+itself, while the log line is written once the stream ends, counts the queries run
+while streaming and is marked "streamed".
+
+The overhead is two clock reads per query and per top-level template render; query
+SQL is only kept for sampled requests.
+"""
+
+import contextvars
+import heapq
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse
+from django.template.base import Template
+
+logger = logging.getLogger('core.request_timing')
+
+# Defaults for the REQUEST_TIMING_* settings
+SLOW_REQUEST_MS = 500
+SLOW_SAMPLE_RATE = 0.1
+SLOW_TOP_QUERIES = 5
+# Longest SQL text logged per slow query
+MAX_LOGGED_SQL = 500
+
+_current = contextvars.ContextVar('request_timing', default=None)
+
+
+class RequestTimings:
+    """Query and template timings collected during one request."""
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper: time the query (and keep its SQL when sampled)."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_seconds += duration
+            if self.sampled:
+                self.statements.append((duration, sql))
+
+    def slowest(self, count):
+        """The `count` slowest sampled queries as (milliseconds, sql) pairs."""
+        return [
+            (round(duration * 1000, 1), sql[:MAX_LOGGED_SQL])
+            for duration, sql in heapq.nlargest(count, self.statements, key=lambda item: item[0])
+        ]
+
+
+def timed_render(render):
+    """Wrap Template.render to add top-level render time to the current request's timings."""
+
+    def wrapper(self, context):
+        timings = _current.get()
+        if timings is None:
+            return render(self, context)
+        # {% include %} renders nested templates: only time the outermost one
+        timings.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            timings.template_depth -= 1
+            if not timings.template_depth:
+                timings.template_seconds += time.perf_counter() - start
+
+    wrapper.timed = True
+    return wrapper
+
+
+def install_template_timing():
+    """Patch Template.render once so template rendering is timed (called from CoreConfig.ready())."""
+    if not getattr(Template.render, 'timed', False):
+        Template.render = timed_render(Template.render)
+
+
+def server_timing(timings, total_seconds):
+    """Format a Server-Timing header value."""
+    return (
+        f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.queries} queries", '
+        f'tpl;dur={timings.template_seconds * 1000:.1f}, '
+        f'total;dur={total_seconds * 1000:.1f}'
+    )
+
+
+class RequestTimingMiddleware:
+    """Instrument every request with query counts, DB time and template time."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', SLOW_REQUEST_MS)
+        self.sample_rate = getattr(settings, 'REQUEST_TIMING_SLOW_SAMPLE_RATE', SLOW_SAMPLE_RATE)
+        self.top_queries = getattr(settings, 'REQUEST_TIMING_TOP_QUERIES', SLOW_TOP_QUERIES)
+
+    def __call__(self, request):
+        timings = RequestTimings(sampled=random.random() < self.sample_rate)
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+                # inside the timed window, so a session or user lookup it needs is counted
+                show_header = self.show_header(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+        if show_header:
+            response['Server-Timing'] = server_timing(timings, total)
+        # files are sent without queries, and rewrapping them would lose wsgi.file_wrapper
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            response.streaming_content = self.timed_stream(request, response, response.streaming_content, timings, start)
+        else:
+            self.log(request, response, timings, total)
+        return response
+
+    def show_header(self, request):
+        """
+        Whether the response may carry the Server-Timing header.
+
+        Requests without a session cookie are anonymous, so they are refused without
+        loading the session or user (keeping query-free views query-free).
+        """
+        if settings.DEBUG or getattr(settings, 'REQUEST_TIMING_HEADER_FOR_ALL', False):
+            return True
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return False
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_staff)
+
+    def timed_stream(self, request, response, content, timings, start):
+        """Send the streaming body `content` with its queries timed, then log the whole request."""
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                yield from content
+        finally:
+            self.log(request, response, timings, time.perf_counter() - start, streamed=True)
+
+    def log(self, request, response, timings, total, streamed=False):
+        """Write the structured per-request line, and the slow-query warning when sampled."""
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(timings.db_seconds * 1000, 1),
+            'queries': timings.queries,
+            'template_ms': round(timings.template_seconds * 1000, 1),
+        }
+        if streamed:
+            record['streamed'] = True
+        logger.info(json.dumps(record))
+        if timings.sampled and record['total_ms'] >= self.slow_ms:
+            record['top_queries'] = timings.slowest(self.top_queries)
+            logger.warning(json.dumps(record))
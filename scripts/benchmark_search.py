@@ -0,0 +1,260 @@
+"""
+benchmark_search.py
+
+Repeatable benchmark of the business search endpoint (`ajax_search_businesses`) at
+synthetic scale, run against a local PostGIS database.
+
+**What it does:**
+- Seeds deterministic synthetic businesses (owners, categories, accessibility features,
+  opening hours and points inside the UK boundary, using the generators in `fake_data.py`)
+  up to each requested size, then builds their search documents.
+- Replays a fixed mix of query patterns through the full middleware stack: no term,
+  a text term, multi-feature filters and map viewports at several zoom levels.
+- Reports, per size and pattern: the cold (cache cleared) latency, p50/p95 latency of
+  the repeats, SQL queries per request and gzipped response size.
+
+**Usage:**
+- Load the lookup fixtures first (categories, accessibility features, membership tiers).
+- Example: `python scripts/benchmark_search.py --sizes 1000 10000 100000 1000000 --json bench.json`
+- Synthetic rows are owned by users named `bench_<n>` and are kept between runs, so a
+  larger size only seeds the difference. Remove them with `--clean`.
+- Use the same `--seed` across runs (and machines) so results are comparable.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import django
+
+# Ensure project root is on PYTHONPATH and Django is set up before importing models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.gis.geos import Point  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from faker import Faker  # noqa: E402
+
+from accounts.models import UserProfile  # noqa: E402
+from businesses.documents import refresh_search_documents  # noqa: E402
+from businesses.models import AccessibilityFeature, Business, Category, MembershipTier, OpeningPeriod  # noqa: E402
+from businesses.opening_hours import opening_periods  # noqa: E402
+from fake_data import load_uk_polygon, random_opening_hours, random_uk_point  # noqa: E402
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench_'
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+# Businesses generated per batch; each batch has its own seeded generators, so the
+# data for a given index is the same however the sizes are stepped through
+SEED_BATCH_SIZE = 1000
+# Viewport size in pixels used for the zoom patterns
+VIEWPORT_PIXELS = (1280, 800)
+VIEWPORT_CENTRES = {'london': (-0.1278, 51.5074), 'manchester': (-2.2426, 53.4808)}
+VIEWPORT_ZOOMS = (8, 11, 14)
+
+
+def viewport_bounds(lng, lat, zoom):
+    """Bounds of a VIEWPORT_PIXELS map view centred on (lng, lat) at a Web Mercator zoom."""
+    width, height = VIEWPORT_PIXELS
+    degrees_per_pixel = 360.0 / (256 * 2 ** zoom)
+    half_lng = width / 2 * degrees_per_pixel
+    half_lat = height / 2 * degrees_per_pixel * math.cos(math.radians(lat))
+    return {
+        'min_lng': lng - half_lng, 'max_lng': lng + half_lng,
+        'min_lat': lat - half_lat, 'max_lat': lat + half_lat,
+    }
+
+
+def query_patterns():
+    """The fixed mix of (name, params) replayed at every size."""
+    categories = list(Category.objects.order_by('pk').values_list('name', flat=True)[:2])
+    features = list(AccessibilityFeature.objects.order_by('pk').values_list('name', flat=True)[:3])
+    patterns = [('empty', {})]
+    for name in categories:
+        patterns.append((f'text:{name.lower()}', {'q': name.lower()}))
+    patterns.append(('text:partial', {'q': categories[0].lower()[:4]} if categories else {'q': 'shop'}))
+    patterns.append(('features:all(2)', {'accessibility': features[:2]}))
+    patterns.append(('features:all(3)', {'accessibility': features[:3]}))
+    patterns.append(('features:any(3)', {'accessibility': features[:3], 'accessibility_match': 'any'}))
+    for place, (lng, lat) in VIEWPORT_CENTRES.items():
+        for zoom in VIEWPORT_ZOOMS:
+            patterns.append((f'viewport:{place}:z{zoom}', viewport_bounds(lng, lat, zoom)))
+    patterns.append(('viewport:london:z11+text', dict(viewport_bounds(*VIEWPORT_CENTRES['london'], 11), q=categories[0].lower() if categories else 'shop')))
+    return patterns
+
+
+def bench_count():
+    """Number of synthetic businesses already seeded."""
+    return Business.objects.filter(business_owner__user__username__startswith=BENCH_PREFIX).count()
+
+
+def seed_batch(start, stop, seed, uk_polygon, lookups):
+    """Create the synthetic businesses with indexes start..stop-1 (one batch) and their documents."""
+    batch = start // SEED_BATCH_SIZE
+    rng = random.Random(f"{seed}:{batch}")
+    fake = Faker("en_GB")
+    fake.seed_instance(f"{seed}:{batch}")
+    category_ids, feature_ids, tier_ids = lookups
+
+    users = User.objects.bulk_create([
+        User(username=f"{BENCH_PREFIX}{i}", email=f"{BENCH_PREFIX}{i}@example.com", password='!')
+        for i in range(start, stop)
+    ])
+    profiles = UserProfile.objects.bulk_create([
+        UserProfile(user=user, has_business=True, has_registered_business=True) for user in users
+    ])
+    businesses = []
+    for profile in profiles:
+        lon, lat = random_uk_point(rng, uk_polygon)
+        businesses.append(Business(
+            business_owner=profile,
+            business_name=fake.company(),
+            description=fake.sentence(),
+            location=Point(lon, lat, srid=4326),
+            town_or_city=fake.city()[:40],
+            opening_hours=random_opening_hours(rng),
+            services_offered=fake.sentence(nb_words=6) if rng.random() < 0.5 else '',
+            membership_tier_id=rng.choice(tier_ids) if tier_ids else None,
+            verified_by_wheelers=rng.random() < 0.5,
+            is_approved=True,
+        ))
+    businesses = Business.objects.bulk_create(businesses)
+
+    category_links = []
+    feature_links = []
+    periods = []
+    for biz in businesses:
+        for category_id in rng.sample(category_ids, k=1 if rng.random() < 0.8 else 2):
+            category_links.append(Business.categories.through(business_id=biz.pk, category_id=category_id))
+        for feature_id in rng.sample(feature_ids, k=rng.randint(1, min(3, len(feature_ids)))):
+            feature_links.append(Business.accessibility_features.through(business_id=biz.pk, accessibilityfeature_id=feature_id))
+        for weekday, start_minute, end_minute in opening_periods(biz.opening_hours):
+            periods.append(OpeningPeriod(business_id=biz.pk, weekday=weekday, start_minute=start_minute, end_minute=end_minute))
+    Business.categories.through.objects.bulk_create(category_links)
+    Business.accessibility_features.through.objects.bulk_create(feature_links)
+    OpeningPeriod.objects.bulk_create(periods)
+    # bulk_create sends no signals, so build the search documents explicitly
+    refresh_search_documents([biz.pk for biz in businesses])
+
+
+def seed(size, seed_value, stdout):
+    """Seed synthetic businesses until there are `size` of them."""
+    existing = bench_count()
+    if existing >= size:
+        return
+    lookups = (
+        list(Category.objects.order_by('pk').values_list('pk', flat=True)),
+        list(AccessibilityFeature.objects.order_by('pk').values_list('pk', flat=True)),
+        list(MembershipTier.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)),
+    )
+    if not lookups[0] or not lookups[1]:
+        raise SystemExit("Load the category and accessibility feature fixtures first.")
+    if existing % SEED_BATCH_SIZE:
+        raise SystemExit("Synthetic data is incomplete; run with --clean and seed again.")
+    uk_polygon = load_uk_polygon()
+    started = time.perf_counter()
+    for start in range(existing, size, SEED_BATCH_SIZE):
+        with transaction.atomic():
+            seed_batch(start, min(start + SEED_BATCH_SIZE, size), seed_value, uk_polygon, lookups)
+        done = min(start + SEED_BATCH_SIZE, size)
+        if done % (SEED_BATCH_SIZE * 10) == 0 or done == size:
+            stdout.write(f"  seeded {done}/{size} ({time.perf_counter() - started:.0f}s)\n")
+    # fresh statistics so the planner sees the new table sizes
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_pattern(client, url, params, repeat):
+    """Request one pattern `repeat` + 1 times (the first with a cleared cache); return its figures."""
+    cache.clear()
+    timings = []
+    queries = []
+    size = 0
+    for _ in range(repeat + 1):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url, params, HTTP_ACCEPT_ENCODING='gzip')
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f"{url} {params} returned {response.status_code}: {response.content[:200]!r}")
+        queries.append(len(captured))
+        size = len(response.content)
+    cold, warm = timings[0], timings[1:] or timings
+    return {
+        'cold_ms': round(cold, 1),
+        'p50_ms': round(percentile(warm, 0.5), 1),
+        'p95_ms': round(percentile(warm, 0.95), 1),
+        'queries': max(queries),
+        'bytes': size,
+    }
+
+
+def benchmark(size, repeat, stdout):
+    """Replay every query pattern against the current data; return {pattern: figures}."""
+    owner = User.objects.get(username=f"{BENCH_PREFIX}0")
+    client = Client()
+    client.force_login(owner)
+    url = reverse('ajax_search_businesses')
+    results = {}
+    stdout.write(f"\n{size} businesses\n")
+    stdout.write(f"  {'pattern':<28}{'cold ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'queries':>9}{'bytes':>10}\n")
+    for name, params in query_patterns():
+        figures = run_pattern(client, url, params, repeat)
+        results[name] = figures
+        stdout.write(
+            f"  {name:<28}{figures['cold_ms']:>9}{figures['p50_ms']:>9}{figures['p95_ms']:>9}"
+            f"{figures['queries']:>9}{figures['bytes']:>10}\n"
+        )
+    return results
+
+
+def clean(stdout):
+    """Delete every synthetic user; their profiles, businesses and documents cascade."""
+    deleted, _ = User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+    stdout.write(f"Deleted {deleted} synthetic rows\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Business counts to benchmark at')
+    parser.add_argument('--repeat', type=int, default=20, help='Warm requests per pattern')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic data')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    parser.add_argument('--clean', action='store_true', help='Delete the synthetic data and exit')
+    args = parser.parse_args()
+
+    if args.clean:
+        clean(sys.stdout)
+        return
+    results = {}
+    # the test client's host and full-stack requests, without the test runner
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        for size in sorted(args.sizes):
+            seed(size, args.seed, sys.stdout)
+            # a previous run may have left more rows than asked for: report what was measured
+            actual = bench_count()
+            results[actual] = benchmark(actual, args.repeat, sys.stdout)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'seed': args.seed, 'repeat': args.repeat, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+fake_data.py
+
+Shared generators for synthetic data, used by `generate_fake_users.py` (fixtures)
+and `benchmark_search.py` (synthetic-scale benchmark data).
+
+- load_uk_polygon: the UK boundary, prepared for fast point-in-polygon tests.
+- random_uk_point: a random (lon, lat) inside the UK boundary.
+- random_opening_hours: opening hours JSON text in the format the business forms save.
+
+Every generator takes the random number generator to use (the `random` module or a
+seeded `random.Random`), so callers can make their output deterministic.
+"""
+
+import json
+import os
+
+import geojson
+import shapely
+from shapely.geometry import Point, shape
+
+UK_BOUNDARY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'businesses', 'static', 'geojson', 'uk-boundary.geojson',
+)
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def load_uk_polygon(path=UK_BOUNDARY_PATH):
+    """Load the UK boundary GeoJSON as a prepared shapely geometry."""
+    with open(path, "r") as f:
+        uk_geojson = geojson.load(f)
+    uk_polygon = shape(uk_geojson["features"][0]["geometry"])
+    # prepared geometries answer contains() much faster, which matters at scale
+    shapely.prepare(uk_polygon)
+    return uk_polygon
+
+
+def random_uk_point(rng, uk_polygon):
+    """Return a random (lon, lat), rounded to 6 places, inside the UK boundary."""
+    while True:
+        lon = round(rng.uniform(-7.6, 1.8), 6)
+        lat = round(rng.uniform(49.9, 58.7), 6)
+        if uk_polygon.contains(Point(lon, lat)):
+            return lon, lat
+
+
+def random_opening_hours(rng):
+    """
+    Return opening hours JSON text, or '' for the 10% of businesses without hours.
+
+    Each day is open with 90% probability; 30% of open days are split into a
+    morning and an afternoon period.
+    """
+    if rng.random() < 0.1:
+        return ''
+    opening_hours_dict = {}
+    for day in DAYS_OF_WEEK:
+        if rng.random() < 0.9:
+            if rng.random() < 0.3:
+                opening_hours_dict[day] = [
+                    {"start": "09:00", "end": "13:00"},
+                    {"start": "14:00", "end": "17:00"}
+                ]
+            else:
+                opening_hours_dict[day] = [{"start": "09:00", "end": "17:00"}]
+    # Only save JSON if at least one day has hours, else save empty string
+    return json.dumps(opening_hours_dict) if opening_hours_dict else ''
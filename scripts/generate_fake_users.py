@@ -33,12 +33,11 @@ import django
 import sys
 import json
 import random
-import geojson
 
 from faker import Faker
 from datetime import timezone
 from django.contrib.auth.hashers import make_password
-from shapely.geometry import shape, Point
+from fake_data import load_uk_polygon, random_opening_hours, random_uk_point
 from accounts.models import County, AgeGroup, MobilityDevice
 from businesses.models import Category, AccessibilityFeature, MembershipTier, TIER_CHOICES
 
@@ -267,9 +266,7 @@ for user in users:
 
 
 # Load UK boundary GeoJSON
-with open("businesses/static/geojson/uk-boundary.geojson", "r") as f:
-    uk_geojson = geojson.load(f)
-uk_polygon = shape(uk_geojson["features"][0]["geometry"])
+uk_polygon = load_uk_polygon()
 
 # Generate businesses, each owned by a user profile with business
 businesses = []
@@ -294,12 +291,7 @@ membership_tiers = list(MembershipTier.objects.filter(is_active=True))
 # Generate businesses for each user profile with a business
 for idx, owner_pk in enumerate(user_profiles_with_business):
     # Generate a random UK point within the boundary
-    while True:
-        lon = round(random.uniform(-7.6, 1.8), 6)
-        lat = round(random.uniform(49.9, 58.7), 6)
-        point = Point(lon, lat)
-        if uk_polygon.contains(point):
-            break
+    lon, lat = random_uk_point(random, uk_polygon)
     # Use SRID prefix for proper PostGIS geometry import
     point_wkt = f"SRID=4326;POINT({lon} {lat})"
     # Pick a membership tier
@@ -368,30 +360,7 @@ for idx, owner_pk in enumerate(user_profiles_with_business):
     else:
         special_offers = ''
     # Opening hours: 10% chance no hours submitted
-    if random.random() < 0.1:
-        opening_hours = ''
-    else:
-        # Build JSON opening hours for each day
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        opening_hours_dict = {}
-        for day in days:
-            # 90% chance business is open
-            if random.random() < 0.9:
-                # 30% of open days split into a morning and afternoon period
-                if random.random() < 0.3:
-                    opening_hours_dict[day] = [
-                        {"start": "09:00", "end": "13:00"},
-                        {"start": "14:00", "end": "17:00"}
-                    ]
-                else:
-                    opening_hours_dict[day] = [{"start": "09:00", "end": "17:00"}]
-            # else: do not add the day at all
-
-        # Only save JSON if at least one day has hours, else save empty string
-        if opening_hours_dict:
-            opening_hours = json.dumps(opening_hours_dict)
-        else:
-            opening_hours = ''
+    opening_hours = random_opening_hours(random)
     # Choose 1 category most of the time, 2 occasionally
     if random.random() < 0.8:
         categories = [random.choice(category_choices)]
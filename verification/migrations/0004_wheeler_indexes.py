@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verification', '0003_alter_wheelerverification_business_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='wheelerverification',
+            name='wheeler',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='verifications_made', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='wheelerverificationapplication',
+            name='wheeler',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='verification_requests_made', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='wheelerverification',
+            index=models.Index(fields=['wheeler', 'business'], name='verification_wheeler_business'),
+        ),
+        migrations.AddIndex(
+            model_name='wheelerverificationapplication',
+            index=models.Index(fields=['wheeler', 'approved'], include=['business'], name='verification_app_wheeler_appr'),
+        ),
+    ]
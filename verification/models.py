@@ -26,7 +26,9 @@ class WheelerVerification(models.Model):
         null=True,
         blank=True,
         on_delete=models.SET_NULL,
-        related_name='verifications_made'
+        related_name='verifications_made',
+        # covered by the (wheeler, business) index below
+        db_index=False,
     )
     date_verified = models.DateTimeField(auto_now_add=True)
     comments = models.TextField()
@@ -53,6 +55,10 @@ class WheelerVerification(models.Model):
 
     class Meta:
         unique_together = ('business', 'wheeler')  # prevent double verification
+        indexes = [
+            # a wheeler's verifications (dashboards, navigation); unique_together leads with business
+            models.Index(fields=['wheeler', 'business'], name='verification_wheeler_business'),
+        ]
 
     def __str__(self):
         """String representation showing who verified which business and when."""
@@ -102,7 +108,9 @@ class WheelerVerificationApplication(models.Model):
         null=True,
         blank=True,
         on_delete=models.SET_NULL,
-        related_name='verification_requests_made')
+        related_name='verification_requests_made',
+        # covered by the (wheeler, approved) index below
+        db_index=False)
     requested_at = models.DateTimeField(auto_now_add=True)
     approved = models.BooleanField(default=False)
     # Timestamp when the request was approved
@@ -123,3 +131,7 @@ class WheelerVerificationApplication(models.Model):
     class Meta:
         # Prevent duplicate requests for the same business/wheeler pair at the DB level
         unique_together = ('business', 'wheeler')
+        indexes = [
+            # a wheeler's approved or pending applications, with their business ids in the index
+            models.Index(fields=['wheeler', 'approved'], include=['business'], name='verification_app_wheeler_appr'),
+        ]
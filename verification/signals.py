@@ -1,9 +1,13 @@
+import logging
+
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.conf import settings
 from .models import WheelerVerification
 
+logger = logging.getLogger(__name__)
+
 
 # Store the old value before saving
 @receiver(pre_save, sender=WheelerVerification)
@@ -17,7 +21,7 @@ def store_old_approved(sender, instance, **kwargs):
 
 @receiver(post_save, sender=WheelerVerification)
 def send_approval_email(sender, instance, created, **kwargs):
-    print(f"Post-save signal received for WheelerVerification id={instance.id}, created={created}")
+    logger.debug("Post-save signal received for WheelerVerification id=%s, created=%s", instance.id, created)
     # Only send if not just created, and approved changed from False to True
     if not created and hasattr(instance, '_old_approved'):
         if not instance._old_approved and instance.approved:
@@ -31,7 +35,7 @@ def send_approval_email(sender, instance, created, **kwargs):
                 "Best regards,\n\n"
                 "The Mobility Mapper Team"
             )
-            print(f"Sending approval email to {instance.wheeler.email}")
+            logger.info("Sending approval email to %s", instance.wheeler.email)
             send_mail(
                 subject,
                 message,
@@ -70,7 +74,7 @@ def send_approval_email(sender, instance, created, **kwargs):
                 "Best regards,\n\n"
                 "The Mobility Mapper Team"
             )
-            print(f"Sending verification count email to {instance.business.business_owner.user.email}")
+            logger.info("Sending verification count email to %s", instance.business.business_owner.user.email)
             send_mail(
                 biz_subject,
                 biz_message,
@@ -1,4 +1,3 @@
-import json
 import re
 from datetime import timedelta
 from decimal import Decimal
@@ -12,13 +11,12 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.views.decorators.http import require_GET
 from django import template
-from django.contrib import messages
 
 from .forms import WheelerVerificationForm
 from .models import WheelerVerification, WheelerVerificationApplication, WheelerVerificationPhoto
-from accounts.models import MobilityDevice
-from businesses.models import Business, AccessibilityFeature
 from businesses.models import Business
+from businesses.opening_hours import compile_opening_hours
+from core import lookups
 
 # custom template filter for dictionary access
 register = template.Library()
@@ -74,24 +72,8 @@ def business_detail(request, pk):
         )
         return redirect('account_dashboard')
 
-    # Parse and normalize opening_hours JSON for server-side table rendering
-    if business.opening_hours:
-        try:
-            raw = json.loads(business.opening_hours)
-            normalized = {}
-            for day, info in raw.items():
-                periods = []
-                for p in info:
-                    start = p.get('start') or p.get('open')
-                    end = p.get('end') or p.get('close')
-                    if start and end:
-                        periods.append({'start': start, 'end': end})
-                normalized[day] = periods
-            opening_hours_dict = normalized
-        except Exception:
-            opening_hours_dict = None
-    else:
-        opening_hours_dict = None
+    # Compiled (and memoised) opening hours for server-side table rendering
+    opening_hours_table = compile_opening_hours(business.opening_hours)
     # Prepare JSON for client-side map rendering
     business_json = {
         "business_name": business.business_name,
@@ -123,7 +105,7 @@ def business_detail(request, pk):
     return render(request, 'verification/business_detail.html', {
         'business': business,
         'logo_url': logo_url,
-        'opening_hours_dict': opening_hours_dict,
+        'opening_hours_table': opening_hours_table,
         'page_title': business.business_name,
         'business_json': business_json,
         'user_has_requested': user_has_requested,
@@ -347,7 +329,7 @@ def wheeler_verification_form(request, pk):
         messages.info(request, "You have already verified this business.")
         return redirect('account_dashboard')
 
-    devices = MobilityDevice.objects.all()
+    devices = lookups.rows('mobility_devices')
     if request.method == 'POST':
         form = WheelerVerificationForm(request.POST, request.FILES, business=business)
         if form.is_valid():
@@ -356,13 +338,7 @@ def wheeler_verification_form(request, pk):
             verification.wheeler = request.user
             # Attach mobility device instance (not raw id string)
             mob_dev_id = request.POST.get('mobility_device')
-            if mob_dev_id:
-                try:
-                    verification.mobility_device = MobilityDevice.objects.get(pk=mob_dev_id)
-                except MobilityDevice.DoesNotExist:
-                    verification.mobility_device = None
-            else:
-                verification.mobility_device = None
+            verification.mobility_device = lookups.get('mobility_devices', mob_dev_id) if mob_dev_id else None
             if 'selfie' in request.FILES:
                 verification.selfie = request.FILES['selfie']
             verification.save()
@@ -376,10 +352,8 @@ def wheeler_verification_form(request, pk):
                 m = re.match(r'^feature_photo_(?P<pk>\d+)$', field_name)
                 if not m:
                     continue
-                feature_pk = int(m.group('pk'))
-                try:
-                    feature = AccessibilityFeature.objects.get(pk=feature_pk)
-                except AccessibilityFeature.DoesNotExist:
+                feature = lookups.get('accessibility_features', m.group('pk'))
+                if feature is None:
                     continue
                 # Save each uploaded file for this feature
                 for upload in request.FILES.getlist(field_name):